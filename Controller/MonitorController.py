@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends
+
+from Controller.UserController import admin_required
+from config import replica_router
+from mapper.ProblemMapper import problem_cache
+from pojo.Result import Result
+from service.HojService import get_hoj_client
+from service.JudgeDispatcher import get_judge_dispatcher
+from service.SubmissionEventBus import get_submission_event_bus
+from service.VerdictCache import get_verdict_cache
+from service.VerdictPoller import get_verdict_poller
+from utils import profiler
+
+router = APIRouter()
+
+
+@router.get("/hoj", response_model=Result[dict])
+def hoj_stats(_: dict = Depends(admin_required)):
+    """HOJ 客户端连接池统计（仅限 admin）"""
+    return Result.success(data=get_hoj_client().pool_stats())
+
+
+@router.get("/judge", response_model=Result[dict])
+def judge_stats(_: dict = Depends(admin_required)):
+    """判题队列深度、在途数量、耗时、状态推送订阅数与判题结果缓存命中（仅限 admin）"""
+    return Result.success(data={
+        "dispatcher": get_judge_dispatcher().stats(),
+        "poller": get_verdict_poller().stats(),
+        "events": get_submission_event_bus().stats(),
+        "verdict_cache": get_verdict_cache().stats(),
+    })
+
+
+@router.get("/cache", response_model=Result[dict])
+def cache_stats(_: dict = Depends(admin_required)):
+    """进程内缓存命中率（仅限 admin）"""
+    return Result.success(data={"problem": problem_cache.stats()})
+
+
+@router.get("/queries", response_model=Result[dict])
+def query_reports(_: dict = Depends(admin_required)):
+    """最近超出 SQL 预算 / 疑似 N+1 的请求与采样到的慢查询（仅限 admin，包含 SQL 原文）"""
+    return Result.success(data=profiler.snapshot())
+
+
+@router.get("/replicas", response_model=Result[dict])
+def replica_stats(_: dict = Depends(admin_required)):
+    """只读副本健康状态、复制延迟与分流计数（仅限 admin）"""
+    return Result.success(data=replica_router.snapshot())
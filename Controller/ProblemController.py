@@ -1,35 +1,54 @@
 from fastapi import APIRouter, Query, HTTPException, Depends
-from typing import List
+from typing import List, Optional
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import get_session, get_async_session
 
 from Controller.UserController import admin_required
 from pojo.Result import Result
+from utils.pagination import parse_cursor
 from service.ProblemService import ProblemService
-from pojo.Problem import ProblemRead, Problem, ProblemCreate
+from pojo.Problem import ProblemRead, Problem, ProblemCreate, ProblemSummary, ProblemType
 
 router = APIRouter()
 
 @router.get("/{problem_id}", response_model=Result[ProblemRead])
-def get_problem_by_id(problem_id: int):
+def get_problem_by_id(problem_id: int, session: Session = Depends(get_session)):
     """根据 ID 获取题目"""
-    problem = ProblemService.get_problem_by_id(problem_id)
-    if not problem:
+    problem = ProblemService.get_problem_by_id(problem_id, session)
+    if problem.code != 200:
         raise HTTPException(status_code=404, detail="Problem not found")
-    return problem
+    return problem.to_response()
 
 
-@router.get("/", response_model=Result[List[ProblemRead]])
+@router.get("/", response_model=Result[List[ProblemSummary]])
 def get_problems(
-    page: int = Query(1, ge=1),
+    page: int = Query(1, ge=1, description="页码（OFFSET 分页，已不推荐，请改用 cursor）"),
     page_size: int = Query(20, ge=1, le=100),
-    problem_type: str = Query(None, description="题目类型（choice/fill/code）"),
-    name: str = Query(None, description="题目名称（模糊匹配）"),
+    cursor: str = Query(None, description="游标分页：上一页返回的 next_cursor"),
+    problem_type: Optional[ProblemType] = Query(None, description="题目类型（choice/fill/coding）"),
+    name: str = Query(None, description="题目名称（全文搜索，按相关度排序）"),
+    session: Session = Depends(get_session),
 ):
-    """获取题目列表，可分页/按类型/按名称筛选"""
-    if problem_type:
-        return ProblemService.get_problems_by_type(problem_type)
-    if name:
-        return ProblemService.get_problems_by_name(name)
-    return ProblemService.get_problems_by_page(page, page_size)
+    """获取题目列表（摘要），类型 / 名称 / 分页条件可组合使用"""
+    result = ProblemService.get_problem_summaries(session, problem_type, name, parse_cursor(cursor), page, page_size)
+    return result.to_response()
+
 @router.post("/create", response_model=Result[ProblemRead])
-def create_problem(problem: ProblemCreate,_: dict = Depends(admin_required)):
-    return ProblemService.create_problem(problem)
+def create_problem(problem: ProblemCreate,_: dict = Depends(admin_required),
+                   session: Session = Depends(get_session)):
+    return ProblemService.create_problem(problem, session)
+
+
+@router.post("/{problem_id}/testdata", response_model=Result[dict])
+async def testdata_changed(problem_id: int, _: dict = Depends(admin_required),
+                           session: AsyncSession = Depends(get_async_session)):
+    """
+    通知题目的测试数据已在 HOJ 上更新（需要管理员），之前缓存的判题结果失效，相同代码重新提交时重新判题
+    """
+    result = await ProblemService.testdata_changed(problem_id, session)
+    if result.code != 200:
+        raise HTTPException(status_code=result.code, detail=result.message)
+    return result
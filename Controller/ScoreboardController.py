@@ -0,0 +1,53 @@
+import asyncio
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import get_async_session, session_maker
+from Controller.UserController import admin_required
+from pojo.Result import Result
+from pojo.Scoreboard import ProblemStatRead, ScoreboardEntry
+from service.ScoreboardService import ScoreboardService
+from utils.pagination import parse_cursor
+from utils.security import get_current_user
+
+router = APIRouter()
+
+
+@router.get("/", response_model=Result[List[ScoreboardEntry]])
+async def get_scoreboard(
+    cursor: str = Query(None, description="上一页返回的 next_cursor"),
+    page_size: int = Query(50, ge=1, le=200),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """排行榜：通过题数降序、罚时升序"""
+    result = await ScoreboardService.get_scoreboard(session, parse_cursor(cursor) or 0, page_size)
+    return result.to_response()
+
+
+@router.get("/me", response_model=Result[ScoreboardEntry])
+async def get_my_rank(
+    current_user: dict = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """当前用户的名次（需要登录）"""
+    result = await ScoreboardService.get_user_rank(current_user.get("user_id"), session)
+    if result.code != 200:
+        raise HTTPException(status_code=result.code, detail=result.message)
+    return result
+
+
+@router.get("/problems/{problem_id}", response_model=Result[ProblemStatRead])
+async def get_problem_stat(problem_id: int, session: AsyncSession = Depends(get_async_session)):
+    """单题提交数、通过数、通过率"""
+    return await ScoreboardService.get_problem_stat(problem_id, session)
+
+
+@router.post("/rebuild", response_model=Result[dict])
+async def rebuild_scoreboard(_: dict = Depends(admin_required)):
+    """按提交历史全量重建排行榜汇总表（仅限 admin），在线程池中执行"""
+    def rebuild():
+        with session_maker() as session:
+            return ScoreboardService.rebuild(session)
+    return await asyncio.to_thread(rebuild)
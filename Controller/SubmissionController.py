@@ -1,12 +1,20 @@
 # Controller/SubmissionController.py
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+import json
 
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import get_session, get_async_session, SUBMISSION_BATCH_MAX, SUBMISSION_EVENT_MAX_IDS
 from Controller.UserController import admin_required
 from pojo.Result import Result
-from pojo.Submission import Submission, SubmissionCreate
+from pojo.Submission import Submission, SubmissionBatchItem, SubmissionCreate
 from service.SubmissionService import SubmissionService
-from utils.security import get_current_user# 你之前写的鉴权方法
+from utils.pagination import parse_cursor
+from utils.security import decode_access_token, get_current_user, get_stream_user# 你之前写的鉴权方法
 
 router = APIRouter()
 
@@ -14,7 +22,8 @@ router = APIRouter()
 @router.post("/submit", response_model=Result[Submission])
 async def submit_answer(
     submission:SubmissionCreate,
-    current_user: dict = Depends(get_current_user)  # 鉴权
+    current_user: dict = Depends(get_current_user),  # 鉴权
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     提交答案（需要登录）
@@ -22,57 +31,142 @@ async def submit_answer(
     user_id = current_user.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="用户信息无效")
-    result = SubmissionService.submit_answer(user_id, submission.problem_id, submission.user_answer)
-    if not result.success:
-        raise HTTPException(status_code=400, detail=result.message)
+    result = await SubmissionService.submit_answer(user_id, submission.problem_id, submission.user_answer, session)
+    if result.code != 200:
+        # 判题队列已满时返回 503，客户端应稍后重试
+        headers = {"Retry-After": "5"} if result.code == 503 else None
+        raise HTTPException(status_code=result.code, detail=result.message, headers=headers)
     return result
 
 
-@router.get("/user/{problem_id}", response_model=Result[List[Submission]])
-def get_user_submissions(
-    problem_id: int,
-    current_user: dict = Depends(get_current_user)
+@router.post("/submit/batch", response_model=Result[List[SubmissionBatchItem]])
+async def submit_batch(
+    submissions: List[SubmissionCreate] = Body(..., max_length=SUBMISSION_BATCH_MAX),
+    current_user: dict = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
-    获取用户在某题目的提交记录（需要登录）
+    批量提交整张试卷（需要登录），逐题返回结果
     """
     user_id = current_user.get("user_id")
-    return SubmissionService.get_user_submissions(user_id, problem_id)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="用户信息无效")
+    if not submissions:
+        raise HTTPException(status_code=400, detail="提交内容为空")
+    return await SubmissionService.submit_batch(user_id, submissions, session)
 
-@router.get("/{submission_id}", response_model=Result[Submission])
-def get_submissions(
-    submission_id:int,
-    current_user: dict = Depends(get_current_user)
+
+# ---------------- 判题状态推送 ----------------
+def _check_ids(ids: Optional[List[int]]) -> Optional[List[int]]:
+    if ids is not None and len(ids) > SUBMISSION_EVENT_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"最多同时订阅 {SUBMISSION_EVENT_MAX_IDS} 个提交")
+    return ids
+
+
+@router.get("/events")
+async def submission_events(
+    ids: Optional[List[int]] = Query(None, description="只订阅这些提交，全部出结果后结束；不传则订阅本人所有提交"),
+    current_user: dict = Depends(get_stream_user),
 ):
-    result=SubmissionService.get_submission_by_id(submission_id)
-    if result.data.user_id != current_user.get("user_id") and admin_required():
-        raise HTTPException(status_code=401, detail="无访问权限")
-    return result
+    """
+    Server-Sent Events 推送判题状态（需要登录），代替轮询 GET /submissions/{submission_id}
+    """
+    user_id = current_user.get("user_id")
+    stream = SubmissionService.stream_statuses(user_id, _check_ids(ids))
+
+    async def body():
+        async for event in stream:
+            if event is None:
+                yield ": ping\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/ws")
+async def submission_ws(
+    websocket: WebSocket,
+    token: str = Query(...),
+    ids: Optional[List[int]] = Query(None),
+):
+    """
+    WebSocket 推送判题状态，鉴权用 ?token=，消息格式 {"type": "status", "submission_id", "status", "at"}
+    """
+    payload = decode_access_token(token)
+    if not payload or not payload.get("user_id"):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if ids is not None and len(ids) > SUBMISSION_EVENT_MAX_IDS:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    try:
+        async for event in SubmissionService.stream_statuses(payload["user_id"], ids):
+            await websocket.send_json({"type": "ping"} if event is None else {"type": "status", **event})
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        # 客户端已断开
+        pass
+
+
 @router.get("/user", response_model=Result[List[Submission]])
 def get_all_user_submissions(
-    current_user: dict = Depends(get_current_user)
+    cursor: str = Query(None, description="上一页返回的 next_cursor"),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(get_session),
 ):
     """
-    获取用户所有提交记录（需要登录）
+    获取用户所有提交记录（需要登录），按提交时间倒序游标分页
     """
     user_id = current_user.get("user_id")
-    return SubmissionService.get_all_user_submissions(user_id)
+    return SubmissionService.get_all_user_submissions(user_id, session, parse_cursor(cursor), page_size).to_response()
+
 
+@router.get("/user/{problem_id}", response_model=Result[List[Submission]])
+def get_user_submissions(
+    problem_id: int,
+    cursor: str = Query(None, description="上一页返回的 next_cursor"),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """
+    获取用户在某题目的提交记录（需要登录），按提交时间倒序游标分页
+    """
+    user_id = current_user.get("user_id")
+    return SubmissionService.get_user_submissions(user_id, problem_id, session, parse_cursor(cursor),
+                                                  page_size).to_response()
 
+@router.get("/{submission_id}", response_model=Result[Submission])
+def get_submissions(
+    submission_id:int,
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    result=SubmissionService.get_submission_by_id(submission_id, session, current_user.get("user_id"))
+    if result.code != 200:
+        raise HTTPException(status_code=result.code, detail=result.message)
+    if result.data.user_id != current_user.get("user_id") and current_user.get("name") != "admin":
+        raise HTTPException(status_code=401, detail="无访问权限")
+    return result.to_response()
 @router.put("/{submission_id}", response_model=Result[Submission])
-def update_submission_status(
+async def update_submission_status(
     submission_id: int,
     status: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     更新提交状态（需要登录，一般给判题机管理员用）
     """
     # 这里可选：限制只有管理员能更新
-    if current_user.get("username") != "admin":
+    if current_user.get("name") != "admin":
         raise HTTPException(status_code=403, detail="只有管理员能更新提交状态")
 
-    result = SubmissionService.update_submission_status(submission_id, status)
-    if not result.success:
-        raise HTTPException(status_code=404, detail=result.message)
+    result = await SubmissionService.update_submission_status(submission_id, status, session)
+    if result.code != 200:
+        raise HTTPException(status_code=result.code, detail=result.message)
     return result
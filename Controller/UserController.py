@@ -2,9 +2,12 @@ import csv
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from pydantic import BaseModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
-from pojo.User import UserRead
+from config import get_async_session
+
+from pojo.User import UserImportSummary
 from service.UserService import UserService
 from utils.security import  get_current_user
 from pojo.Result import Result
@@ -17,15 +20,15 @@ class RegisterRequest(BaseModel):
 
 # ---------------- 注册 ----------------
 @router.post("/register")
-def register(req: RegisterRequest) -> Result:
-    return UserService.register(req.name, req.password)
+async def register(req: RegisterRequest, session: AsyncSession = Depends(get_async_session)) -> Result:
+    return await UserService.register(req.name, req.password, session)
 
 
 
 # ---------------- 登录 ----------------
 @router.post("/login")
-def login(req: RegisterRequest) -> Result:
-    return UserService.login(req.name, req.password)
+async def login(req: RegisterRequest, session: AsyncSession = Depends(get_async_session)) -> Result:
+    return await UserService.login(req.name, req.password, session)
 
 
 # ---------------- Token 验证依赖 ----------------
@@ -49,12 +52,16 @@ def get_me(current_user=Depends(get_current_user)) -> Result:
 
 
 @router.post("/import")
-async def import_users(file: UploadFile= File(...), _: dict = Depends(admin_required)):
-    """批量导入用户（仅限 admin）"""
+async def import_users(
+    file: UploadFile= File(...),
+    _: dict = Depends(admin_required),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """批量导入用户（仅限 admin），逐批流式读取上传文件"""
     try:
         # 调用 service 方法，传入文件流
-        result: Result[list[UserRead]] = UserService.import_users_from_csv(file.file.read())
+        result: Result[UserImportSummary] = await UserService.import_users_from_csv(file.file, session)
         return result
     except Exception as e:
         # 捕获 service 之外的异常
-        return Result.error(message=f"导入失败: {str(e)}")
\ No newline at end of file
+        return Result.error(message=f"导入失败: {str(e)}")
@@ -1,36 +1,254 @@
 # app.py
+import asyncio
+import logging
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from sqlmodel import SQLModel
 
-from config import engine
+from config import (
+    engine, async_engine, session_maker, replica_engines, replica_router, METRICS_ENABLED, QUERY_PROFILER_ENABLED,
+    REPLICA_CHECK_INTERVAL, SUBMISSION_EVENT_RELAY_INTERVAL, SUBMISSION_EVENT_RELAY_LOOKBACK,
+    SERVER_STARTED_AT, LEADER_LOCK_FILE, LEADER_RETRY_INTERVAL, RECOVERY_INTERVAL, RECOVERY_STALE_AFTER,
+    JUDGE_HEARTBEAT_INTERVAL,
+)
+from migrations import runner as migrations
 from Controller.UserController import router as user_router
 from Controller.ProblemController import router as problem_router
 from Controller.SubmissionController import router as submission_router
+from Controller.ScoreboardController import router as scoreboard_router
+from Controller.MonitorController import router as monitor_router
+from service.HojService import get_hoj_client
+from service.JudgeDispatcher import get_judge_dispatcher
+from service.ProblemService import ProblemService
+from service.SubmissionEventBus import get_submission_event_bus
+from service.SubmissionService import SubmissionService
+from service.VerdictCache import get_verdict_cache
+from service.VerdictPoller import get_verdict_poller
+from utils import profiler
+from utils.leader import LeaderLock
+from utils.metrics import Gauge, MetricsMiddleware, instrument_engine, pool_gauge, registry
+from utils.replica import ReplicaPinMiddleware
+from utils.security import shutdown_hash_pool
+
+logger = logging.getLogger(__name__)
 
+# 本进程的启动时间；serve.py 会把 SERVER_STARTED_AT 统一设为 master 的启动时间
+PROCESS_STARTED_AT = time.time()
+# 多 worker 时只有 leader 运行单例后台任务（恢复 pending 提交）
+leader = LeaderLock(LEADER_LOCK_FILE, str(SERVER_STARTED_AT or PROCESS_STARTED_AT))
+# 本 worker 的标识，写入 submission.judge_owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"[:64]
 
 
 def create_db_and_tables():
-    """初始化数据库表"""
+    """初始化数据库表，并把已有的库迁移到最新结构"""
     SQLModel.metadata.create_all(engine)
+    migrations.upgrade(engine)
+
+
+async def recover_pending_submissions(created_before: Optional[datetime] = None,
+                                      stale_before: Optional[datetime] = None):
+    """
+    接管 created_before 之前创建或心跳早于 stale_before、仍未判完的提交；本进程手上的跳过
+    已送达 HOJ 的（记有 HOJ 提交号）只重新轮询结果，其余重新投递
+    """
+    dispatcher, poller = get_judge_dispatcher(), get_verdict_poller()
+    local = (dispatcher.active_submission_ids() | poller.tracked_submission_ids()
+             | get_verdict_cache().waiting_submission_ids())
+    try:
+        with profiler.profiled("job:recover_pending"):
+            pending_jobs = await SubmissionService.claim_pending_jobs(WORKER_ID, created_before, stale_before, local)
+        for job in pending_jobs:
+            if job.hoj_submit_id is not None:
+                poller.track(job.submission_id, job.hoj_submit_id, job.user_id)
+        await dispatcher.recover([job for job in pending_jobs if job.hoj_submit_id is None])
+    except Exception:
+        logger.exception("恢复待判题提交失败")
+
+
+async def run_singleton_jobs():
+    """
+    竞争 leader，成为 leader 后：
+    1. 恢复服务启动前创建的 pending 提交。本次启动的第一个 leader 全部接管（上次退出时没判完的，
+       此时没有任何 worker 在处理）；leader 换人时其他 worker 可能还在判，同样只接管心跳过期的
+    2. 之后定期接管心跳超过 RECOVERY_STALE_AFTER 未刷新的 pending 提交（崩溃的 worker 遗留的，见 judge_heartbeat）
+    leader 退出后锁由系统释放，其他 worker 在 LEADER_RETRY_INTERVAL 内接替
+    """
+    while not leader.try_acquire():
+        await asyncio.sleep(LEADER_RETRY_INTERVAL)
+    started_at = datetime.utcfromtimestamp(SERVER_STARTED_AT or PROCESS_STARTED_AT)
+    stale_after = timedelta(seconds=RECOVERY_STALE_AFTER)
+    await recover_pending_submissions(started_at, datetime.utcnow() - stale_after if leader.took_over else None)
+    while True:
+        await asyncio.sleep(RECOVERY_INTERVAL)
+        await recover_pending_submissions(stale_before=datetime.utcnow() - stale_after)
+
+
+async def judge_heartbeat():
+    """
+    每个 worker 定期刷新自己负责的提交的心跳：排队、暂存、等待 HOJ 结果以及挂在相同源码判题任务上等结果的
+    心跳曾经过期、已被其他 worker 接管的提交，本进程不再处理
+    """
+    dispatcher, poller, verdict_cache = get_judge_dispatcher(), get_verdict_poller(), get_verdict_cache()
+    while True:
+        await asyncio.sleep(JUDGE_HEARTBEAT_INTERVAL)
+        submission_ids = (dispatcher.active_submission_ids() | poller.tracked_submission_ids()
+                          | verdict_cache.waiting_submission_ids())
+        try:
+            lost = set(await SubmissionService.touch_judging(list(submission_ids), WORKER_ID))
+        except Exception:
+            logger.exception("刷新判题心跳失败")
+            continue
+        if lost:
+            logger.warning("%d 个提交已被其他 worker 接管，本进程不再处理", len(lost))
+            verdict_cache.detach(lost)
+            poller.untrack(lost)
+            dispatcher.discard(lost)
+
+
+async def relay_submission_events():
+    """
+    每个 worker 各自把其他 worker 回写的判题状态转发给本进程的推送连接
+    只查本进程有订阅的用户、最近 SUBMISSION_EVENT_RELAY_LOOKBACK 秒内变化的提交，没有订阅时不查库
+    """
+    while True:
+        await asyncio.sleep(SUBMISSION_EVENT_RELAY_INTERVAL)
+        try:
+            await SubmissionService.relay_status_changes(
+                datetime.utcnow() - timedelta(seconds=SUBMISSION_EVENT_RELAY_LOOKBACK))
+        except Exception:
+            logger.exception("转发判题状态失败")
+
+
+async def check_replicas():
+    """每个 worker 各自检查只读副本的连通性与复制延迟"""
+    while True:
+        try:
+            await asyncio.to_thread(replica_router.check)
+        except Exception:
+            logger.exception("只读副本健康检查失败")
+        await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+
+
+def warm_up():
+    """预热进程内索引，失败不影响启动（首次请求时会再尝试）"""
+    try:
+        with session_maker() as session:
+            ProblemService.warm_search_index(session)
+    except Exception:
+        logger.exception("预热题目搜索索引失败")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动/关闭共享资源"""
+    hoj_client = get_hoj_client()
+    await hoj_client.start()
+    poller = get_verdict_poller()
+    await poller.start()
+    dispatcher = get_judge_dispatcher()
+    await dispatcher.start(SubmissionService.judge_job)
+    singleton = asyncio.create_task(run_singleton_jobs())
+    warming = asyncio.create_task(asyncio.to_thread(warm_up))
+    replica_health = asyncio.create_task(check_replicas()) if replica_router else None
+    relay = asyncio.create_task(relay_submission_events()) if SUBMISSION_EVENT_RELAY_INTERVAL > 0 else None
+    heartbeat = asyncio.create_task(judge_heartbeat())
+    try:
+        yield
+    finally:
+        singleton.cancel()
+        warming.cancel()
+        heartbeat.cancel()
+        if replica_health is not None:
+            replica_health.cancel()
+        if relay is not None:
+            relay.cancel()
+        get_submission_event_bus().close()
+        # 先停判题调度（排队的不再提交，只等正在提交的完成并记下 HOJ 提交号），再停轮询；
+        # 仍未出结果的保持 pending，下次启动时有提交号的重新轮询，没有的重新投递
+        await dispatcher.stop()
+        await poller.stop()
+        await hoj_client.close()
+        shutdown_hash_pool()
+        await async_engine.dispose()
+        engine.dispose()
+        for replica in replica_engines.values():
+            replica.dispose()
+        leader.release()
+
+
+def setup_metrics(app: FastAPI):
+    """请求 / SQL / 连接池 / 判题积压指标，Prometheus 从 /metrics 抓取"""
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+    for name, replica in replica_engines.items():
+        instrument_engine(replica, name)
+    registry.register(pool_gauge({"sync": engine, "async": async_engine.sync_engine, **replica_engines}))
+
+    def judge_backlog():
+        dispatcher = get_judge_dispatcher().stats()
+        yield ("queued",), dispatcher["queue_depth"]
+        yield ("submitting",), dispatcher["in_flight"]
+        yield ("parked",), dispatcher["parked"]
+        yield ("polling",), get_verdict_poller().stats()["tracked"]
+
+    registry.register(Gauge("judge_backlog", "未出结果的编程题提交：排队中 / 正在提交 HOJ / HOJ 不可用暂存 / 等待 HOJ 结果",
+                            ("stage",), judge_backlog))
+    registry.register(Gauge("db_replica_available", "只读副本是否可用（健康且延迟未超限）", ("replica",),
+                            lambda: [((r.name,), int(replica_router.available(r))) for r in replica_router.replicas]))
+    registry.register(Gauge("db_replica_lag_seconds", "只读副本复制延迟", ("replica",),
+                            lambda: [((r.name,), r.lag) for r in replica_router.replicas]))
+    registry.register(Gauge("hoj_requests_in_flight", "正在进行的 HOJ 请求数", (),
+                            lambda: [((), get_hoj_client().pool_stats()["in_flight"])]))
+    registry.register(Gauge("hoj_concurrency_limit", "HOJ 请求的自适应并发上限", (),
+                            lambda: [((), get_hoj_client().limiter.limit)]))
+    registry.register(Gauge("hoj_circuit_state", "HOJ 熔断器状态：0 关闭 / 1 打开 / 0.5 半开探测", (),
+                            lambda: [((), {"closed": 0, "open": 1, "half_open": 0.5}[get_hoj_client().breaker.state])]))
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Online Judge API", version="1.0.0")
+    app = FastAPI(title="Online Judge API", version="1.0.0", lifespan=lifespan)
 
     # 注册路由
     app.include_router(user_router, prefix="/users", tags=["User"])
     app.include_router(problem_router, prefix="/problems", tags=["Problem"])
     app.include_router(submission_router, prefix="/submissions", tags=["Submission"])
+    app.include_router(scoreboard_router, prefix="/scoreboard", tags=["Scoreboard"])
+    app.include_router(monitor_router, prefix="/monitor", tags=["Monitor"])
     @app.get("/health")
     def health_check():
         return {"status": "ok"}
 
+    if replica_router:
+        app.add_middleware(ReplicaPinMiddleware, router=replica_router)
+    if QUERY_PROFILER_ENABLED:
+        profiler.instrument_engine(engine, "sync")
+        profiler.instrument_engine(async_engine.sync_engine, "async")
+        for name, replica in replica_engines.items():
+            profiler.instrument_engine(replica, name)
+        app.add_middleware(profiler.QueryProfilerMiddleware)
+    if METRICS_ENABLED:
+        setup_metrics(app)
+
     return app
 
 
 app = create_app()
 
 if __name__ == "__main__":
+    # 开发模式（单进程 + 自动重载）；生产部署使用 python serve.py
     import uvicorn
     create_db_and_tables()
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,9 @@
+"""
+种子数据与压测客户端共用的约定；不依赖 config，压测远程服务时不需要数据库驱动
+"""
+USER_PREFIX = "bench_user_"
+ADMIN_NAME = "admin"
+DEFAULT_PASSWORD = "bench"
+# 标题词表：搜索负载从这里取关键词
+WORDS = ["数组", "链表", "排序", "二分", "动态规划", "字符串", "图论", "贪心", "递归", "哈希",
+         "array", "sort", "tree", "graph", "string", "matrix", "prime", "path", "stack", "queue"]
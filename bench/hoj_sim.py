@@ -0,0 +1,309 @@
+"""
+本地 HOJ 模拟器：实现 HojClient 用到的四个接口，用于在没有真实 HOJ 的环境下压测判题链路
+
+    python -m bench.hoj_sim --port 8081 --latency lognormal:1.0,0.6 --judge-workers 8 --token-ttl 60
+
+- 判题耗时按 --latency 分布抽样；--judge-workers > 0 时按判题机并发数排队
+- 注入故障：--error-rate 返回 500，--timeout-rate 挂起 --hang 秒后才响应，--rate-limit 超出时返回 429
+- token 在 --token-ttl 秒后失效，之后的请求返回 401，用于覆盖重新登录分支
+- 运行时可通过 PUT /sim/config 修改上述参数（例如模拟一段时间的故障），GET /sim/stats 查看计数
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import secrets
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# HOJ 状态码：0 通过、-1 答案错误、4 系统错误、7 判题中
+STATUS_ACCEPTED = 0
+STATUS_WRONG_ANSWER = -1
+STATUS_SYSTEM_ERROR = 4
+STATUS_JUDGING = 7
+
+
+def parse_latency(text: str) -> Tuple[str, List[float]]:
+    """
+    判题耗时分布（秒）：
+    fixed:1.0 / uniform:0.5,2.0 / exp:1.0（均值）/ lognormal:1.0,0.6（中位数, sigma）
+    """
+    kind, _, params = text.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    expected = {"fixed": 1, "uniform": 2, "exp": 1, "lognormal": 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"无法解析的耗时分布：{text}")
+    return kind, values
+
+
+def sample_latency(kind: str, values: List[float], rng: random.Random) -> float:
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return rng.uniform(values[0], values[1])
+    if kind == "exp":
+        return rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    return rng.lognormvariate(math.log(values[0]), values[1])
+
+
+@dataclass
+class SimConfig:
+    latency: str = "lognormal:1.0,0.6"
+    judge_workers: int = 0          # 判题机并发数，0 为不限
+    accept_rate: float = 0.5        # 通过的比例，其余为答案错误
+    system_error_rate: float = 0.0  # 判题结果为系统错误的比例
+    error_rate: float = 0.0         # 接口直接返回 500 的比例
+    timeout_rate: float = 0.0       # 接口挂起 hang 秒的比例
+    hang: float = 30.0
+    rate_limit: float = 0.0         # 每秒允许的接口请求数（令牌桶），0 为不限
+    token_ttl: float = 0.0          # token 有效期（秒），0 为不过期
+    request_latency: float = 0.0    # 每个接口请求固定增加的耗时（秒）
+    batch_status: bool = True       # 是否支持 /api/check-submissions-status
+
+    def update(self, changes: dict):
+        names = {f.name: f.type for f in fields(self)}
+        for name, value in changes.items():
+            if name not in names:
+                raise ValueError(f"未知参数 {name}")
+            if name == "latency":
+                parse_latency(value)
+            setattr(self, name, value)
+
+
+class HojSimulator:
+    """模拟器状态：token、提交的出结果时间、判题机排队、令牌桶与计数"""
+
+    def __init__(self, config: SimConfig, seed: Optional[int] = None):
+        self.config = config
+        self.rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        # token -> 签发时间
+        self._tokens: Dict[str, float] = {}
+        # submitId -> (出结果时间, 最终状态)
+        self._submissions: Dict[int, Tuple[float, int]] = {}
+        # 各判题机空闲的时间点
+        self._workers: List[float] = []
+        self._bucket = 0.0
+        self._bucket_at = time.monotonic()
+        self.stats: Counter = Counter()
+
+    # ---------------- 鉴权 / 限流 / 故障 ----------------
+    def login(self) -> str:
+        token = secrets.token_hex(16)
+        self._tokens[token] = time.monotonic()
+        self.stats["logins"] += 1
+        return token
+
+    def token_valid(self, token: Optional[str]) -> bool:
+        issued = self._tokens.get(token or "")
+        if issued is None:
+            return False
+        if self.config.token_ttl and time.monotonic() - issued > self.config.token_ttl:
+            del self._tokens[token]
+            self.stats["expired_tokens"] += 1
+            return False
+        return True
+
+    def allow(self) -> bool:
+        """令牌桶限流，桶容量为一秒的配额"""
+        rate = self.config.rate_limit
+        if not rate:
+            return True
+        now = time.monotonic()
+        self._bucket = min(rate, self._bucket + (now - self._bucket_at) * rate)
+        self._bucket_at = now
+        if self._bucket < 1:
+            return False
+        self._bucket -= 1
+        return True
+
+    async def inject(self) -> Optional[JSONResponse]:
+        """按配置注入额外耗时、挂起、限流与 500；返回非 None 时直接作为响应"""
+        config = self.config
+        if config.request_latency:
+            await asyncio.sleep(config.request_latency)
+        if not self.allow():
+            self.stats["rate_limited"] += 1
+            return JSONResponse({"status": 429, "msg": "too many requests"}, status_code=429)
+        roll = self.rng.random()
+        if roll < config.timeout_rate:
+            self.stats["hung"] += 1
+            await asyncio.sleep(config.hang)
+        elif roll < config.timeout_rate + config.error_rate:
+            self.stats["injected_errors"] += 1
+            return JSONResponse({"status": 500, "msg": "injected error"}, status_code=500)
+        return None
+
+    # ---------------- 判题 ----------------
+    def submit(self) -> int:
+        now = time.monotonic()
+        kind, values = parse_latency(self.config.latency)
+        latency = sample_latency(kind, values, self.rng)
+        start = now
+        if self.config.judge_workers > 0:
+            # 判题机按并发数排队：取最早空闲的一台
+            while len(self._workers) < self.config.judge_workers:
+                heapq.heappush(self._workers, now)
+            start = max(now, heapq.heappop(self._workers))
+            heapq.heappush(self._workers, start + latency)
+        roll = self.rng.random()
+        if roll < self.config.system_error_rate:
+            status = STATUS_SYSTEM_ERROR
+        elif roll < self.config.system_error_rate + self.config.accept_rate:
+            status = STATUS_ACCEPTED
+        else:
+            status = STATUS_WRONG_ANSWER
+        submit_id = next(self._ids)
+        self._submissions[submit_id] = (start + latency, status)
+        self.stats["submissions"] += 1
+        return submit_id
+
+    def status(self, submit_id: int) -> Optional[int]:
+        entry = self._submissions.get(submit_id)
+        if entry is None:
+            return None
+        ready_at, status = entry
+        if time.monotonic() < ready_at:
+            return STATUS_JUDGING
+        return status
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        judging = sum(1 for ready_at, _ in self._submissions.values() if ready_at > now)
+        return {**self.stats, "judging": judging, "tokens": len(self._tokens), "config": asdict(self.config)}
+
+
+def create_app(simulator: HojSimulator) -> FastAPI:
+    app = FastAPI(title="HOJ simulator")
+
+    async def guard(request: Request) -> Optional[JSONResponse]:
+        simulator.stats["requests"] += 1
+        rejected = await simulator.inject()
+        if rejected is not None:
+            return rejected
+        if not simulator.token_valid(request.headers.get("authorization")):
+            simulator.stats["unauthorized"] += 1
+            return JSONResponse({"status": 401, "msg": "请先登录"}, status_code=401)
+        return None
+
+    @app.post("/api/login")
+    async def login(request: Request):
+        simulator.stats["requests"] += 1
+        rejected = await simulator.inject()
+        if rejected is not None:
+            return rejected
+        body = await request.json()
+        if not body.get("username") or not body.get("password"):
+            return JSONResponse({"status": 400, "msg": "用户名或密码为空"}, status_code=400)
+        token = simulator.login()
+        return JSONResponse({"status": 200, "msg": "success", "data": {}}, headers={"authorization": token})
+
+    @app.post("/api/submit-problem-judge")
+    async def submit(request: Request):
+        rejected = await guard(request)
+        if rejected is not None:
+            return rejected
+        body = await request.json()
+        if not body.get("pid") or not body.get("code"):
+            return JSONResponse({"status": 400, "msg": "pid / code 不能为空"}, status_code=400)
+        return {"status": 200, "data": {"submitId": simulator.submit()}}
+
+    @app.get("/api/get-submission-detail")
+    async def detail(request: Request, submitId: int):
+        rejected = await guard(request)
+        if rejected is not None:
+            return rejected
+        simulator.stats["detail_queries"] += 1
+        status = simulator.status(submitId)
+        if status is None:
+            return JSONResponse({"status": 404, "msg": "提交不存在"}, status_code=404)
+        return {"status": 200, "data": {"submission": {"submitId": submitId, "status": status}}}
+
+    @app.post("/api/check-submissions-status")
+    async def batch_status(request: Request):
+        if not simulator.config.batch_status:
+            return JSONResponse({"status": 404, "msg": "not found"}, status_code=404)
+        rejected = await guard(request)
+        if rejected is not None:
+            return rejected
+        body = await request.json()
+        simulator.stats["batch_queries"] += 1
+        data = {}
+        for submit_id in body.get("submitIds") or []:
+            status = simulator.status(int(submit_id))
+            if status is not None:
+                data[str(submit_id)] = {"submitId": submit_id, "status": status}
+        return {"status": 200, "data": data}
+
+    @app.get("/sim/stats")
+    def stats():
+        return simulator.snapshot()
+
+    @app.put("/sim/config")
+    async def update_config(request: Request):
+        try:
+            simulator.config.update(await request.json())
+        except ValueError as e:
+            return JSONResponse({"msg": str(e)}, status_code=400)
+        return asdict(simulator.config)
+
+    return app
+
+
+def add_sim_arguments(parser: argparse.ArgumentParser):
+    """模拟器参数，judge 压测驱动启动模拟器时原样转发"""
+    defaults = SimConfig()
+    parser.add_argument("--latency", default=defaults.latency, help=parse_latency.__doc__.strip())
+    parser.add_argument("--judge-workers", type=int, default=defaults.judge_workers)
+    parser.add_argument("--accept-rate", type=float, default=defaults.accept_rate)
+    parser.add_argument("--system-error-rate", type=float, default=defaults.system_error_rate)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--timeout-rate", type=float, default=defaults.timeout_rate)
+    parser.add_argument("--hang", type=float, default=defaults.hang)
+    parser.add_argument("--rate-limit", type=float, default=defaults.rate_limit)
+    parser.add_argument("--token-ttl", type=float, default=defaults.token_ttl)
+    parser.add_argument("--request-latency", type=float, default=defaults.request_latency)
+    parser.add_argument("--no-batch-status", dest="batch_status", action="store_false")
+
+
+def config_from_args(args: argparse.Namespace) -> SimConfig:
+    config = SimConfig(**{f.name: getattr(args, f.name) for f in fields(SimConfig)})
+    parse_latency(config.latency)
+    return config
+
+
+def sim_command_args(config: SimConfig) -> List[str]:
+    """SimConfig -> 命令行参数"""
+    args = []
+    for f in fields(SimConfig):
+        value = getattr(config, f.name)
+        if f.name == "batch_status":
+            if not value:
+                args.append("--no-batch-status")
+            continue
+        args += [f"--{f.name.replace('_', '-')}", str(value)]
+    return args
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地 HOJ 模拟器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--seed", type=int, default=None)
+    add_sim_arguments(parser)
+    args = parser.parse_args()
+    simulator = HojSimulator(config_from_args(args), args.seed)
+    uvicorn.run(create_app(simulator), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+判题链路压测：提交编程题 -> JudgeDispatcher -> HojClient -> VerdictPoller -> 状态推送，
+测量从发出提交到收到最终结果的延迟和持续的判题吞吐（verdicts/s）
+
+    DATABASE_URL=sqlite:///./bench.db python -m bench.seed --rounds 4
+    DATABASE_URL=sqlite:///./bench.db python -m bench.judge --rate 20 --duration 60 --latency lognormal:1.0,0.6 \\
+        --judge-workers 16 --token-ttl 20 --output bench/results/judge.json
+
+默认在本地启动 HOJ 模拟器（bench.hoj_sim，模拟器参数原样转发）和 --workers 个 uvicorn worker；
+结果通过 /submissions/events 的 SSE 推送接收。多 worker（含 serve.py 部署）时，其他 worker 判完的结果
+由 relay_submission_events 经数据库转发，最多晚 SUBMISSION_EVENT_RELAY_INTERVAL 秒，计入测得的延迟；
+/monitor 统计只来自响应该请求的那个 worker。
+提交按 --rate 开环匀速发出，不等待上一个结果。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.dataset import ADMIN_NAME, DEFAULT_PASSWORD, USER_PREFIX
+from bench.hoj_sim import add_sim_arguments, config_from_args, sim_command_args
+from bench.load import RouteStats, free_port, git_revision, percentile, start_server, summarize, wait_ready
+
+FINAL_STATUSES = {"accepted", "rejected", "wrong", "error"}
+
+
+class JudgeRun:
+    """一次压测中每个提交的发出时间、接口结果和最终状态到达时间"""
+
+    def __init__(self):
+        self.sent_at: Dict[int, float] = {}
+        self.verdicts: Dict[int, tuple] = {}  # submission_id -> (到达时间, 状态)
+        self.submit_stats = RouteStats()
+        self.rejected: Counter = Counter()
+        self.verdict_event = asyncio.Event()
+
+    def on_event(self, submission_id: int, status: str):
+        if status in FINAL_STATUSES and submission_id not in self.verdicts:
+            self.verdicts[submission_id] = (time.monotonic(), status)
+            self.verdict_event.set()
+
+    def outstanding(self) -> int:
+        return sum(1 for i in self.sent_at if i not in self.verdicts)
+
+
+async def follow_events(client: httpx.AsyncClient, token: str, run: JudgeRun, ready: asyncio.Event):
+    """订阅某个用户的全部提交状态（SSE），直到被取消"""
+    headers = {"Authorization": f"Bearer {token}", "Accept": "text/event-stream"}
+    while True:
+        try:
+            async with client.stream("GET", "/submissions/events", headers=headers, timeout=None) as response:
+                ready.set()
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        event = json.loads(line[5:])
+                        if "submission_id" in event:
+                            run.on_event(event["submission_id"], event["status"])
+        except httpx.HTTPError:
+            await asyncio.sleep(0.5)
+
+
+async def login_all(client: httpx.AsyncClient, users: int, sessions: int, password: str) -> List[str]:
+    semaphore = asyncio.Semaphore(20)
+
+    async def one(i: int) -> Optional[str]:
+        async with semaphore:
+            response = await client.post("/users/login", json={"name": f"{USER_PREFIX}{i % users}",
+                                                                "password": password})
+            body = response.json()
+            return body.get("data") if body.get("code") == 200 else None
+
+    return [t for t in await asyncio.gather(*(one(i) for i in range(sessions))) if t]
+
+
+async def submit_one(client: httpx.AsyncClient, token: str, problem_id: int, run: JudgeRun):
+    # 每次提交的代码都不同，不会被当作重复提交
+    code = f"# {uuid.uuid4().hex}\nprint(sum(map(int, input().split())))\n"
+    start = time.monotonic()
+    status = None
+    try:
+        response = await client.post("/submissions/submit", json={"problem_id": problem_id, "user_answer": code},
+                                     headers={"Authorization": f"Bearer {token}"})
+        status = response.status_code
+        body = response.json()
+        if status == 200 and body.get("code") == 200:
+            submission_id = body["data"]["id"]
+            run.sent_at[submission_id] = start
+            if body["data"]["status"] in FINAL_STATUSES:
+                run.on_event(submission_id, body["data"]["status"])
+        else:
+            run.rejected[str(body.get("code", status))] += 1
+    except httpx.HTTPError:
+        run.rejected["exception"] += 1
+    run.submit_stats.record(time.monotonic() - start, status)
+
+
+async def drive(client: httpx.AsyncClient, tokens: List[str], problems: List[int], rate: float,
+                duration: float, run: JudgeRun, rng: random.Random):
+    """按固定速率开环提交"""
+    tasks = []
+    started = time.monotonic()
+    for n in range(int(rate * duration)):
+        delay = started + n / rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(submit_one(client, rng.choice(tokens), rng.choice(problems), run)))
+    await asyncio.gather(*tasks)
+
+
+async def wait_verdicts(run: JudgeRun, grace: float):
+    deadline = time.monotonic() + grace
+    while run.outstanding() and time.monotonic() < deadline:
+        run.verdict_event.clear()
+        try:
+            await asyncio.wait_for(run.verdict_event.wait(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            break
+
+
+def report(run: JudgeRun, duration: float) -> dict:
+    latencies = sorted(run.verdicts[i][0] - sent for i, sent in run.sent_at.items() if i in run.verdicts)
+    ms = lambda v: round(v * 1000, 3)
+    arrivals = sorted(t for i, (t, _) in run.verdicts.items() if i in run.sent_at)
+    # 持续吞吐：第一个到最后一个结果之间的平均速率
+    span = arrivals[-1] - arrivals[0] if len(arrivals) > 1 else 0.0
+    return {
+        "submitted": len(run.sent_at) + sum(run.rejected.values()),
+        "accepted_by_api": len(run.sent_at),
+        "rejected_by_api": dict(run.rejected),
+        "submit": summarize(run.submit_stats, duration),
+        "verdicts": len(latencies),
+        "missing_verdicts": run.outstanding(),
+        "statuses": dict(Counter(status for i, (_, status) in run.verdicts.items() if i in run.sent_at)),
+        "verdicts_per_second": round((len(arrivals) - 1) / span, 2) if span else None,
+        "verdict_latency": {
+            "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        },
+    }
+
+
+async def fetch_json(client: httpx.AsyncClient, url: str, token: Optional[str] = None) -> Optional[dict]:
+    try:
+        response = await client.get(url, headers={"Authorization": f"Bearer {token}"} if token else None)
+        return response.json() if response.status_code == 200 else None
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+async def main_async(args) -> dict:
+    processes: List[subprocess.Popen] = []
+    hoj_url = args.hoj_url
+    base_url = args.base_url
+    try:
+        if hoj_url is None:
+            port = free_port()
+            hoj_url = f"http://127.0.0.1:{port}"
+            command = [sys.executable, "-m", "bench.hoj_sim", "--port", str(port)]
+            if args.sim_seed is not None:
+                command += ["--seed", str(args.sim_seed)]
+            processes.append(subprocess.Popen(command + sim_command_args(config_from_args(args))))
+            await wait_ready(hoj_url, path="/sim/stats")
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            processes.append(start_server(port, args.workers, {"HOJ_BASE_URL": hoj_url}))
+        await wait_ready(base_url)
+
+        run = JudgeRun()
+        limits = httpx.Limits(max_connections=args.sessions + args.connections)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client, \
+                httpx.AsyncClient(base_url=hoj_url, timeout=5) as hoj:
+            tokens = await login_all(client, args.users, args.sessions, args.password)
+            if not tokens:
+                raise SystemExit("无法登录压测用户，请先运行 python -m bench.seed 并确认 --password 一致")
+            response = await client.get("/problems/", params={"problem_type": "coding", "page_size": 100})
+            problems = [p["id"] for p in response.json().get("data") or []]
+            if not problems:
+                raise SystemExit("库中没有编程题")
+
+            ready = [asyncio.Event() for _ in tokens]
+            followers = [asyncio.create_task(follow_events(client, t, run, r)) for t, r in zip(tokens, ready)]
+            await asyncio.wait_for(asyncio.gather(*(r.wait() for r in ready)), 30)
+            started = time.monotonic()
+            await drive(client, tokens, problems, args.rate, args.duration, run, random.Random(args.seed))
+            elapsed = time.monotonic() - started
+            await wait_verdicts(run, args.grace)
+            for task in followers:
+                task.cancel()
+            await asyncio.gather(*followers, return_exceptions=True)
+
+            # /monitor 仅限 admin；bench.seed 建的 admin 与压测用户密码相同
+            response = await client.post("/users/login", json={"name": ADMIN_NAME, "password": args.password})
+            admin_token = response.json().get("data") if response.status_code == 200 else None
+            judge = await fetch_json(client, "/monitor/judge", admin_token)
+            hoj_client = await fetch_json(client, "/monitor/hoj", admin_token)
+            simulator = await fetch_json(hoj, "/sim/stats")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "database": os.getenv("DATABASE_URL", "").split("://")[0] or None,
+            "rate": args.rate,
+            "duration": round(elapsed, 3),
+            "sessions": len(tokens),
+            "workers": args.workers if args.base_url is None else None,
+        },
+        "result": report(run, elapsed),
+        "judge": (judge or {}).get("data"),
+        "hoj_client": (hoj_client or {}).get("data"),
+        "simulator": simulator,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="判题链路压测（提交到出结果）")
+    parser.add_argument("--base-url", default=None, help="压测已运行的服务（单进程或 serve.py 多 worker）；不指定时本地启动")
+    parser.add_argument("--workers", type=int, default=1, help="本地启动时的 uvicorn worker 数")
+    parser.add_argument("--hoj-url", default=None, help="已运行的 HOJ 模拟器；不指定时本地启动")
+    parser.add_argument("--rate", type=float, default=10, help="每秒提交数")
+    parser.add_argument("--duration", type=float, default=30, help="发出提交的时长（秒）")
+    parser.add_argument("--grace", type=float, default=60, help="提交结束后等待剩余结果的最长时间（秒）")
+    parser.add_argument("--users", type=int, default=10000, help="种子用户数，与 bench.seed 一致")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--sessions", type=int, default=20, help="参与提交的用户数（每个用户一条 SSE 连接）")
+    parser.add_argument("--connections", type=int, default=100, help="提交请求的最大连接数")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sim-seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认 bench/results/judge-<时间>.json")
+    add_sim_arguments(parser.add_argument_group("HOJ 模拟器"))
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    output = args.output or os.path.join("bench", "results", f"judge-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    summary = result["result"]
+    latency = summary["verdict_latency"]
+    print(f"提交 {summary['submitted']}，出结果 {summary['verdicts']}，缺失 {summary['missing_verdicts']}，"
+          f"{summary['verdicts_per_second']} verdicts/s，延迟 p50 {latency['p50_ms']} ms / p95 {latency['p95_ms']} ms"
+          f" / p99 {latency['p99_ms']} ms；结果写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
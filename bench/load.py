@@ -0,0 +1,358 @@
+"""
+端到端 HTTP 压测：按比例混合登录、题目浏览、搜索、提交、提交历史、排行榜请求，
+在固定并发下持续一段时间，按路由统计吞吐与 p50/p95/p99 延迟，结果写成 JSON
+
+    DATABASE_URL=sqlite:///./bench.db python -m bench.seed --rounds 4
+    DATABASE_URL=sqlite:///./bench.db python -m bench.load --concurrency 50 --duration 30 --output bench/results/head.json
+    python -m bench.load --base-url http://10.0.0.5:8000 --compare bench/results/head.json
+
+不指定 --base-url 时用当前环境变量（DATABASE_URL 等）启动一个 uvicorn 子进程；
+HOJ_BASE_URL 默认指向一个不存在的端口，提交负载只使用选择题和填空题，不经过判题机。
+--compare 与旧结果逐路由对比，p95 变慢或吞吐下降超过 --tolerance 时以状态码 1 退出。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from bench.dataset import DEFAULT_PASSWORD, USER_PREFIX, WORDS
+
+DEFAULT_MIX = "login=5,browse=35,detail=20,search=10,submit=15,history=10,scoreboard=5"
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+    def record(self, elapsed: float, status: Optional[int]):
+        self.latencies.append(elapsed)
+        if status is None:
+            self.errors += 1
+            self.statuses["exception"] += 1
+        else:
+            self.statuses[str(status)] += 1
+            if status >= 400:
+                self.errors += 1
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩法，q 取 0~100"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(stats: RouteStats, duration: float) -> dict:
+    values = sorted(stats.latencies)
+    ms = lambda v: round(v * 1000, 3)
+    return {
+        "count": len(values),
+        "errors": stats.errors,
+        "statuses": dict(stats.statuses),
+        "rps": round(len(values) / duration, 2),
+        "mean_ms": ms(sum(values) / len(values)) if values else 0.0,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+    }
+
+
+class LoadContext:
+    """压测期间共享的数据：登录好的 token、各类型题目 id"""
+
+    def __init__(self, client: httpx.AsyncClient, users: int, password: str, rng: random.Random):
+        self.client = client
+        self.users = users
+        self.password = password
+        self.rng = rng
+        self.tokens: List[str] = []
+        self.problems: Dict[str, List[int]] = {}
+        self.stats: Dict[str, RouteStats] = defaultdict(RouteStats)
+        self.recording = False
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """发送请求并按 route（路由模板）记录耗时；预热阶段不记录"""
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            pass
+        if self.recording:
+            self.stats[route].record(time.perf_counter() - start, response.status_code if response else None)
+        return response
+
+    def user_name(self) -> str:
+        return f"{USER_PREFIX}{self.rng.randrange(self.users)}"
+
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    def problem_id(self, *types: str) -> int:
+        candidates = [pid for t in types or self.problems for pid in self.problems.get(t, [])]
+        return self.rng.choice(candidates)
+
+    async def login(self, name: str) -> Optional[str]:
+        response = await self.request("POST /users/login", "POST", "/users/login",
+                                      json={"name": name, "password": self.password})
+        if response is None or response.status_code != 200:
+            return None
+        body = response.json()
+        return body.get("data") if body.get("code") == 200 else None
+
+    async def prepare(self, sessions: int, concurrency: int):
+        """登录一批用户拿 token，按类型收集题目 id；不计入结果"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            async with semaphore:
+                return await self.login(f"{USER_PREFIX}{i % self.users}")
+
+        self.tokens = [t for t in await asyncio.gather(*(one(i) for i in range(sessions))) if t]
+        if not self.tokens:
+            raise SystemExit("无法登录压测用户，请先运行 python -m bench.seed 并确认 --password 一致")
+        for problem_type in ("choice", "fill", "coding"):
+            response = await self.client.get("/problems/", params={"problem_type": problem_type, "page_size": 100})
+            self.problems[problem_type] = [p["id"] for p in response.json().get("data") or []]
+        if not self.problems["choice"] and not self.problems["fill"]:
+            raise SystemExit("库中没有选择题或填空题，无法运行提交负载")
+
+
+# ---------------- 负载 ----------------
+async def login_storm(ctx: LoadContext):
+    await ctx.login(ctx.user_name())
+
+
+async def browse(ctx: LoadContext):
+    """题目列表：首页 + 按游标往后翻一页，偶尔按类型筛选"""
+    params = {"page_size": 20}
+    if ctx.rng.random() < 0.3:
+        params["problem_type"] = ctx.rng.choice(["choice", "fill", "coding"])
+    response = await ctx.request("GET /problems/", "GET", "/problems/", params=params)
+    if response is not None and response.status_code == 200:
+        cursor = response.json().get("next_cursor")
+        if cursor:
+            await ctx.request("GET /problems/?cursor", "GET", "/problems/", params={**params, "cursor": cursor})
+
+
+async def detail(ctx: LoadContext):
+    await ctx.request("GET /problems/{id}", "GET", f"/problems/{ctx.problem_id()}")
+
+
+async def search(ctx: LoadContext):
+    name = " ".join(ctx.rng.sample(WORDS, ctx.rng.choice([1, 1, 2])))
+    await ctx.request("GET /problems/?name", "GET", "/problems/", params={"name": name, "page_size": 20})
+
+
+async def submit(ctx: LoadContext):
+    problem_id = ctx.problem_id("choice", "fill")
+    answer = ctx.rng.choice(["A", "B", "A,C", str(ctx.rng.randrange(100))])
+    await ctx.request("POST /submissions/submit", "POST", "/submissions/submit",
+                      json={"problem_id": problem_id, "user_answer": answer}, headers=ctx.auth())
+
+
+async def history(ctx: LoadContext):
+    if ctx.rng.random() < 0.5:
+        await ctx.request("GET /submissions/user", "GET", "/submissions/user", headers=ctx.auth())
+    else:
+        await ctx.request("GET /submissions/user/{problem_id}", "GET", f"/submissions/user/{ctx.problem_id()}",
+                          headers=ctx.auth())
+
+
+async def scoreboard(ctx: LoadContext):
+    await ctx.request("GET /scoreboard/", "GET", "/scoreboard/", params={"page_size": 50})
+
+
+WORKLOADS: Dict[str, Callable] = {
+    "login": login_storm,
+    "browse": browse,
+    "detail": detail,
+    "search": search,
+    "submit": submit,
+    "history": history,
+    "scoreboard": scoreboard,
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in WORKLOADS:
+            raise SystemExit(f"未知负载 {name}，可选：{', '.join(WORKLOADS)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise SystemExit("--mix 至少需要一个权重大于 0 的负载")
+    return mix
+
+
+async def run_load(ctx: LoadContext, mix: Dict[str, float], concurrency: int, duration: float, warmup: float):
+    """闭环压测：concurrency 个虚拟用户各自按权重挑选负载，一个请求结束后立即发下一个"""
+    names, weights = list(mix), list(mix.values())
+    deadline = time.monotonic() + warmup + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            await WORKLOADS[ctx.rng.choices(names, weights)[0]](ctx)
+
+    async def start_recording():
+        await asyncio.sleep(warmup)
+        ctx.recording = True
+
+    await asyncio.gather(start_recording(), *(worker() for _ in range(concurrency)))
+
+
+# ---------------- 被测服务 ----------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workers: int, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    env = {**os.environ, **(env or {})}
+    # 未指定判题机时指向一个不存在的地址，避免意外请求真实 HOJ
+    env.setdefault("HOJ_BASE_URL", f"http://127.0.0.1:{free_port()}")
+    command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_ready(base_url: str, timeout: float = 60, path: str = "/health"):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(path)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"服务 {base_url} 在 {timeout} 秒内未就绪")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------- 结果对比 ----------------
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """逐路由对比 p95 和吞吐，返回超出容忍度的退化项"""
+    regressions = []
+    for route, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before or not before["count"]:
+            continue
+        p95_change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        rps_change = (now["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0.0
+        print(f"{route:36} p95 {before['p95_ms']:>9.2f} -> {now['p95_ms']:>9.2f} ms ({p95_change:+.1%})  "
+              f"rps {before['rps']:>8.1f} -> {now['rps']:>8.1f} ({rps_change:+.1%})")
+        if p95_change > tolerance:
+            regressions.append(f"{route} p95 {p95_change:+.1%}")
+        if rps_change < -tolerance:
+            regressions.append(f"{route} rps {rps_change:+.1%}")
+    return regressions
+
+
+async def main_async(args) -> dict:
+    mix = parse_mix(args.mix)
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.workers)
+    try:
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            ctx = LoadContext(client, args.users, args.password, random.Random(args.seed))
+            await ctx.prepare(args.sessions, args.concurrency)
+            started = time.monotonic()
+            await run_load(ctx, mix, args.concurrency, args.duration, args.warmup)
+            elapsed = time.monotonic() - started - args.warmup
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    routes = {route: summarize(stats, elapsed) for route, stats in sorted(ctx.stats.items())}
+    total = RouteStats()
+    for stats in ctx.stats.values():
+        total.latencies.extend(stats.latencies)
+        total.statuses.update(stats.statuses)
+        total.errors += stats.errors
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "base_url": base_url if args.base_url else None,
+            "database": os.getenv("DATABASE_URL", "").split("://")[0] or None,
+            "workers": None if args.base_url else args.workers,
+            "concurrency": args.concurrency,
+            "duration": round(elapsed, 3),
+            "warmup": args.warmup,
+            "mix": mix,
+            "sessions": len(ctx.tokens),
+        },
+        "total": summarize(total, elapsed),
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端 HTTP 压测")
+    parser.add_argument("--base-url", default=None, help="压测已运行的服务；不指定时本地启动 uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="本地启动时的 uvicorn worker 数")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="计入结果的时长（秒）")
+    parser.add_argument("--warmup", type=float, default=3, help="预热时长（秒），不计入结果")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"负载权重，默认 {DEFAULT_MIX}")
+    parser.add_argument("--users", type=int, default=10000, help="种子用户数，与 bench.seed 一致")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--sessions", type=int, default=200, help="预先登录的用户数（提交、历史负载使用）")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认 bench/results/load-<时间>.json")
+    parser.add_argument("--compare", default=None, help="与之前的结果 JSON 对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="对比时允许的退化比例")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    output = args.output or os.path.join("bench", "results", f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    total = report["total"]
+    print(f"{total['count']} 个请求，{total['rps']} req/s，p50 {total['p50_ms']} ms，p95 {total['p95_ms']} ms，"
+          f"p99 {total['p99_ms']} ms，错误 {total['errors']}；结果写入 {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("性能退化：" + "；".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
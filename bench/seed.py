@@ -0,0 +1,151 @@
+"""
+压测数据：按给定规模向 DATABASE_URL 指向的库写入用户、题目、提交
+
+    DATABASE_URL=sqlite:///./bench.db python -m bench.seed --users 10000 --problems 5000 --submissions 100000
+
+所有用户密码相同（--password），哈希只算一次；提交全部为已出结果的状态，
+启动时不会触发待判题恢复。写完后重建排行榜汇总表。
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlmodel import SQLModel
+
+from bench.dataset import ADMIN_NAME, DEFAULT_PASSWORD, USER_PREFIX, WORDS
+from config import engine, session_maker, SCOREBOARD_PENALTY
+from mapper.ScoreboardMapper import ScoreboardMapper
+from migrations import runner as migrations
+from pojo.Problem import Problem, ProblemType
+from pojo.Scoreboard import ProblemStat, UserProblemState, UserScore
+from pojo.Submission import Submission
+from pojo.User import User
+from utils.security import hash_password, pwd_context
+
+CHUNK_SIZE = 5000
+FINAL_STATUSES = ["accepted", "wrong", "wrong", "rejected", "error"]
+
+
+def chunks(rows: Iterator[dict], size: int = CHUNK_SIZE) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def user_rows(count: int, password_hash: str) -> Iterator[dict]:
+    now = datetime.utcnow()
+    yield {"name": ADMIN_NAME, "password": password_hash, "create_at": now, "update_at": now}
+    for i in range(count):
+        yield {"name": f"{USER_PREFIX}{i}", "password": password_hash, "create_at": now, "update_at": now}
+
+
+def problem_rows(count: int, rng: random.Random) -> Iterator[dict]:
+    types = [ProblemType.CHOICE, ProblemType.FILL, ProblemType.CODING]
+    for i in range(count):
+        problem_type = types[i % 3]
+        row = {
+            "title": f"{' '.join(rng.sample(WORDS, 3))} {i}",
+            "type": problem_type,
+            "code_id": 1000 + i if problem_type == ProblemType.CODING else 0,
+            "description": "题目描述 " * rng.randint(20, 200),
+            "options": None,
+            "answer": None,
+        }
+        if problem_type == ProblemType.CHOICE:
+            row["options"] = ["选项 A", "选项 B", "选项 C", "选项 D"]
+            row["answer"] = "A"
+        elif problem_type == ProblemType.FILL:
+            row["answer"] = str(i)
+        yield row
+
+
+def submission_rows(count: int, user_ids: List[int], problem_ids: List[int],
+                    rng: random.Random) -> Iterator[dict]:
+    # 时间在过去 30 天内递增
+    start = datetime.utcnow() - timedelta(days=30)
+    step = timedelta(days=30) / max(count, 1)
+    for i in range(count):
+        created = start + step * i
+        yield {
+            "problem_id": rng.choice(problem_ids),
+            "user_id": rng.choice(user_ids),
+            "user_answer": "print(input())" if i % 3 == 2 else "A",
+            "status": rng.choice(FINAL_STATUSES),
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def seed_password_hash(password: str, rounds: Optional[int]) -> str:
+    """压测时可以用较小的 cost 生成种子哈希，登录时会按当前 BCRYPT_ROUNDS 自动重算"""
+    if rounds is None:
+        return hash_password(password)
+    return pwd_context.hash(password, rounds=rounds)
+
+
+def reset(conn):
+    for model in (UserProblemState, UserScore, ProblemStat, Submission, Problem, User):
+        conn.execute(delete(model))
+
+
+def seed(users: int, problems: int, submissions: int, password: str, rounds: Optional[int], seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    SQLModel.metadata.create_all(engine)
+    migrations.upgrade(engine)
+    timings = {}
+    password_hash = seed_password_hash(password, rounds)
+
+    with engine.begin() as conn:
+        start = time.perf_counter()
+        reset(conn)
+        timings["reset"] = time.perf_counter() - start
+
+    def load(name: str, model, rows: Iterator[dict]):
+        start = time.perf_counter()
+        # 每批一个事务，executemany 多行插入
+        for batch in chunks(rows):
+            with engine.begin() as conn:
+                conn.execute(insert(model), batch)
+        timings[name] = time.perf_counter() - start
+
+    load("users", User, user_rows(users, password_hash))
+    load("problems", Problem, problem_rows(problems, rng))
+    # 清空后自增 id 不一定从 1 开始，按实际 id 生成提交
+    with engine.connect() as conn:
+        user_ids = list(conn.scalars(select(User.id).where(User.name != ADMIN_NAME)))
+        problem_ids = list(conn.scalars(select(Problem.id)))
+    load("submissions", Submission, submission_rows(submissions, user_ids, problem_ids, rng))
+
+    start = time.perf_counter()
+    with session_maker() as session:
+        ScoreboardMapper.rebuild(session, SCOREBOARD_PENALTY)
+        session.commit()
+    timings["scoreboard"] = time.perf_counter() - start
+    return {k: round(v, 3) for k, v in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="写入压测数据（会清空 users / problem / submission 及排行榜表）")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--problems", type=int, default=5000)
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--rounds", type=int, default=None, help="种子密码的 bcrypt cost，默认 BCRYPT_ROUNDS")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    timings = seed(args.users, args.problems, args.submissions, args.password, args.rounds, args.seed)
+    print(json.dumps({"users": args.users, "problems": args.problems, "submissions": args.submissions,
+                      "seconds": timings}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+响应序列化基准：同一份 Result 数据，对比
+- 默认路径：路由声明 response_model=Result[...]，FastAPI 校验后用标准库 json 编码
+- 快速路径：Result.to_response()，orjson 直接编码，跳过校验；
+  提交历史的快速路径用 dict 行，对应 SubmissionMapper 的列级查询
+
+    python -m bench.serialization --rows 1000 --repeat 200
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from pojo.Problem import ProblemSummary, ProblemType
+from pojo.Result import Result
+from pojo.Submission import Submission
+
+
+def make_data(rows: int):
+    now = datetime.utcnow()
+    types = list(ProblemType)
+    problems = [ProblemSummary.model_construct(id=i, title=f"题目 {i} Problem", type=types[i % 3], code_id=1000 + i)
+                for i in range(rows)]
+    submissions = [Submission(id=i, problem_id=i % 50, user_id=1, user_answer="print(input())" * 5,
+                              status="accepted", created_at=now, updated_at=now)
+                   for i in range(rows)]
+    rows = [s.model_dump() for s in submissions]
+    return problems, submissions, rows
+
+
+def make_app(problems, submissions, rows) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/default/problems", response_model=Result[List[ProblemSummary]])
+    def default_problems():
+        return Result.success(data=problems)
+
+    @app.get("/fast/problems", response_model=Result[List[ProblemSummary]])
+    def fast_problems():
+        return Result.success(data=problems).to_response()
+
+    @app.get("/default/submissions", response_model=Result[List[Submission]])
+    def default_submissions():
+        return Result.success(data=submissions)
+
+    @app.get("/fast/submissions", response_model=Result[List[Submission]])
+    def fast_submissions():
+        return Result.success(data=rows).to_response()
+
+    return app
+
+
+def measure(client: TestClient, path: str, repeat: int) -> dict:
+    client.get(path)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        resp = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        resp.raise_for_status()
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "bytes": len(resp.content),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Result 响应序列化基准")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    client = TestClient(make_app(*make_data(args.rows)))
+    report = {"rows": args.rows, "repeat": args.repeat}
+    for kind in ("problems", "submissions"):
+        default = measure(client, f"/default/{kind}", args.repeat)
+        fast = measure(client, f"/fast/{kind}", args.repeat)
+        # 两条路径的输出内容应一致
+        same = client.get(f"/default/{kind}").json() == client.get(f"/fast/{kind}").json()
+        report[kind] = {"default": default, "fast": fast, "same_output": same,
+                        "speedup": round(default["mean_ms"] / fast["mean_ms"], 2)}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from typing import Dict, Iterable, List, Optional
+
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from mapper.ProblemMapper import ProblemMapper, index_after_commit, problem_cache
+from pojo.Problem import Problem, ProblemRead, ProblemCreate, ProblemSummary, ProblemType
+
+
+class AsyncProblemMapper:
+    """ProblemMapper 的异步版本，供 async 路由使用；事务由调用方提交"""
+
+    @staticmethod
+    async def find_by_id(problem_id: int, session: AsyncSession) -> Optional[Problem]:
+        """根据 ID 查找题目"""
+        stmt = select(Problem).where(Problem.id == problem_id)
+        result = await session.exec(stmt)
+        return result.first()
+
+    @staticmethod
+    async def find_read_by_id(problem_id: int, session: AsyncSession) -> Optional[ProblemRead]:
+        """根据 ID 获取题目，读穿透 problem_cache"""
+        async def load() -> Optional[ProblemRead]:
+            problem = await AsyncProblemMapper.find_by_id(problem_id, session)
+            return ProblemMapper.to_read(problem) if problem else None
+        return await problem_cache.aget_or_load(problem_id, load)
+
+    @staticmethod
+    async def find_read_by_ids(problem_ids: Iterable[int], session: AsyncSession) -> Dict[int, ProblemRead]:
+        """批量获取题目：先查 problem_cache，未命中的用一次 IN 查询加载并回填缓存"""
+        found: Dict[int, ProblemRead] = {}
+        missing = []
+        for problem_id in set(problem_ids):
+            problem = problem_cache.get(problem_id)
+            if problem is not None:
+                found[problem_id] = problem
+            else:
+                missing.append(problem_id)
+        if missing:
+            version = problem_cache.version
+            result = await session.exec(select(Problem).where(col(Problem.id).in_(missing)))
+            for problem in result.all():
+                problem = ProblemMapper.to_read(problem)
+                problem_cache.put(problem.id, problem, version)
+                found[problem.id] = problem
+        return found
+
+    @staticmethod
+    async def find_summaries_after(after_id: Optional[int], session: AsyncSession,
+                                   problem_type: Optional[ProblemType] = None,
+                                   limit: int = 21) -> List[ProblemSummary]:
+        """游标分页：按主键升序取 id > after_id 的 limit 条摘要，可按类型过滤"""
+        stmt = ProblemMapper._summary_select(problem_type)
+        if after_id is not None:
+            stmt = stmt.where(Problem.id > after_id)
+        stmt = stmt.order_by(Problem.id).limit(limit)
+        result = await session.exec(stmt)
+        return ProblemMapper._to_summaries(result.all())
+
+    @staticmethod
+    async def create(problem: ProblemCreate, session: AsyncSession) -> ProblemRead:
+        problem = ProblemMapper.from_create(problem)
+        session.add(problem)
+        await session.flush()
+        ProblemMapper.invalidate_cache(problem.id)
+        index_after_commit(problem, session)
+        return ProblemMapper.to_read(problem)
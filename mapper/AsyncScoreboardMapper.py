@@ -0,0 +1,123 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from pojo.Scoreboard import ProblemStat, UserProblemState, UserScore
+from pojo.Submission import Submission
+from pojo.User import User
+from utils.scoring import COUNTED_STATUSES
+
+Pair = Tuple[int, int]
+
+
+class AsyncScoreboardMapper:
+    """排行榜汇总表的读写；事务由调用方提交"""
+
+    @staticmethod
+    def _pair_filter(stmt, user_column, problem_column, pairs: Set[Pair]):
+        # (user_id, problem_id) IN (...) 不是所有数据库都支持，先按两列分别过滤，多出的行由调用方按 pairs 剔除
+        return (stmt.where(col(user_column).in_({u for u, _ in pairs}))
+                    .where(col(problem_column).in_({p for _, p in pairs})))
+
+    @staticmethod
+    async def find_owners(submission_ids: Iterable[int], session: AsyncSession) -> Set[Pair]:
+        """提交 id -> 涉及的 (user_id, problem_id)"""
+        submission_ids = list(submission_ids)
+        if not submission_ids:
+            return set()
+        stmt = select(Submission.user_id, Submission.problem_id).where(col(Submission.id).in_(submission_ids))
+        result = await session.exec(stmt)
+        return set(result.all())
+
+    @staticmethod
+    async def find_counted_rows(pairs: Set[Pair], session: AsyncSession) -> List[Tuple[int, int, str, datetime]]:
+        """
+        这些 (用户, 题目) 下计入排行榜的提交，按 id 升序；走 ix_submission_user_problem
+        须在 lock_rows 之后调用；用加锁读（FOR SHARE）读最新提交的数据，而不是事务开始时的快照
+        """
+        stmt = select(Submission.user_id, Submission.problem_id, Submission.status, Submission.created_at)
+        stmt = AsyncScoreboardMapper._pair_filter(stmt, Submission.user_id, Submission.problem_id, pairs)
+        stmt = stmt.where(col(Submission.status).in_(COUNTED_STATUSES)).order_by(Submission.id)
+        result = await session.exec(stmt.with_for_update(read=True))
+        return [row for row in result.all() if (row[0], row[1]) in pairs]
+
+    @staticmethod
+    async def _ensure(table, key_columns: Tuple[str, ...], keys: List[tuple], session: AsyncSession) -> None:
+        """
+        补齐缺失的汇总行（其余列取默认值 0），已存在的不变
+        MySQL 用 ON DUPLICATE KEY UPDATE：已存在的行直接加排他锁（INSERT IGNORE 只加共享锁，随后 FOR UPDATE 升级会死锁）
+        """
+        if not keys:
+            return
+        rows = [dict(zip(key_columns, key)) for key in sorted(keys)]
+        dialect = session.bind.dialect.name
+        if dialect in ("mysql", "mariadb"):
+            stmt = mysql.insert(table)
+            stmt = stmt.on_duplicate_key_update({key_columns[0]: stmt.inserted[key_columns[0]]})
+        elif dialect == "postgresql":
+            stmt = postgresql.insert(table).on_conflict_do_nothing()
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(table).on_conflict_do_nothing()
+        else:
+            stmt = insert(table)
+        await session.execute(stmt, rows)
+
+    @staticmethod
+    async def lock_rows(pairs: Set[Pair], session: AsyncSession) -> Tuple[Dict[Pair, UserProblemState],
+                                                                         Dict[int, UserScore], Dict[int, ProblemStat]]:
+        """
+        增量更新用：先补齐缺失的汇总行，再加行锁（FOR UPDATE）读出，防止并发事务互相覆盖计数
+        三张表、表内按主键，均按固定顺序加锁；同一事务内重复调用只会重读已持有锁的行
+        """
+        user_ids = {u for u, _ in pairs}
+        problem_ids = {p for _, p in pairs}
+        await AsyncScoreboardMapper._ensure(UserProblemState.__table__, ("user_id", "problem_id"), list(pairs), session)
+        await AsyncScoreboardMapper._ensure(UserScore.__table__, ("user_id",), [(u,) for u in user_ids], session)
+        await AsyncScoreboardMapper._ensure(ProblemStat.__table__, ("problem_id",), [(p,) for p in problem_ids], session)
+
+        stmt = AsyncScoreboardMapper._pair_filter(select(UserProblemState), UserProblemState.user_id,
+                                                  UserProblemState.problem_id, pairs)
+        stmt = stmt.order_by(UserProblemState.user_id, UserProblemState.problem_id).with_for_update().execution_options(populate_existing=True)
+        states = {(s.user_id, s.problem_id): s for s in (await session.exec(stmt)).all()
+                  if (s.user_id, s.problem_id) in pairs}
+        stmt = select(UserScore).where(col(UserScore.user_id).in_(user_ids)).order_by(UserScore.user_id)
+        users = {s.user_id: s for s in (await session.exec(stmt.with_for_update().execution_options(populate_existing=True))).all()}
+        stmt = select(ProblemStat).where(col(ProblemStat.problem_id).in_(problem_ids)).order_by(ProblemStat.problem_id)
+        problems = {s.problem_id: s for s in (await session.exec(stmt.with_for_update().execution_options(populate_existing=True))).all()}
+        return states, users, problems
+
+    @staticmethod
+    async def find_last_accept(user_ids: Set[int], session: AsyncSession) -> Dict[int, Optional[datetime]]:
+        """每个用户最近一次首次通过某题的时间（排行榜同分时先达到的排前面）"""
+        stmt = (
+            select(UserProblemState.user_id, func.max(UserProblemState.first_accept_at))
+            .where(col(UserProblemState.user_id).in_(user_ids))
+            .group_by(UserProblemState.user_id)
+        )
+        result = await session.exec(stmt)
+        return dict(result.all())
+
+    @staticmethod
+    async def delete_pair_state(state: UserProblemState, session: AsyncSession) -> None:
+        await session.delete(state)
+
+    @staticmethod
+    async def find_all_user_scores(session: AsyncSession) -> List[UserScore]:
+        result = await session.exec(select(UserScore).where(UserScore.attempts > 0))
+        return list(result.all())
+
+    @staticmethod
+    async def find_all_problem_stats(session: AsyncSession) -> List[ProblemStat]:
+        result = await session.exec(select(ProblemStat))
+        return list(result.all())
+
+    @staticmethod
+    async def find_user_names(user_ids: List[int], session: AsyncSession) -> Dict[int, str]:
+        if not user_ids:
+            return {}
+        result = await session.exec(select(User.id, User.name).where(col(User.id).in_(user_ids)))
+        return dict(result.all())
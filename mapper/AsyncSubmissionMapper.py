@@ -0,0 +1,198 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from mapper.SubmissionMapper import SubmissionMapper
+from pojo.Problem import Problem, ProblemType
+from pojo.Submission import Submission, SubmissionUpdate
+
+
+class AsyncSubmissionMapper:
+    """SubmissionMapper 的异步版本，供 async 路由与判题回写使用；事务由调用方提交"""
+
+    @staticmethod
+    async def insert(submission: Submission, session: AsyncSession) -> Submission:
+        """插入新提交，flush 后即可拿到自增主键"""
+        session.add(submission)
+        await session.flush()
+        return submission
+
+    @staticmethod
+    async def insert_many(submissions: List[Submission], session: AsyncSession) -> List[Submission]:
+        """批量插入，一次 flush；支持 RETURNING 的数据库合并为多行 INSERT"""
+        session.add_all(submissions)
+        await session.flush()
+        return submissions
+
+    @staticmethod
+    async def update(submission: Submission, submission_update: SubmissionUpdate,
+                     session: AsyncSession) -> Submission:
+        """更新提交"""
+        submission = SubmissionMapper.apply_update(submission, submission_update)
+        session.add(submission)
+        await session.flush()
+        return submission
+
+    @staticmethod
+    async def update_status_bulk(statuses: Dict[int, str], session: AsyncSession) -> None:
+        """批量回写判题状态，同一状态的提交合并为一条 UPDATE"""
+        by_status: Dict[str, List[int]] = defaultdict(list)
+        for submission_id, status in statuses.items():
+            by_status[status].append(submission_id)
+        now = datetime.utcnow()
+        for status, ids in by_status.items():
+            stmt = (
+                update(Submission)
+                .where(Submission.id.in_(ids))
+                .values(status=status, updated_at=now)
+            )
+            await session.exec(stmt)
+
+    @staticmethod
+    async def find_by_id(submission_id: int, session: AsyncSession) -> Optional[Submission]:
+        """根据 ID 查找提交"""
+        stmt = select(Submission).where(Submission.id == submission_id)
+        result = await session.exec(stmt)
+        return result.first()
+
+    @staticmethod
+    async def find_by_user_and_problem(user_id: int, problem_id: int, session: AsyncSession,
+                                       before_id: Optional[int] = None, limit: int = 21) -> List[Submission]:
+        """根据 用户ID + 题目ID 查找提交，按 id 倒序游标分页（最新的在前）"""
+        stmt = select(Submission).where(
+            Submission.user_id == user_id,
+            Submission.problem_id == problem_id
+        )
+        if before_id is not None:
+            stmt = stmt.where(Submission.id < before_id)
+        stmt = stmt.order_by(Submission.id.desc()).limit(limit)
+        result = await session.exec(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def find_all_by_user(user_id: int, session: AsyncSession,
+                               before_id: Optional[int] = None, limit: int = 21) -> List[Submission]:
+        """查找某个用户的提交，按 id 倒序游标分页（最新的在前）"""
+        stmt = select(Submission).where(Submission.user_id == user_id)
+        if before_id is not None:
+            stmt = stmt.where(Submission.id < before_id)
+        stmt = stmt.order_by(Submission.id.desc()).limit(limit)
+        result = await session.exec(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def find_changed_since(user_ids: List[int], since: datetime,
+                                 session: AsyncSession) -> List[Tuple[int, int, str]]:
+        """这些用户 since 之后创建或改过状态的提交 (id, user_id, status)；走 ix_submission_user_id"""
+        if not user_ids:
+            return []
+        stmt = (
+            select(Submission.id, Submission.user_id, Submission.status)
+            .where(Submission.user_id.in_(user_ids))
+            .where(Submission.updated_at > since)
+            .order_by(Submission.id)
+        )
+        result = await session.exec(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def find_statuses(user_id: int, submission_ids: List[int], session: AsyncSession) -> Dict[int, str]:
+        """查询某用户若干提交的当前状态，不属于该用户的提交不返回"""
+        if not submission_ids:
+            return {}
+        stmt = (
+            select(Submission.id, Submission.status)
+            .where(Submission.user_id == user_id)
+            .where(Submission.id.in_(submission_ids))
+        )
+        result = await session.exec(stmt)
+        return {submission_id: status for submission_id, status in result.all()}
+
+    @staticmethod
+    async def find_pending_coding(session: AsyncSession, created_before: Optional[datetime] = None,
+                                  stale_before: Optional[datetime] = None) -> List[Tuple[int, int, str, int, Optional[int]]]:
+        """
+        查找仍在等待判题的编程题提交，返回 (submission_id, code_id, user_answer, user_id, hoj_submit_id)
+        created_before: 只查该时间之前创建的（UTC）
+        stale_before: 只查心跳（没有心跳的按创建时间）早于该时间的，即没有存活 worker 负责的
+        """
+        stmt = (
+            select(Submission.id, Problem.code_id, Submission.user_answer, Submission.user_id,
+                   Submission.hoj_submit_id)
+            .join(Problem, Problem.id == Submission.problem_id)
+            .where(Submission.status.in_(("PENDING", "pending")))
+            .where(Problem.type == ProblemType.CODING)
+            .order_by(Submission.id)
+        )
+        if created_before is not None:
+            stmt = stmt.where(Submission.created_at < created_before)
+        if stale_before is not None:
+            stmt = stmt.where(func.coalesce(Submission.judge_heartbeat, Submission.created_at) < stale_before)
+        result = await session.exec(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def set_hoj_submit_id(submission_id: int, submit_id: int, session: AsyncSession) -> None:
+        """记下已送达 HOJ 的提交号"""
+        await session.exec(update(Submission).where(Submission.id == submission_id).values(hoj_submit_id=submit_id))
+
+    @staticmethod
+    async def touch_heartbeat(submission_ids: List[int], owner: str, session: AsyncSession) -> List[int]:
+        """
+        刷新本 worker 负责的 pending 提交的心跳
+        返回其中已被其他 worker 接管的（心跳曾过期、由 leader 重新分配），这些不再刷新
+        """
+        now = datetime.utcnow()
+        lost: List[int] = []
+        for start in range(0, len(submission_ids), 500):
+            chunk = submission_ids[start:start + 500]
+            stmt = (
+                update(Submission)
+                .where(Submission.id.in_(chunk))
+                .where(Submission.status.in_(("PENDING", "pending")))
+                .where(or_(Submission.judge_owner.is_(None), Submission.judge_owner == owner))
+                .values(judge_owner=owner, judge_heartbeat=now)
+            )
+            await session.exec(stmt)
+            result = await session.exec(
+                select(Submission.id)
+                .where(Submission.id.in_(chunk))
+                .where(Submission.status.in_(("PENDING", "pending")))
+                .where(Submission.judge_owner != owner)
+            )
+            lost.extend(result.all())
+        return lost
+
+    @staticmethod
+    async def claim(submission_ids: List[int], owner: str, stale_before: Optional[datetime],
+                    session: AsyncSession) -> List[int]:
+        """
+        恢复用：把 pending 提交改由 owner 负责并返回改到的 id
+        stale_before 不为空时只改心跳仍早于它的，查询之后原 worker 又刷新过心跳的不抢
+        """
+        # 秒级精度：MySQL DATETIME 默认不存小数秒，回读比较时要一致
+        now = datetime.utcnow().replace(microsecond=0)
+        claimed: List[int] = []
+        for start in range(0, len(submission_ids), 500):
+            chunk = submission_ids[start:start + 500]
+            stmt = (
+                update(Submission)
+                .where(Submission.id.in_(chunk))
+                .where(Submission.status.in_(("PENDING", "pending")))
+                .values(judge_owner=owner, judge_heartbeat=now)
+            )
+            if stale_before is not None:
+                stmt = stmt.where(func.coalesce(Submission.judge_heartbeat, Submission.created_at) < stale_before)
+            await session.exec(stmt)
+            result = await session.exec(
+                select(Submission.id)
+                .where(Submission.id.in_(chunk))
+                .where(Submission.judge_owner == owner)
+                .where(Submission.judge_heartbeat == now)
+            )
+            claimed.extend(result.all())
+        return claimed
@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from mapper.UserMapper import UserMapper
+from pojo.User import User, UserCreate, UserRead
+
+
+class AsyncUserMapper:
+    """UserMapper 的异步版本，供 async 路由使用；事务由调用方提交"""
+
+    @staticmethod
+    async def create(name: str, password: str, session: AsyncSession) -> UserRead:
+        user = UserMapper.from_create(UserCreate(name=name, password=password))
+        session.add(user)
+        await session.flush()
+        return UserMapper.to_read(user)
+
+    @staticmethod
+    async def find_by_name(name: str, session: AsyncSession) -> User | None:
+        stmt = select(User).where(User.name == name)
+        result = await session.exec(stmt)
+        return result.first()
+
+    @staticmethod
+    async def find_by_id(id: int, session: AsyncSession) -> User | None:
+        stmt = select(User).where(User.id == id)
+        result = await session.exec(stmt)
+        return result.first()
+
+    @staticmethod
+    async def update_password(user: User, password: str, session: AsyncSession) -> None:
+        """password 为已哈希的新密码"""
+        user.password = password
+        session.add(user)
+        await session.flush()
+
+
+    @staticmethod
+    async def find_existing_names(names: Iterable[str], session: AsyncSession) -> Set[str]:
+        """一次查询返回 names 中已存在的用户名"""
+        names = list(names)
+        if not names:
+            return set()
+        result = await session.exec(select(User.name).where(col(User.name).in_(names)))
+        return set(result.all())
+
+    @staticmethod
+    async def insert_many(users: List[Dict[str, str]], session: AsyncSession) -> List[Tuple[int, str]]:
+        """
+        多行 INSERT，不经过 ORM 对象，返回 [(id, name)]
+        数据库支持 executemany RETURNING 时直接取回主键，否则按 name 一次查询补齐
+        """
+        if not users:
+            return []
+        now = datetime.utcnow()
+        rows = [{"name": u["name"], "password": u["password"], "create_at": now, "update_at": now} for u in users]
+        table = User.__table__
+        if session.get_bind().dialect.insert_executemany_returning:
+            result = await session.execute(insert(table).returning(table.c.id, table.c.name), rows)
+            return [(r.id, r.name) for r in result]
+        await session.execute(insert(table), rows)
+        result = await session.exec(select(User.id, User.name).where(col(User.name).in_([u["name"] for u in users])))
+        return [(r[0], r[1]) for r in result.all()]
@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from pojo.VerdictCache import TestdataVersion, VerdictCacheEntry
+
+
+class AsyncVerdictCacheMapper:
+    """判题结果缓存与测试数据版本的读写；事务由调用方提交"""
+
+    @staticmethod
+    async def find_versions(code_ids: Iterable[int], session: AsyncSession) -> Dict[int, int]:
+        """code_id -> 测试数据版本，没有记录的不返回（即版本 0）"""
+        code_ids = set(code_ids)
+        if not code_ids:
+            return {}
+        stmt = select(TestdataVersion.code_id, TestdataVersion.version).where(col(TestdataVersion.code_id).in_(code_ids))
+        result = await session.exec(stmt)
+        return dict(result.all())
+
+    @staticmethod
+    async def find_statuses(keys: Iterable[str], session: AsyncSession) -> Dict[str, str]:
+        keys = set(keys)
+        if not keys:
+            return {}
+        stmt = select(VerdictCacheEntry.cache_key, VerdictCacheEntry.status).where(
+            col(VerdictCacheEntry.cache_key).in_(keys))
+        result = await session.exec(stmt)
+        return dict(result.all())
+
+    @staticmethod
+    async def insert_many(entries: List[dict], session: AsyncSession) -> None:
+        """
+        写入缓存条目；其他 worker 可能同时写入同一个 key，已存在的忽略，不让判题结果回写因主键冲突失败
+        entries 的每项包含 cache_key / code_id / testdata_version / status
+        """
+        if not entries:
+            return
+        now = datetime.utcnow()
+        stmt = (insert(VerdictCacheEntry.__table__)
+                .prefix_with("IGNORE", dialect="mysql")
+                .prefix_with("OR IGNORE", dialect="sqlite"))
+        await session.execute(stmt, [{**entry, "created_at": now} for entry in entries])
+
+    @staticmethod
+    async def bump_version(code_id: int, session: AsyncSession) -> int:
+        """测试数据版本号加一并返回新版本；加行锁，并发更新时依次递增"""
+        stmt = select(TestdataVersion).where(TestdataVersion.code_id == code_id).with_for_update()
+        current = (await session.exec(stmt)).first()
+        if current is None:
+            current = TestdataVersion(code_id=code_id, version=0)
+        current.version += 1
+        current.updated_at = datetime.utcnow()
+        session.add(current)
+        await session.flush()
+        return current.version
+
+    @staticmethod
+    async def delete_before(code_id: int, version: int, session: AsyncSession) -> int:
+        """删除该题旧测试数据版本下的缓存条目，返回删除的行数"""
+        stmt = delete(VerdictCacheEntry).where(
+            VerdictCacheEntry.code_id == code_id,
+            VerdictCacheEntry.testdata_version < version,
+        )
+        result = await session.execute(stmt)
+        return result.rowcount
@@ -1,9 +1,46 @@
+import threading
+import time
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session as OrmSession
 from sqlmodel import Session, select
 from typing import List, Optional
 
-from config import engine
-from pojo.Problem import Problem, ProblemRead, ProblemCreate
+from config import PROBLEM_CACHE_SIZE, PROBLEM_CACHE_TTL, SEARCH_SYNC_INTERVAL
+from pojo.Problem import Problem, ProblemRead, ProblemCreate, ProblemSummary, ProblemType
 from pojo.Result import Result
+from utils.cache import ReadThroughCache
+from utils.replica import primary, read_only
+from utils.search import NGramIndex
+
+# 题目 id -> ProblemRead；比赛期间题目基本不变，读多写少
+# 缓存中的对象被多个请求共享，调用方不得修改
+problem_cache: ReadThroughCache[int, ProblemRead] = ReadThroughCache(
+    "problem", max_size=PROBLEM_CACHE_SIZE, ttl=PROBLEM_CACHE_TTL
+)
+
+# 题目标题 n-gram 倒排索引，首次搜索时全量构建，之后定期与数据库对账
+# 本进程新建的题目在事务提交后加入（见 index_after_commit），其他 worker 建的由 sync_search_index 补上
+problem_search_index = NGramIndex()
+_search_sync_lock = threading.Lock()
+_search_synced_at = 0.0
+
+
+def index_after_commit(problem: Problem, session) -> None:
+    """题目在 session 提交后加入搜索索引；回滚则丢弃，不会留下搜不出实际记录的条目"""
+    session.info.setdefault("search_index_pending", []).append(
+        (problem.id, problem.title, ProblemType(problem.type)))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_search_index_pending(session):
+    for problem_id, title, problem_type in session.info.pop("search_index_pending", ()):
+        problem_search_index.add(problem_id, title, problem_type)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_search_index_pending(session):
+    session.info.pop("search_index_pending", None)
 
 
 class ProblemMapper:
@@ -21,43 +58,116 @@ class ProblemMapper:
         return Problem.model_validate(problem.model_dump())
 
     @staticmethod
-    def find_by_id(problem_id: int) -> Optional[Problem]:
+    @read_only
+    def find_by_id(problem_id: int, session: Session) -> Optional[Problem]:
         """根据 ID 查找题目"""
-        with Session(engine) as session:
-            stmt = select(Problem).where(Problem.id == problem_id)
-            result = session.exec(stmt).first()
-            return result
+        stmt = select(Problem).where(Problem.id == problem_id)
+        result = session.exec(stmt).first()
+        return result
 
     @staticmethod
-    def find_by_page(page: int, page_size: int = 20) -> List[Problem]:
-        """分页获取题目"""
-        with Session(engine) as session:
-            offset = (page - 1) * page_size
-            stmt = select(Problem).offset(offset).limit(page_size)
-            results = session.exec(stmt).all()
-            return results
+    def find_read_by_id(problem_id: int, session: Session) -> Optional[ProblemRead]:
+        """根据 ID 获取题目，读穿透 problem_cache；回填缓存的查询走主库，避免把副本上的旧版本缓存 TTL 之久"""
+        def load() -> Optional[ProblemRead]:
+            with primary():
+                problem = ProblemMapper.find_by_id(problem_id, session)
+            return ProblemMapper.to_read(problem) if problem else None
+        return problem_cache.get_or_load(problem_id, load)
 
     @staticmethod
-    def find_by_type(problem_type: str) -> List[Problem]:
-        """根据题目类型获取题目"""
-        with Session(engine) as session:
-            stmt = select(Problem).where(Problem.problem_type == problem_type)
-            results = session.exec(stmt).all()
-            return results
+    def invalidate_cache(problem_id: int) -> None:
+        """题目新增/修改后调用，使缓存失效"""
+        problem_cache.invalidate(problem_id)
 
+    # ---------------- 列表（只查摘要列） ----------------
     @staticmethod
-    def find_by_name(name: str) -> List[Problem]:
-        """根据题目名称模糊匹配"""
-        with Session(engine) as session:
-            stmt = select(Problem).where(Problem.title.like(f"%{name}%"))
-            results = session.exec(stmt).all()
-            return results
+    def _summary_select(problem_type: Optional[ProblemType] = None):
+        stmt = select(Problem.id, Problem.title, Problem.type, Problem.code_id)
+        if problem_type is not None:
+            stmt = stmt.where(Problem.type == problem_type)
+        return stmt
+
+    @staticmethod
+    def _to_summaries(rows) -> List[ProblemSummary]:
+        # 列值来自数据库，类型已确定，model_construct 跳过逐行校验
+        return [ProblemSummary.model_construct(id=r.id, title=r.title, type=r.type, code_id=r.code_id) for r in rows]
+
     @staticmethod
-    def create(problem: ProblemCreate) -> ProblemRead:
+    @read_only
+    def find_summaries_after(after_id: Optional[int], session: Session,
+                             problem_type: Optional[ProblemType] = None, limit: int = 21) -> List[ProblemSummary]:
+        """游标分页：按主键升序取 id > after_id 的 limit 条，可按类型过滤"""
+        stmt = ProblemMapper._summary_select(problem_type)
+        if after_id is not None:
+            stmt = stmt.where(Problem.id > after_id)
+        stmt = stmt.order_by(Problem.id).limit(limit)
+        return ProblemMapper._to_summaries(session.exec(stmt).all())
+
+    @staticmethod
+    @read_only
+    def find_summaries_by_page(page: int, session: Session, problem_type: Optional[ProblemType] = None,
+                               page_size: int = 20) -> List[ProblemSummary]:
+        """按页码分页（OFFSET），保留给旧客户端"""
+        offset = (page - 1) * page_size
+        stmt = ProblemMapper._summary_select(problem_type).order_by(Problem.id).offset(offset).limit(page_size)
+        return ProblemMapper._to_summaries(session.exec(stmt).all())
+
+    @staticmethod
+    @read_only
+    def find_summaries_by_ids(ids: List[int], session: Session) -> List[ProblemSummary]:
+        """按给定 id 顺序返回摘要"""
+        if not ids:
+            return []
+        stmt = ProblemMapper._summary_select().where(Problem.id.in_(ids))
+        by_id = {s.id: s for s in ProblemMapper._to_summaries(session.exec(stmt).all())}
+        return [by_id[i] for i in ids if i in by_id]
+
+    # ---------------- 标题搜索 ----------------
+    @staticmethod
+    def sync_search_index(session: Session, force: bool = False) -> None:
+        """
+        与数据库对账，只查 id/title/type 三列
+        先加入 id 大于已索引最大 id 的题目（常见情况）；之后题目数或最大 id 仍对不上时
+        （其他事务乱序提交了较小的 id），按全部 id 补齐缺失、移除已不存在的
+        """
+        global _search_synced_at
+        if not force and time.monotonic() - _search_synced_at < SEARCH_SYNC_INTERVAL:
+            return
+        with _search_sync_lock:
+            if not force and time.monotonic() - _search_synced_at < SEARCH_SYNC_INTERVAL:
+                return
+            columns = select(Problem.id, Problem.title, Problem.type)
+            stmt = columns.where(Problem.id > problem_search_index.max_id).order_by(Problem.id)
+            for problem_id, title, problem_type in session.exec(stmt):
+                problem_search_index.add(problem_id, title, ProblemType(problem_type))
+            count, max_id = session.exec(select(func.count(Problem.id), func.max(Problem.id))).one()
+            if count != len(problem_search_index) or (max_id or 0) != problem_search_index.max_id:
+                db_ids = set(session.exec(select(Problem.id)).all())
+                indexed = problem_search_index.ids()
+                for problem_id in indexed - db_ids:
+                    problem_search_index.remove(problem_id)
+                missing = sorted(db_ids - indexed)
+                for start in range(0, len(missing), 500):
+                    stmt = columns.where(Problem.id.in_(missing[start:start + 500]))
+                    for problem_id, title, problem_type in session.exec(stmt):
+                        problem_search_index.add(problem_id, title, ProblemType(problem_type))
+            _search_synced_at = time.monotonic()
+
+    @staticmethod
+    @read_only
+    def find_summaries_by_name(name: str, session: Session, problem_type: Optional[ProblemType] = None,
+                               offset: int = 0, limit: int = 21) -> List[ProblemSummary]:
+        """按标题搜索（n-gram 倒排索引）并按相关度排序，类型过滤在索引内完成，只查当前页的行"""
+        ProblemMapper.sync_search_index(session)
+        hits = problem_search_index.search(name, problem_type)[offset:offset + limit]
+        return ProblemMapper.find_summaries_by_ids([problem_id for problem_id, _ in hits], session)
+
+    @staticmethod
+    def create(problem: ProblemCreate, session: Session) -> ProblemRead:
+        """新增题目，flush 后即可拿到自增主键；事务由调用方提交，提交后加入搜索索引"""
         problem = ProblemMapper.from_create(problem)
-        with Session(engine) as session:
-            session.add(problem)
-            session.commit()
-            session.refresh(problem)
+        session.add(problem)
+        session.flush()
+        ProblemMapper.invalidate_cache(problem.id)
+        index_after_commit(problem, session)
         return ProblemMapper.to_read(problem)
-
@@ -0,0 +1,66 @@
+from typing import Tuple
+
+from sqlalchemy import Connection, delete, insert
+from sqlmodel import Session, col, select
+
+from pojo.Scoreboard import ProblemStat, UserProblemState, UserScore
+from pojo.Submission import Submission
+from utils.scoring import COUNTED_STATUSES, ScoreAccumulator
+
+
+class ScoreboardMapper:
+
+    @staticmethod
+    def rebuild(session: Session, penalty_per_wrong: int, chunk_size: int = 1000) -> Tuple[int, int]:
+        """
+        按 submission 历史全量重建三张汇总表，返回 (用户数, 题目数)；事务由调用方提交
+        提交按 (user_id, problem_id, id) 顺序流式扫描一遍（yield_per），走 ix_submission_user_problem，
+        内存中只保留每个 (用户, 题目) 的结果与用户、题目的汇总
+        """
+        conn = session.connection()
+        ScoreboardMapper._lock_tables(conn)
+        for model in (UserProblemState, UserScore, ProblemStat):
+            conn.execute(delete(model.__table__))
+
+        stmt = (
+            select(Submission.user_id, Submission.problem_id, Submission.status, Submission.created_at)
+            .where(col(Submission.status).in_(COUNTED_STATUSES))
+            .order_by(Submission.user_id, Submission.problem_id, Submission.id)
+        )
+        accumulator = ScoreAccumulator(penalty_per_wrong)
+        states = []
+        for row in session.exec(stmt.execution_options(yield_per=chunk_size)):
+            finished = accumulator.add(*row)
+            if finished:
+                states.append(finished)
+        finished = accumulator.finish()
+        if finished:
+            states.append(finished)
+
+        rows = [dict(user_id=u, problem_id=p, attempts=s.attempts, accepted=s.accepted, solved=s.solved,
+                     wrong_before_ac=s.wrong_before_ac, first_accept_at=s.first_accept_at)
+                for (u, p), s in states]
+        for i in range(0, len(rows), chunk_size):
+            conn.execute(insert(UserProblemState.__table__), rows[i:i + chunk_size])
+        if accumulator.users:
+            conn.execute(insert(UserScore.__table__), [
+                dict(user_id=user_id, solved=t.solved, penalty=t.penalty, attempts=t.attempts,
+                     last_accept_at=t.last_accept_at)
+                for user_id, t in accumulator.users.items()])
+        if accumulator.problems:
+            conn.execute(insert(ProblemStat.__table__), [
+                dict(problem_id=problem_id, attempts=t.attempts, accepted=t.accepted,
+                     solved_users=t.solved_users, attempted_users=t.attempted_users)
+                for problem_id, t in accumulator.problems.items()])
+        return len(accumulator.users), len(accumulator.problems)
+
+    @staticmethod
+    def _lock_tables(conn: Connection):
+        """
+        与增量更新（先锁汇总行、再写提交）同样先锁汇总表，再读提交：
+        重建开始前已锁住汇总行的事务先提交、其提交记录被重建读到；之后判完的提交等重建提交后再计入
+        PostgreSQL 的行锁挡不住新行的插入，锁整张表；MySQL（REPEATABLE READ）下随后的全表 DELETE 加 next-key 锁，
+        SQLite 的 DELETE 取得库级写锁，都已足够
+        """
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("LOCK TABLE user_problem_state, user_score, problem_stat IN EXCLUSIVE MODE")
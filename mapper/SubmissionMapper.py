@@ -1,12 +1,18 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from sqlmodel import Session, select
 
-from config import engine
 from pojo.Submission import Submission, SubmissionCreate, SubmissionUpdate, SubmissionRead
+from utils.replica import read_only
+from utils.response import row_dicts
 
 
 class SubmissionMapper:
+    # 列表接口只需要 SubmissionRead 的字段；按列查询省去 ORM 实体的构造与身份映射
+    READ_COLUMNS = (
+        Submission.id, Submission.problem_id, Submission.user_id, Submission.user_answer,
+        Submission.status, Submission.created_at, Submission.updated_at,
+    )
 
     @staticmethod
     def to_read(submission: Submission) -> SubmissionRead:
@@ -34,64 +40,68 @@ class SubmissionMapper:
         return submission
 
     @staticmethod
-    def create(submission_create: SubmissionCreate) -> Submission:
+    def create(submission_create: SubmissionCreate, session: Session) -> Submission:
         """插入新提交"""
-        with Session(engine) as session:
-            submission = SubmissionMapper.from_create(submission_create)
-            session.add(submission)
-            session.commit()
-            session.refresh(submission)
-            return submission
+        submission = SubmissionMapper.from_create(submission_create)
+        session.add(submission)
+        session.flush()
+        return submission
 
     @staticmethod
-    def update(submission: Submission, submission_update: SubmissionUpdate) -> Submission:
-        """更新提交"""
-        with Session(engine) as session:
-            submission=SubmissionMapper.apply_update(submission, submission_update)
-            session.add(submission)
-            session.commit()
-            session.refresh(submission)
-            return submission
+    def update(submission: Submission, submission_update: SubmissionUpdate, session: Session) -> Submission:
+        """更新提交，事务由调用方提交"""
+        submission=SubmissionMapper.apply_update(submission, submission_update)
+        session.add(submission)
+        session.flush()
+        return submission
 
     @staticmethod
-    def find_by_id(submission_id: int) -> Optional[Submission]:
+    @read_only
+    def find_by_id(submission_id: int, session: Session) -> Optional[Submission]:
         """根据 ID 查找提交"""
-        with Session(engine) as session:
-            stmt = select(Submission).where(Submission.id == submission_id)
-            return session.exec(stmt).first()
+        stmt = select(Submission).where(Submission.id == submission_id)
+        return session.exec(stmt).first()
 
     @staticmethod
-    def find_by_user(user_id: int) -> List[Submission]:
+    @read_only
+    def find_by_user(user_id: int, session: Session) -> List[Submission]:
         """查找某个用户的所有提交"""
-        with Session(engine) as session:
-            stmt = select(Submission).where(Submission.user_id == user_id)
-            return session.exec(stmt).all()
+        stmt = select(Submission).where(Submission.user_id == user_id)
+        return list(session.exec(stmt).all())
 
     @staticmethod
-    def find_by_problem(problem_id: int) -> List[Submission]:
+    @read_only
+    def find_by_problem(problem_id: int, session: Session) -> List[Submission]:
         """查找某个题目的所有提交"""
-        with Session(engine) as session:
-            stmt = select(Submission).where(Submission.problem_id == problem_id)
-            return session.exec(stmt).all()
+        stmt = select(Submission).where(Submission.problem_id == problem_id)
+        return list(session.exec(stmt).all())
     @staticmethod
-    def insert(submission: Submission) -> Submission:
-        with Session(engine) as session:
-            session.add(submission)
-            session.commit()
-            session.refresh(submission)
+    def insert(submission: Submission, session: Session) -> Submission:
+        session.add(submission)
+        session.flush()
         return submission
 
     @staticmethod
-    def find_by_user_and_problem(user_id: int, problem_id: int, session: Session) -> List[Submission]:
-        """根据 用户ID + 题目ID 查找提交"""
-        stmt = select(Submission).where(
+    @read_only
+    def find_by_user_and_problem(user_id: int, problem_id: int, session: Session,
+                                 before_id: Optional[int] = None, limit: int = 21) -> List[Dict[str, Any]]:
+        """根据 用户ID + 题目ID 查找提交，按 id 倒序游标分页（最新的在前），只查列、返回 dict"""
+        stmt = select(*SubmissionMapper.READ_COLUMNS).where(
             Submission.user_id == user_id,
             Submission.problem_id == problem_id
         )
-        return list(session.exec(stmt).all())
+        if before_id is not None:
+            stmt = stmt.where(Submission.id < before_id)
+        stmt = stmt.order_by(Submission.id.desc()).limit(limit)
+        return row_dicts(session.exec(stmt))
 
     @staticmethod
-    def find_all_by_user(user_id: int, session: Session) -> List[Submission]:
-        """查找某个用户的所有提交"""
-        stmt = select(Submission).where(Submission.user_id == user_id)
-        return list(session.exec(stmt).all())
\ No newline at end of file
+    @read_only
+    def find_all_by_user(user_id: int, session: Session,
+                         before_id: Optional[int] = None, limit: int = 21) -> List[Dict[str, Any]]:
+        """查找某个用户的提交，按 id 倒序游标分页（最新的在前），只查列、返回 dict"""
+        stmt = select(*SubmissionMapper.READ_COLUMNS).where(Submission.user_id == user_id)
+        if before_id is not None:
+            stmt = stmt.where(Submission.id < before_id)
+        stmt = stmt.order_by(Submission.id.desc()).limit(limit)
+        return row_dicts(session.exec(stmt))
@@ -0,0 +1,81 @@
+"""
+版本化数据库迁移
+create_all 只会建新表，不会修改已有表；已上线的库通过这里按版本号顺序补齐结构变更。
+
+    python -m migrations.runner status    # 查看已应用的版本
+    python -m migrations.runner upgrade   # 应用所有未执行的迁移
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import Column, DateTime, Engine, Integer, MetaData, String, Table, insert, select
+
+from config import engine
+from migrations.versions import (
+    v0001_hot_path_indexes, v0002_scoreboard, v0003_verdict_cache, v0004_judge_heartbeat, v0005_hoj_submit_id,
+)
+
+logger = logging.getLogger(__name__)
+
+# 按版本号升序排列；已发布的迁移不要再修改，新的变更追加新文件
+MIGRATIONS = [
+    v0001_hot_path_indexes,
+    v0002_scoreboard,
+    v0003_verdict_cache,
+    v0004_judge_heartbeat,
+    v0005_hoj_submit_id,
+]
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def applied_versions(bind: Engine = engine) -> List[int]:
+    schema_version.create(bind, checkfirst=True)
+    with bind.connect() as conn:
+        return sorted(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def upgrade(bind: Engine = engine) -> List[int]:
+    """依次应用未执行的迁移，每个迁移一个事务，返回本次应用的版本号"""
+    done = set(applied_versions(bind))
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.VERSION):
+        if migration.VERSION in done:
+            continue
+        logger.info("应用迁移 %04d: %s", migration.VERSION, migration.DESCRIPTION)
+        with bind.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(insert(schema_version).values(
+                version=migration.VERSION,
+                description=migration.DESCRIPTION,
+                applied_at=datetime.utcnow(),
+            ))
+        applied.append(migration.VERSION)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库迁移")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "upgrade":
+        applied = upgrade()
+        print(f"已应用迁移: {applied}" if applied else "数据库已是最新版本")
+    else:
+        done = set(applied_versions())
+        for migration in MIGRATIONS:
+            mark = "x" if migration.VERSION in done else " "
+            print(f"[{mark}] {migration.VERSION:04d} {migration.DESCRIPTION}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""为热点查询补齐二级索引，并给 users.name 加唯一索引"""
+from sqlalchemy import Connection, Index, MetaData, Table, func, inspect, select
+
+VERSION = 1
+DESCRIPTION = "hot path indexes and unique users.name"
+
+# (表名, 索引名, 列, 是否唯一)
+INDEXES = [
+    ("users", "ux_users_name", ["name"], True),
+    ("submission", "ix_submission_user_id", ["user_id", "id"], False),
+    ("submission", "ix_submission_user_problem", ["user_id", "problem_id", "id"], False),
+    ("submission", "ix_submission_status", ["status"], False),
+    ("problem", "ix_problem_type_id", ["type", "id"], False),
+]
+
+
+def _check_duplicate_names(conn: Connection, users: Table):
+    stmt = (
+        select(users.c.name, func.count())
+        .group_by(users.c.name)
+        .having(func.count() > 1)
+        .limit(20)
+    )
+    duplicates = conn.execute(stmt).all()
+    if duplicates:
+        names = ", ".join(f"{name}({count})" for name, count in duplicates)
+        raise RuntimeError(f"users.name 存在重复数据，请先清理后再迁移: {names}")
+
+
+def upgrade(conn: Connection):
+    inspector = inspect(conn)
+    metadata = MetaData()
+    tables = {}
+    for table_name, index_name, columns, unique in INDEXES:
+        if table_name not in tables:
+            tables[table_name] = Table(table_name, metadata, autoload_with=conn)
+        table = tables[table_name]
+        existing = {ix["name"] for ix in inspector.get_indexes(table_name)}
+        if index_name in existing:
+            continue
+        if unique and table_name == "users":
+            _check_duplicate_names(conn, table)
+        Index(index_name, *(table.c[c] for c in columns), unique=unique).create(conn)
@@ -0,0 +1,130 @@
+"""
+排行榜汇总表，并按已有提交历史回填
+表结构与回填逻辑按发布时冻结在本文件中，不引用 model / mapper，之后模型或计分代码变化不影响本迁移
+"""
+from sqlalchemy import (
+    Boolean, Column, Connection, DateTime, ForeignKey, Integer, MetaData, String, Table,
+    and_, case, delete, func, insert, literal, or_, select,
+)
+
+VERSION = 2
+DESCRIPTION = "scoreboard summary tables"
+
+# 计入排行榜的提交状态
+COUNTED_STATUSES = ("accepted", "wrong", "rejected")
+# 回填时首次通过前每次错误的罚时（秒），取发布时 SCOREBOARD_PENALTY 的默认值，不随环境变量变化
+PENALTY_PER_WRONG = 1200
+
+metadata = MetaData()
+
+# 只用来解析外键，不会创建
+users = Table("users", metadata, Column("id", Integer, primary_key=True))
+problem = Table("problem", metadata, Column("id", Integer, primary_key=True))
+submission = Table(
+    "submission",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("problem_id", Integer),
+    Column("status", String(20)),
+    Column("created_at", DateTime),
+)
+
+user_problem_state = Table(
+    "user_problem_state",
+    metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True, autoincrement=False),
+    Column("problem_id", Integer, ForeignKey("problem.id"), primary_key=True, autoincrement=False),
+    Column("attempts", Integer, nullable=False),
+    Column("accepted", Integer, nullable=False),
+    Column("solved", Boolean, nullable=False),
+    Column("wrong_before_ac", Integer, nullable=False),
+    Column("first_accept_at", DateTime, nullable=True),
+)
+
+user_score = Table(
+    "user_score",
+    metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True, autoincrement=False),
+    Column("solved", Integer, nullable=False),
+    Column("penalty", Integer, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("last_accept_at", DateTime, nullable=True),
+)
+
+problem_stat = Table(
+    "problem_stat",
+    metadata,
+    Column("problem_id", Integer, ForeignKey("problem.id"), primary_key=True, autoincrement=False),
+    Column("attempts", Integer, nullable=False),
+    Column("accepted", Integer, nullable=False),
+    Column("solved_users", Integer, nullable=False),
+    Column("attempted_users", Integer, nullable=False),
+)
+
+
+def _backfill_pairs(conn: Connection):
+    """每个 (用户, 题目)：已出结果的提交数、通过数、首次通过时间与之前的错误次数"""
+    s = submission
+    counted = s.c.status.in_(COUNTED_STATUSES)
+    first_id = (
+        select(s.c.user_id, s.c.problem_id, func.min(s.c.id).label("id"))
+        .where(s.c.status == "accepted")
+        .group_by(s.c.user_id, s.c.problem_id)
+        .subquery("first_ac")
+    )
+    first = submission.alias("first_row")
+    accepted = s.c.status == "accepted"
+    stmt = (
+        select(
+            s.c.user_id,
+            s.c.problem_id,
+            func.count(),
+            func.sum(case((accepted, 1), else_=0)),
+            first_id.c.id.is_not(None),
+            func.sum(case((and_(~accepted, or_(first_id.c.id.is_(None), s.c.id < first_id.c.id)), 1), else_=0)),
+            first.c.created_at,
+        )
+        .select_from(
+            s.outerjoin(first_id, and_(first_id.c.user_id == s.c.user_id, first_id.c.problem_id == s.c.problem_id))
+            .outerjoin(first, first.c.id == first_id.c.id)
+        )
+        .where(counted)
+        .group_by(s.c.user_id, s.c.problem_id, first_id.c.id, first.c.created_at)
+    )
+    conn.execute(insert(user_problem_state).from_select(
+        ["user_id", "problem_id", "attempts", "accepted", "solved", "wrong_before_ac", "first_accept_at"], stmt))
+
+
+def _backfill_totals(conn: Connection):
+    p = user_problem_state
+    solved = case((p.c.solved, 1), else_=0)
+    conn.execute(insert(user_score).from_select(
+        ["user_id", "solved", "penalty", "attempts", "last_accept_at"],
+        select(
+            p.c.user_id,
+            func.sum(solved),
+            func.sum(case((p.c.solved, p.c.wrong_before_ac * literal(PENALTY_PER_WRONG)), else_=0)),
+            func.sum(p.c.attempts),
+            func.max(p.c.first_accept_at),
+        ).group_by(p.c.user_id),
+    ))
+    conn.execute(insert(problem_stat).from_select(
+        ["problem_id", "attempts", "accepted", "solved_users", "attempted_users"],
+        select(
+            p.c.problem_id,
+            func.sum(p.c.attempts),
+            func.sum(p.c.accepted),
+            func.sum(solved),
+            func.count(),
+        ).group_by(p.c.problem_id),
+    ))
+
+
+def upgrade(conn: Connection):
+    for table in (user_problem_state, user_score, problem_stat):
+        table.create(conn, checkfirst=True)
+    for table in (user_problem_state, user_score, problem_stat):
+        conn.execute(delete(table))
+    _backfill_pairs(conn)
+    _backfill_totals(conn)
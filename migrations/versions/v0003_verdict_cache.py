@@ -0,0 +1,33 @@
+"""
+编程题判题结果缓存与测试数据版本表
+表结构按发布时冻结在本文件中，不引用 model
+"""
+from sqlalchemy import Column, Connection, DateTime, Integer, MetaData, String, Table
+
+VERSION = 3
+DESCRIPTION = "verdict cache and testdata version tables"
+
+metadata = MetaData()
+
+verdict_cache = Table(
+    "verdict_cache",
+    metadata,
+    Column("cache_key", String(64), primary_key=True),
+    Column("code_id", Integer, nullable=False, index=True),
+    Column("testdata_version", Integer, nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+testdata_version = Table(
+    "testdata_version",
+    metadata,
+    Column("code_id", Integer, primary_key=True, autoincrement=False),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn: Connection):
+    for table in (verdict_cache, testdata_version):
+        table.create(conn, checkfirst=True)
@@ -0,0 +1,18 @@
+"""submission 增加判题 worker 与心跳列，多 worker 部署时 leader 只接管心跳过期的 pending 提交"""
+from sqlalchemy import Connection, DateTime, String, inspect, text
+
+VERSION = 4
+DESCRIPTION = "submission judge owner and heartbeat"
+
+# (列名, 类型)；结构在此冻结，不随模型变化
+COLUMNS = [
+    ("judge_owner", String(64)),
+    ("judge_heartbeat", DateTime()),
+]
+
+
+def upgrade(conn: Connection):
+    existing = {c["name"] for c in inspect(conn).get_columns("submission")}
+    for name, column_type in COLUMNS:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE submission ADD COLUMN {name} {column_type.compile(dialect=conn.dialect)} NULL"))
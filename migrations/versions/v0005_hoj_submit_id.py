@@ -0,0 +1,17 @@
+"""submission 增加 HOJ 提交号，已送达 HOJ 的 pending 提交恢复时只重新轮询结果，不再重复提交"""
+from sqlalchemy import Connection, Integer, inspect, text
+
+VERSION = 5
+DESCRIPTION = "submission hoj submit id"
+
+# (列名, 类型)；结构在此冻结，不随模型变化
+COLUMNS = [
+    ("hoj_submit_id", Integer()),
+]
+
+
+def upgrade(conn: Connection):
+    existing = {c["name"] for c in inspect(conn).get_columns("submission")}
+    for name, column_type in COLUMNS:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE submission ADD COLUMN {name} {column_type.compile(dialect=conn.dialect)} NULL"))
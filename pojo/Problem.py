@@ -1,7 +1,6 @@
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column
+from sqlalchemy import Column, Index, JSON, Text
 from sqlalchemy.dialects.mysql import LONGTEXT
-from sqlalchemy.dialects.mysql import JSON
 from typing import Optional, List
 from enum import Enum
 from pydantic import BaseModel
@@ -15,11 +14,15 @@ class ProblemType(str, Enum):
 
 # 数据库表模型
 class Problem(SQLModel, table=True):
+    # 按类型筛选 + 按 id 游标分页
+    __table_args__ = (Index("ix_problem_type_id", "type", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     code_id:Optional[int] =0
     title: str
     type: ProblemType
-    description: str = Field(sa_column=Column(LONGTEXT))
+    # MySQL 上为 LONGTEXT，其他数据库（如测试用的 SQLite）退化为 TEXT
+    description: str = Field(sa_column=Column(Text().with_variant(LONGTEXT, "mysql")))
     options: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
     answer: Optional[str] = Field(default=None)
 
@@ -45,3 +48,11 @@ class ProblemRead(SQLModel):
     answer: Optional[str] = None
     class Config:
         from_attributes = True
+
+
+# 列表用的轻量投影，不含 description / options / answer
+class ProblemSummary(SQLModel):
+    id: int
+    title: str
+    type: ProblemType
+    code_id: Optional[int] = None
@@ -1,17 +1,34 @@
 from typing import Generic, Optional, TypeVar
 from pydantic import BaseModel
 
+from utils.response import FastJSONResponse, prepare
+
 T = TypeVar("T")
 
 class Result(BaseModel, Generic[T]):
     code: int
     message: str
     data: Optional[T] = None
+    # 游标分页：下一页的游标，没有更多数据时为 None
+    next_cursor: Optional[str] = None
 
     @staticmethod
-    def success(data: Optional[T] = None, message: str = "success") -> "Result[T]":
-        return Result(code=200, message=message, data=data)
+    def success(data: Optional[T] = None, message: str = "success",
+                next_cursor: Optional[str] = None) -> "Result[T]":
+        return Result(code=200, message=message, data=data, next_cursor=next_cursor)
 
     @staticmethod
     def error(message: str = "error", code: int = 500) -> "Result[None]":
         return Result(code=code, message=message, data=None)
+
+    def to_response(self, status_code: int = 200) -> FastJSONResponse:
+        """
+        快速路径：service 构造好的 Result 直接编码返回，跳过 response_model 的再次校验与拷贝
+        路由上的 response_model 仍保留，用于生成接口文档
+        """
+        return FastJSONResponse({
+            "code": self.code,
+            "message": self.message,
+            "data": prepare(self.data),
+            "next_cursor": self.next_cursor,
+        }, status_code=status_code)
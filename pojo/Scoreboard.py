@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+
+# --- 汇总表：随提交状态变化增量维护，可由 submission 全量重建 ---
+class UserProblemState(SQLModel, table=True):
+    """某用户在某题上的累计结果"""
+    __tablename__ = "user_problem_state"
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    problem_id: int = Field(foreign_key="problem.id", primary_key=True)
+    attempts: int = 0
+    accepted: int = 0
+    solved: bool = False
+    wrong_before_ac: int = 0
+    first_accept_at: Optional[datetime] = None
+
+
+class UserScore(SQLModel, table=True):
+    """排行榜：每个用户一行"""
+    __tablename__ = "user_score"
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    solved: int = 0
+    penalty: int = 0  # 秒，首次通过前每次错误计 SCOREBOARD_PENALTY 秒
+    attempts: int = 0
+    last_accept_at: Optional[datetime] = None
+
+
+class ProblemStat(SQLModel, table=True):
+    """每道题的提交与通过统计"""
+    __tablename__ = "problem_stat"
+
+    problem_id: int = Field(foreign_key="problem.id", primary_key=True)
+    attempts: int = 0
+    accepted: int = 0
+    solved_users: int = 0
+    attempted_users: int = 0
+
+
+# --- 响应模型 ---
+class ScoreboardEntry(SQLModel):
+    rank: int
+    user_id: int
+    name: Optional[str] = None
+    solved: int
+    penalty: int
+    attempts: int
+    last_accept_at: Optional[datetime] = None
+
+
+class ProblemStatRead(SQLModel):
+    problem_id: int
+    attempts: int = 0
+    accepted: int = 0
+    solved_users: int = 0
+    attempted_users: int = 0
+    # 通过的提交数 / 已出结果的提交数
+    acceptance_rate: Optional[float] = None
@@ -2,7 +2,7 @@
 from __future__ import annotations
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column
+from sqlalchemy import Column, Index, Text
 from sqlalchemy.dialects.mysql import TINYTEXT
 from sqlalchemy.orm import Mapped, relationship
 from sqlmodel import SQLModel, Field, Relationship
@@ -11,14 +11,29 @@ from pojo.Problem import Problem
 from pojo.User import User
 
 class Submission(SQLModel, table=True):
+    # 按热点查询建索引，末尾的 id 用于按主键倒序的游标分页
+    __table_args__ = (
+        # 用户提交历史
+        Index("ix_submission_user_id", "user_id", "id"),
+        # 用户在某题的提交
+        Index("ix_submission_user_problem", "user_id", "problem_id", "id"),
+        # 启动时恢复 pending 提交
+        Index("ix_submission_status", "status"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     problem_id: int = Field(foreign_key="problem.id")
     user_id: int = Field(foreign_key="users.id")
-    user_answer: str =Field(sa_column=Column(TINYTEXT))  # 用户提交的答案（字符串，或者 JSON 序列化后的数据）
+    user_answer: str =Field(sa_column=Column(Text().with_variant(TINYTEXT, "mysql")))  # 用户提交的答案（字符串，或者 JSON 序列化后的数据）
     status: str = Field(default="pending")  # pending / accepted / wrong / error
 
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # 负责判题的 worker（主机名:pid）与其最近心跳（UTC）；leader 只接管心跳过期的 pending 提交，不对外返回
+    judge_owner: Optional[str] = Field(default=None, max_length=64, exclude=True)
+    judge_heartbeat: Optional[datetime] = Field(default=None, exclude=True)
+    # 已送达 HOJ 的提交号；恢复时有提交号的只重新轮询结果，不再提交
+    hoj_submit_id: Optional[int] = Field(default=None, exclude=True)
 
     # 关系（方便 ORM 联查）
 
@@ -27,6 +42,16 @@ class SubmissionCreate(SQLModel):
     user_answer: str # 用户提交的答案（字符串，或者 JSON 序列化后的数据）
 
 
+class SubmissionBatchItem(SQLModel):
+    """批量提交中单道题的处理结果，按请求中的顺序返回"""
+    index: int
+    problem_id: int
+    code: int  # 200 成功 / 404 题目不存在 / 503 判题队列繁忙
+    message: str
+    submission_id: Optional[int] = None
+    status: Optional[str] = None
+
+
 class SubmissionRead(SQLModel):
     id: int
     problem_id: int
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, relationship
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
@@ -14,6 +15,8 @@ if TYPE_CHECKING:
 # --- 数据模型 ---
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    # 登录/注册按 name 查询；唯一索引同时防止并发注册出重名
+    __table_args__ = (Index("ux_users_name", "name", unique=True),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
@@ -34,4 +37,20 @@ class UserRead(SQLModel):
 
 class UserUpdate(SQLModel):
     name: Optional[str] = None
-    password: Optional[str] = None
\ No newline at end of file
+    password: Optional[str] = None
+
+
+class UserImportError(SQLModel):
+    line: int
+    name: Optional[str] = None
+    reason: str
+
+
+class UserImportSummary(SQLModel):
+    """CSV 批量导入结果汇总"""
+    total: int = 0
+    imported: int = 0
+    failed: int = 0
+    # 只保留前 USER_IMPORT_MAX_ERRORS 条错误明细
+    errors: List[UserImportError] = []
+    errors_truncated: bool = False
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+
+class VerdictCacheEntry(SQLModel, table=True):
+    """
+    编程题判题结果缓存：同一 HOJ 题目、同一测试数据版本、同一语言下归一化后相同的源码判题结果相同
+    cache_key = sha256(code_id, 测试数据版本, 语言, 归一化源码)
+    """
+    __tablename__ = "verdict_cache"
+
+    cache_key: str = Field(primary_key=True, max_length=64)
+    # 测试数据更新时按 code_id 清理旧版本的条目
+    code_id: int = Field(index=True)
+    testdata_version: int = 0
+    status: str = Field(max_length=20)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class TestdataVersion(SQLModel, table=True):
+    """HOJ 题目（code_id）测试数据的版本号，每次更新测试数据后递增；没有记录时为 0"""
+    __tablename__ = "testdata_version"
+
+    code_id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,84 @@
+"""
+生产部署入口：多 worker 进程（默认与 CPU 核数相同）
+
+    python serve.py
+
+安装了 gunicorn 时由 gunicorn 管理 UvicornWorker，master 预加载应用（preload_app），fork 后各 worker 重建连接池；
+未安装时退回 uvicorn 自带的多进程模式（不预加载，每个 worker 各自导入应用）
+停止时 worker 在 WEB_GRACEFUL_TIMEOUT 内执行 lifespan 收尾：等待正在提交的判题任务（排队中的留给下次启动恢复）、关闭 HOJ 客户端与连接池
+恢复 pending 提交等单例任务只在抢到 leader 锁的 worker 中运行（见 app.run_singleton_jobs）
+判题结果由提交所在的 worker 回写，推送连接可能在另一个 worker 上：各 worker 按 SUBMISSION_EVENT_RELAY_INTERVAL
+查询数据库，把本进程订阅用户的状态变化转发给推送连接（见 app.relay_submission_events）
+"""
+import os
+import time
+
+# 所有 worker 共用同一个服务启动时间：启动前创建的 pending 提交一定无人处理，可以安全恢复
+os.environ.setdefault("SERVER_STARTED_AT", str(time.time()))
+
+from config import WEB_HOST, WEB_PORT, WEB_WORKERS, WEB_GRACEFUL_TIMEOUT, WEB_MAX_REQUESTS
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+
+def post_fork(server, worker):
+    """预加载时 master 导入应用已创建引擎，子进程不能复用继承来的连接"""
+    from config import engine, async_engine, replica_engines
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    for replica in replica_engines.values():
+        replica.dispose(close=False)
+
+
+def worker_class() -> str:
+    try:
+        import uvicorn_worker  # noqa: F401
+        return "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        return "uvicorn.workers.UvicornWorker"
+
+
+if BaseApplication is not None:
+    class GunicornApplication(BaseApplication):
+
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+
+def main():
+    from app import create_db_and_tables
+    create_db_and_tables()
+
+    if BaseApplication is not None:
+        GunicornApplication({
+            "bind": f"{WEB_HOST}:{WEB_PORT}",
+            "workers": WEB_WORKERS,
+            "worker_class": worker_class(),
+            "preload_app": True,
+            "post_fork": post_fork,
+            "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+            "max_requests": WEB_MAX_REQUESTS,
+            "max_requests_jitter": WEB_MAX_REQUESTS // 10,
+        }).run()
+        return
+
+    import uvicorn
+    uvicorn.run("app:app", host=WEB_HOST, port=WEB_PORT, workers=WEB_WORKERS,
+                timeout_graceful_shutdown=int(WEB_GRACEFUL_TIMEOUT),
+                limit_max_requests=WEB_MAX_REQUESTS or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,237 @@
-import httpx
 import asyncio
+import logging
 import time
+from typing import Optional
+
+import httpx
+
+from config import (
+    HOJ_BASE_URL, HOJ_USERNAME, HOJ_PASSWORD, HOJ_LANGUAGE,
+    HOJ_CONNECT_TIMEOUT, HOJ_READ_TIMEOUT, HOJ_WRITE_TIMEOUT, HOJ_POOL_TIMEOUT,
+    HOJ_MAX_CONNECTIONS, HOJ_MAX_KEEPALIVE, HOJ_KEEPALIVE_EXPIRY, HOJ_BATCH_STATUS,
+    HOJ_LIMIT_INITIAL, HOJ_LIMIT_MIN, HOJ_LIMIT_MAX, HOJ_LIMIT_BACKOFF, HOJ_LIMIT_LATENCY_TOLERANCE, HOJ_LIMIT_WAIT,
+    HOJ_MAX_RETRIES, HOJ_RETRY_BASE, HOJ_RETRY_MAX, HOJ_BREAKER_FAILURES, HOJ_BREAKER_COOLDOWN,
+)
+from utils.metrics import hoj_duration, hoj_requests
+from utils.resilience import AdaptiveLimiter, CircuitBreaker, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# HOJ 判题状态码
+HOJ_STATUS_ACCEPTED = 0
+HOJ_STATUS_SYSTEM_ERROR = 4
+HOJ_STATUS_SUBMITTED_FAILED = 10
+# 等待中 / 编译中 / 判题中 / 提交中
+HOJ_RUNNING_STATUSES = {5, 6, 7, 9}
+# 同一份代码、同一份测试数据必然得到相同结果的状态：通过 / 答案错误 / 编译错误 / 格式错误 / 部分通过
+# 超时、超内存、运行错误与系统错误受判题机负载影响，不缓存
+HOJ_DETERMINISTIC_STATUSES = {0, -1, -2, -3, 8}
+
+# 视为 HOJ 过载 / 故障、可以重试的 HTTP 状态码
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# 非幂等请求（提交）只在 HOJ 明确没有处理时重试
+UNPROCESSED_STATUSES = {429, 503}
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class HojUnavailable(Exception):
+    """HOJ 熔断中、等不到并发名额或重试耗尽；调用方应在 retry_after 秒后重试，而不是把提交判为 error"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HojSubmitOutcomeUnknown(Exception):
+    """非幂等请求（提交）已发出但没有拿到结果（读超时、500 / 502 / 504），HOJ 可能已受理；不能重发，否则重复判题"""
+
+
+def to_submission_status(hoj_status: int) -> str | None:
+    """HOJ 状态码 -> Submission.status，仍在判题中返回 None"""
+    if hoj_status in HOJ_RUNNING_STATUSES:
+        return None
+    if hoj_status == HOJ_STATUS_ACCEPTED:
+        return "accepted"
+    if hoj_status in (HOJ_STATUS_SYSTEM_ERROR, HOJ_STATUS_SUBMITTED_FAILED):
+        return "error"
+    return "rejected"
 
 
 class HojClient:
-    def __init__(self, base_url="http://127.0.0.1", username="python_course0", password="maekoz"):
+    """
+    HOJ 判题机客户端
+    整个应用共用一个实例（见 hoj_client），随 FastAPI lifespan 启动/关闭，
+    复用 keep-alive 连接池和登录 token；所有请求经过自适应并发上限与熔断器
+    """
+
+    def __init__(self, base_url=HOJ_BASE_URL, username=HOJ_USERNAME, password=HOJ_PASSWORD):
         self.base_url = base_url
         self.username = username
         self.password = password
         self.token = None
-        self.session = httpx.AsyncClient()
+        self.session: httpx.AsyncClient | None = None
+        self.batch_status = HOJ_BATCH_STATUS
+        # 同一时刻只允许一个协程重新登录
+        self._login_lock = asyncio.Lock()
+        self.limiter = AdaptiveLimiter(HOJ_LIMIT_INITIAL, HOJ_LIMIT_MIN, HOJ_LIMIT_MAX,
+                                       HOJ_LIMIT_BACKOFF, HOJ_LIMIT_LATENCY_TOLERANCE)
+        self.breaker = CircuitBreaker(HOJ_BREAKER_FAILURES, HOJ_BREAKER_COOLDOWN)
+        self._stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "errors": 0,
+            "retries": 0,
+            "unavailable": 0,
+            "logins": 0,
+            "token_refreshes": 0,
+        }
+
+    # ---------------- 生命周期 ----------------
+    async def start(self):
+        if self.session is None:
+            self.session = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    connect=HOJ_CONNECT_TIMEOUT,
+                    read=HOJ_READ_TIMEOUT,
+                    write=HOJ_WRITE_TIMEOUT,
+                    pool=HOJ_POOL_TIMEOUT,
+                ),
+                limits=httpx.Limits(
+                    max_connections=HOJ_MAX_CONNECTIONS,
+                    max_keepalive_connections=HOJ_MAX_KEEPALIVE,
+                    keepalive_expiry=HOJ_KEEPALIVE_EXPIRY,
+                ),
+            )
 
+    async def close(self):
+        if self.session is not None:
+            await self.session.aclose()
+            self.session = None
+        self.token = None
+
+    # ---------------- 鉴权 ----------------
     async def login(self):
+        await self.start()
         url = f"{self.base_url}/api/login"
         resp = await self.session.post(url, json={"username": self.username, "password": self.password})
         resp.raise_for_status()
         self.token = resp.headers.get("authorization")
+        self._stats["logins"] += 1
 
-    async def _request(self, method, url, **kwargs):
-        if not self.token:
-            await self.login()
-        headers = kwargs.pop("headers", {})
-        headers["Authorization"] = self.token
-        resp = await self.session.request(method, url, headers=headers, **kwargs)
+    async def _refresh_token(self, stale_token):
+        """
+        token 失效时重新登录
+        拿到锁后若 token 已被其他协程刷新过，直接复用，避免并发登录
+        """
+        async with self._login_lock:
+            if self.token is None or self.token == stale_token:
+                await self.login()
+                if stale_token is not None:
+                    self._stats["token_refreshes"] += 1
 
+    async def _send(self, method, url, headers: dict, **kwargs) -> httpx.Response:
+        """带 token 发送一次请求，token 失效时重新登录后再发一次"""
+        if not self.token:
+            await self._refresh_token(None)
+        token = self.token
+        resp = await self.session.request(method, url, headers={**headers, "Authorization": token}, **kwargs)
         if resp.status_code in (401, 403):
-            await self.login()
-            headers["Authorization"] = self.token
-            resp = await self.session.request(method, url, headers=headers, **kwargs)
+            await self._refresh_token(token)
+            resp = await self.session.request(method, url, headers={**headers, "Authorization": self.token}, **kwargs)
         return resp
 
-    async def submit(self, pid: str, code: str, language="Python3") -> int:
+    async def _request(self, method, url, idempotent: bool = True, **kwargs) -> httpx.Response:
+        """
+        熔断中直接抛出 HojUnavailable；每次尝试占用一个自适应并发名额，
+        连接失败、超时、429、5xx 按全抖动指数退避重试，重试耗尽后抛出 HojUnavailable
+        非幂等请求（idempotent=False）只在请求确定没有被 HOJ 处理时重试，
+        可能已被处理的失败抛出 HojSubmitOutcomeUnknown
+        其余响应（含 4xx）原样返回，由调用方处理
+        """
+        await self.start()
+        headers = kwargs.pop("headers", {})
+        endpoint = url.split("?", 1)[0].rsplit("/", 1)[-1]
+        error = None
+        for attempt in range(HOJ_MAX_RETRIES + 1):
+            if attempt:
+                self._stats["retries"] += 1
+                await asyncio.sleep(self._retry_delay(attempt - 1, error))
+            await self._acquire(endpoint)
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            status = "exception"
+            failed = False
+            retryable = False
+            start = time.perf_counter()
+            try:
+                resp = await self._send(method, url, headers, **kwargs)
+                status = str(resp.status_code)
+                if resp.status_code not in RETRYABLE_STATUSES:
+                    if resp.is_error:
+                        self._stats["errors"] += 1
+                    return resp
+                failed, error = True, resp
+                retryable = idempotent or resp.status_code in UNPROCESSED_STATUSES
+            except httpx.TransportError as e:
+                failed, error = True, e
+                retryable = idempotent or isinstance(e, UNSENT_ERRORS)
+            except httpx.HTTPStatusError as e:
+                # 登录失败（请求本身还没发出）
+                if e.response.status_code not in RETRYABLE_STATUSES:
+                    raise
+                status = str(e.response.status_code)
+                failed, error, retryable = True, e.response, True
+            finally:
+                elapsed = time.perf_counter() - start
+                self._stats["in_flight"] -= 1
+                self.limiter.release(elapsed, failed)
+                if failed:
+                    self._stats["errors"] += 1
+                    self.breaker.record_failure()
+                elif status != "exception":
+                    self.breaker.record_success()
+                else:
+                    self.breaker.abandon()
+                hoj_requests.inc(endpoint, status)
+                hoj_duration.observe(elapsed, endpoint)
+            if not retryable:
+                break
+        detail = f"HTTP {error.status_code}" if isinstance(error, httpx.Response) else repr(error)
+        if not retryable:
+            raise HojSubmitOutcomeUnknown(f"HOJ 请求结果未知（{endpoint}）：{detail}")
+        self._stats["unavailable"] += 1
+        raise HojUnavailable(f"HOJ 请求失败（{endpoint}）：{detail}", self.breaker.retry_after() or HOJ_RETRY_MAX)
+
+    async def _acquire(self, endpoint: str):
+        """熔断中或等不到并发名额时抛出 HojUnavailable，不占用名额"""
+        if self.breaker.retry_after() > 0:
+            self._reject(endpoint, "circuit_open")
+        if not await self.limiter.acquire(HOJ_LIMIT_WAIT):
+            self._reject(endpoint, "limited")
+        if not self.breaker.allow():
+            self.limiter.cancel()
+            self._reject(endpoint, "circuit_open")
+
+    def _reject(self, endpoint: str, reason: str):
+        self._stats["unavailable"] += 1
+        hoj_requests.inc(endpoint, reason)
+        if reason == "limited":
+            raise HojUnavailable("等待 HOJ 并发名额超时", HOJ_RETRY_MAX)
+        raise HojUnavailable("HOJ 熔断中", self.breaker.retry_after() or HOJ_RETRY_MAX)
+
+    @staticmethod
+    def _retry_delay(attempt: int, error) -> float:
+        """429 / 503 带 Retry-After 时按其等待（不超过 HOJ_RETRY_MAX），否则全抖动指数退避"""
+        retry_after: Optional[str] = error.headers.get("retry-after") if isinstance(error, httpx.Response) else None
+        if retry_after:
+            try:
+                return min(HOJ_RETRY_MAX, float(retry_after))
+            except ValueError:
+                pass
+        return backoff_delay(attempt, HOJ_RETRY_BASE, HOJ_RETRY_MAX)
+
+    # ---------------- 判题接口 ----------------
+    async def submit(self, pid: str, code: str, language=HOJ_LANGUAGE) -> int:
         url = f"{self.base_url}/api/submit-problem-judge"
         payload = {
             "pid": pid,
@@ -41,14 +242,67 @@ class HojClient:
             "gid": None,
             "isRemote": False
         }
-        resp = await self._request("POST", url, json=payload)
+        resp = await self._request("POST", url, idempotent=False, json=payload)
         resp.raise_for_status()
-        print(resp.json())
-        return resp.json()["data"]["submitId"]
+        body = resp.json()
+        logger.debug("HOJ submit: %s", body)
+        return body["data"]["submitId"]
 
     async def get_result(self, submit_id: int) -> int:
         url = f"{self.base_url}/api/get-submission-detail?submitId={submit_id}"
         resp = await self._request("GET", url)
         resp.raise_for_status()
-        print(resp.json())
-        return resp.json()["data"]['submission']['status']
+        body = resp.json()
+        logger.debug("HOJ result: %s", body)
+        return body["data"]['submission']['status']
+
+    async def get_results(self, submit_ids: list[int]) -> dict[int, int]:
+        """
+        批量查询判题状态，返回 {submitId: status}
+        HOJ 不支持批量接口时退回逐个查询
+        """
+        if not submit_ids:
+            return {}
+        if self.batch_status:
+            url = f"{self.base_url}/api/check-submissions-status"
+            resp = await self._request("POST", url, json={"submitIds": submit_ids, "cid": None})
+            if resp.status_code in (404, 405):
+                logger.warning("HOJ 不支持批量查询判题状态，改为逐个查询")
+                self.batch_status = False
+            else:
+                resp.raise_for_status()
+                data = resp.json()["data"] or {}
+                return {int(k): v["status"] for k, v in data.items()}
+        statuses = await asyncio.gather(*(self.get_result(i) for i in submit_ids), return_exceptions=True)
+        unavailable = [s for s in statuses if isinstance(s, HojUnavailable)]
+        if len(unavailable) == len(statuses):
+            raise unavailable[0]
+        return {i: s for i, s in zip(submit_ids, statuses) if not isinstance(s, BaseException)}
+
+    # ---------------- 监控 ----------------
+    def pool_stats(self) -> dict:
+        """连接池与请求统计"""
+        stats = dict(self._stats)
+        stats.update({
+            "started": self.session is not None,
+            "logged_in": self.token is not None,
+            "max_connections": HOJ_MAX_CONNECTIONS,
+            "max_keepalive_connections": HOJ_MAX_KEEPALIVE,
+            "limiter": self.limiter.stats(),
+            "breaker": self.breaker.stats(),
+        })
+        # httpx 未公开连接池状态，这里尽力读取 httpcore 的连接列表
+        pool = getattr(getattr(self.session, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for c in connections if c.is_idle())
+        return stats
+
+
+# 应用级共享客户端
+hoj_client = HojClient()
+
+
+def get_hoj_client() -> HojClient:
+    return hoj_client
@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from config import JUDGE_WORKERS, JUDGE_QUEUE_SIZE, JUDGE_DRAIN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JudgeJob:
+    submission_id: int
+    code_id: int
+    code: str
+    # 提交者，用于推送判题状态
+    user_id: Optional[int] = None
+    # 恢复的提交已送达 HOJ 时为其提交号，只需重新轮询结果
+    hoj_submit_id: Optional[int] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class JudgeQueueFull(Exception):
+    """判题队列已满"""
+
+
+JudgeHandler = Callable[[JudgeJob], Awaitable[None]]
+
+
+class JudgeDispatcher:
+    """
+    编程题判题调度器
+    有界队列 + 固定数量 worker，队列满时拒绝新任务（由接口返回 503），
+    关闭时不再提交排队中的任务（留给下次启动恢复），启动时重新投递数据库中仍为 pending 的提交
+    HOJ 暂时不可用时任务可以暂存（park），到期后重新入队，不占用 worker
+    """
+
+    def __init__(self, workers: int = JUDGE_WORKERS, max_queue: int = JUDGE_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._handler: Optional[JudgeHandler] = None
+        self._accepting = False
+        # 已入队或正在判题的提交，防止恢复时重复投递
+        self._active_ids: set[int] = set()
+        self._in_flight = 0
+        # 暂存的任务：(到期时间, 序号, job)；仍计入 _active_ids
+        self._parked: list[tuple[float, int, JudgeJob]] = []
+        self._parked_ids: set[int] = set()
+        # 已被其他 worker 接管、出队时直接跳过的任务
+        self._discarded: set[int] = set()
+        self._unpark_task: Optional[asyncio.Task] = None
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self._stats = {"enqueued": 0, "rejected": 0, "completed": 0, "failed": 0, "recovered": 0,
+                       "parked_total": 0}
+
+    # ---------------- 生命周期 ----------------
+    async def start(self, handler: JudgeHandler):
+        if self._tasks:
+            return
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._accepting = True
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._unpark_task = asyncio.create_task(self._unpark())
+
+    async def stop(self, timeout: float = JUDGE_DRAIN_TIMEOUT):
+        """
+        停止接收新任务；排队和暂存中的任务不再送去 HOJ，留在数据库中由重启后的恢复流程处理
+        只等待正在提交的任务完成（提交后轮询器已停，结果同样由恢复流程按 HOJ 提交号重新轮询），超时后取消
+        """
+        self._accepting = False
+        if not self._tasks:
+            return
+        self._unpark_task.cancel()
+        left = self._queue.qsize() + len(self._parked)
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._active_ids.discard(job.submission_id)
+            self._queue.task_done()
+        if left:
+            logger.info("%d 个排队或暂存的判题任务将在重启后恢复", left)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%d 个正在提交的判题任务未能在 %.0fs 内完成，将在重启后恢复", self._in_flight, timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ---------------- 投递 ----------------
+    def has_capacity(self, count: int = 1) -> bool:
+        """队列还能否再放入 count 个任务"""
+        if not self._accepting or self._queue is None:
+            return False
+        return self._queue.maxsize <= 0 or self._queue.maxsize - self._queue.qsize() >= count
+
+    def enqueue(self, job: JudgeJob):
+        """非阻塞投递，队列满或已停止时抛出 JudgeQueueFull"""
+        if job.submission_id in self._active_ids:
+            return
+        if not self.has_capacity():
+            self._stats["rejected"] += 1
+            raise JudgeQueueFull()
+        self._queue.put_nowait(job)
+        self._active_ids.add(job.submission_id)
+        self._stats["enqueued"] += 1
+
+    async def recover(self, jobs: list[JudgeJob]):
+        """重新投递未完成的提交，队列满时等待空位而不是丢弃"""
+        for job in jobs:
+            if not self._accepting:
+                break
+            if job.submission_id in self._active_ids:
+                continue
+            self._active_ids.add(job.submission_id)
+            await self._queue.put(job)
+            self._stats["recovered"] += 1
+        if jobs:
+            logger.info("已恢复 %d 个待判题提交", self._stats["recovered"])
+
+    def park(self, job: JudgeJob, delay: float):
+        """在判题任务内调用：delay 秒后把任务重新放回队列"""
+        heapq.heappush(self._parked, (time.monotonic() + delay, self._stats["parked_total"], job))
+        self._parked_ids.add(job.submission_id)
+        self._stats["parked_total"] += 1
+
+    async def _unpark(self):
+        while True:
+            await asyncio.sleep(min(1.0, self._parked[0][0] - time.monotonic()) if self._parked else 1.0)
+            while self._parked and self._parked[0][0] <= time.monotonic():
+                _, _, job = heapq.heappop(self._parked)
+                await self._queue.put(job)
+                self._parked_ids.discard(job.submission_id)
+
+    def discard(self, submission_ids: set[int]):
+        """这些提交已被其他 worker 接管：暂存的直接丢弃，排队中的出队时跳过"""
+        submission_ids = set(submission_ids) & self._active_ids
+        if not submission_ids:
+            return
+        parked = submission_ids & self._parked_ids
+        if parked:
+            self._parked = [item for item in self._parked if item[2].submission_id not in parked]
+            heapq.heapify(self._parked)
+            self._parked_ids -= parked
+            self._active_ids -= parked
+        self._discarded |= submission_ids - parked
+
+    def active_submission_ids(self) -> set[int]:
+        """排队、判题中与暂存的提交"""
+        return set(self._active_ids)
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            self._in_flight += 1
+            try:
+                if job.submission_id in self._discarded:
+                    continue
+                await self._handler(job)
+                if job.submission_id not in self._parked_ids:
+                    self._stats["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._stats["failed"] += 1
+                logger.exception("判题任务失败: submission_id=%s", job.submission_id)
+            finally:
+                self._in_flight -= 1
+                if job.submission_id not in self._parked_ids:
+                    self._active_ids.discard(job.submission_id)
+                    self._discarded.discard(job.submission_id)
+                    self._latencies.append(time.monotonic() - job.enqueued_at)
+                self._queue.task_done()
+
+    # ---------------- 监控 ----------------
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {
+            **self._stats,
+            "workers": len(self._tasks),
+            "accepting": self._accepting,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_limit": self.max_queue,
+            "in_flight": self._in_flight,
+            "parked": len(self._parked),
+            "latency_p50": pct(0.5),
+            "latency_p95": pct(0.95),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+
+judge_dispatcher = JudgeDispatcher()
+
+
+def get_judge_dispatcher() -> JudgeDispatcher:
+    return judge_dispatcher
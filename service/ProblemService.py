@@ -1,39 +1,68 @@
 from typing import List, Optional
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from mapper.AsyncProblemMapper import AsyncProblemMapper
 from mapper.ProblemMapper import ProblemMapper
-from pojo.Problem import ProblemRead, Problem, ProblemCreate
+from pojo.Problem import ProblemRead, Problem, ProblemCreate, ProblemSummary, ProblemType
 from pojo.Result import Result
+from service.VerdictCache import get_verdict_cache
+from utils.pagination import encode_cursor, split_page
 
 
 class ProblemService:
 
     @staticmethod
-    def get_problem_by_id(problem_id: int) -> Result[Optional[ProblemRead]]:
-        problem = ProblemMapper.find_by_id(problem_id)
+    def get_problem_by_id(problem_id: int, session: Session) -> Result[Optional[ProblemRead]]:
+        problem = ProblemMapper.find_read_by_id(problem_id, session)
         if problem:
-            return Result.success(data=ProblemMapper.to_read(problem), message="查询成功")
-        return Result.failure(message="未找到对应题目")
-
-    @staticmethod
-    def get_problems_by_page(page: int, page_size: int = 20) -> Result[List[ProblemRead]]:
-        problems = ProblemMapper.find_by_page(page, page_size)
-        data = [ProblemMapper.to_read(p) for p in problems]
-        return Result.success(data=data, message="分页查询成功")
+            return Result.success(data=problem, message="查询成功")
+        return Result.error(message="未找到对应题目", code=404)
 
     @staticmethod
-    def get_problems_by_type(problem_type: str) -> Result[List[ProblemRead]]:
-        problems = ProblemMapper.find_by_type(problem_type)
-        data = [ProblemMapper.to_read(p) for p in problems]
-        return Result.success(data=data, message="按类型查询成功")
+    def get_problem_summaries(session: Session, problem_type: Optional[ProblemType] = None,
+                              name: Optional[str] = None, cursor: Optional[int] = None,
+                              page: int = 1, page_size: int = 20) -> Result[List[ProblemSummary]]:
+        """
+        题目列表，类型 / 名称 / 分页条件可任意组合，只查询摘要列
+        - 有 name：按相关度排序，cursor 为排序结果中的位置
+        - 无 name：按 id 游标分页；未传 cursor 且 page > 1 时走旧的 OFFSET 分页
+        """
+        if name:
+            offset = cursor if cursor is not None else (page - 1) * page_size
+            summaries = ProblemMapper.find_summaries_by_name(name, session, problem_type, offset, page_size + 1)
+            next_cursor = encode_cursor(offset + page_size) if len(summaries) > page_size else None
+            return Result.success(data=summaries[:page_size], message="按名称查询成功", next_cursor=next_cursor)
+        if cursor is None and page > 1:
+            summaries = ProblemMapper.find_summaries_by_page(page, session, problem_type, page_size)
+            next_cursor = encode_cursor(summaries[-1].id) if len(summaries) == page_size else None
+            return Result.success(data=summaries, message="分页查询成功", next_cursor=next_cursor)
+        summaries = ProblemMapper.find_summaries_after(cursor, session, problem_type, page_size + 1)
+        summaries, next_cursor = split_page(summaries, page_size)
+        return Result.success(data=summaries, message="分页查询成功", next_cursor=next_cursor)
 
     @staticmethod
-    def get_problems_by_name(name: str) -> Result[List[ProblemRead]]:
-        problems = ProblemMapper.find_by_name(name)
-        data = [ProblemMapper.to_read(p) for p in problems]
-        return Result.success(data=data, message="按名称查询成功")
+    def warm_search_index(session: Session) -> None:
+        """启动时预先构建题目搜索索引"""
+        ProblemMapper.sync_search_index(session, force=True)
 
     @staticmethod
-    def create_problem(problem: ProblemCreate) -> Result[ProblemRead]|Result[None]:
-        if problem.code_id is None and problem.type is 'coding':
+    def create_problem(problem: ProblemCreate, session: Session) -> Result[ProblemRead]|Result[None]:
+        if problem.code_id is None and problem.type == 'coding':
             return Result.error(message="编程题请提供对应判题id")
-        problem_read = ProblemMapper.create(problem)
+        problem_read = ProblemMapper.create(problem, session)
+        session.commit()
         return Result.success(data=problem_read, message="成功创建题目")
+
+    @staticmethod
+    async def testdata_changed(problem_id: int, session: AsyncSession) -> Result[dict] | Result[None]:
+        """题目在 HOJ 上的测试数据更新后调用，该 HOJ 题目之前缓存的判题结果全部失效"""
+        problem = await AsyncProblemMapper.find_read_by_id(problem_id, session)
+        if not problem:
+            return Result.error(message="未找到对应题目", code=404)
+        if not problem.code_id:
+            return Result.error(message="该题目没有对应的判题id", code=400)
+        data = await get_verdict_cache().invalidate(problem.code_id, session)
+        await session.commit()
+        return Result.success(data=data, message="判题结果缓存已失效")
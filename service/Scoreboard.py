@@ -0,0 +1,115 @@
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import SCOREBOARD_SYNC_INTERVAL
+from pojo.Scoreboard import ProblemStat, ProblemStatRead, ScoreboardEntry, UserScore
+
+# 排名键：通过数多的在前，罚时少的在前，最后一次首次通过早的在前，再按 user_id
+RankKey = Tuple[int, int, float, int]
+
+
+def _copy(row):
+    """与 session 脱离的副本，之后 ORM 对象再被修改也不影响内存中的排名"""
+    return type(row)(**row.model_dump())
+
+
+def _rank_key(score: UserScore) -> RankKey:
+    last = score.last_accept_at.timestamp() if score.last_accept_at else float("inf")
+    return -score.solved, score.penalty, last, score.user_id
+
+
+class Scoreboard:
+    """
+    内存中的排行榜与题目统计
+    排名用有序列表维护，单个用户变化是一次二分删除 + 插入，取一页只切片，与总提交数无关；
+    数据来源是汇总表：本进程的更新在提交后立即应用，其他进程的更新按 sync_interval 整表重新加载
+    """
+
+    def __init__(self, sync_interval: float = SCOREBOARD_SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._users: Dict[int, UserScore] = {}
+        self._ranking: List[RankKey] = []
+        self._problems: Dict[int, ProblemStat] = {}
+        self._loaded_at: Optional[float] = None
+
+    # ---------------- 加载 / 更新 ----------------
+    def needs_sync(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.sync_interval
+
+    def invalidate(self):
+        """下次查询时从汇总表重新加载"""
+        self._loaded_at = None
+
+    def load(self, users: Iterable[UserScore], problems: Iterable[ProblemStat]):
+        users = {u.user_id: _copy(u) for u in users if u.attempts > 0}
+        ranking = sorted(_rank_key(u) for u in users.values())
+        with self._lock:
+            self._users = users
+            self._ranking = ranking
+            self._problems = {p.problem_id: _copy(p) for p in problems}
+            self._loaded_at = time.monotonic()
+
+    def update(self, users: Iterable[UserScore], problems: Iterable[ProblemStat]):
+        with self._lock:
+            for score in users:
+                old = self._users.pop(score.user_id, None)
+                if old is not None:
+                    key = _rank_key(old)
+                    index = bisect.bisect_left(self._ranking, key)
+                    if index < len(self._ranking) and self._ranking[index] == key:
+                        del self._ranking[index]
+                if score.attempts > 0:
+                    self._users[score.user_id] = _copy(score)
+                    bisect.insort(self._ranking, _rank_key(score))
+            for stat in problems:
+                self._problems[stat.problem_id] = _copy(stat)
+
+    # ---------------- 查询 ----------------
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    def page(self, offset: int, limit: int) -> List[ScoreboardEntry]:
+        """按名次取一页；同通过数同罚时的用户名次相同"""
+        with self._lock:
+            keys = self._ranking[offset:offset + limit]
+            entries = []
+            for key in keys:
+                score = self._users[key[3]]
+                rank = bisect.bisect_left(self._ranking, key[:2]) + 1
+                entries.append(self._entry(rank, score))
+            return entries
+
+    def rank_of(self, user_id: int) -> Optional[ScoreboardEntry]:
+        with self._lock:
+            score = self._users.get(user_id)
+            if score is None:
+                return None
+            return self._entry(bisect.bisect_left(self._ranking, _rank_key(score)[:2]) + 1, score)
+
+    def problem(self, problem_id: int) -> ProblemStatRead:
+        stat = self._problems.get(problem_id)
+        if stat is None:
+            return ProblemStatRead(problem_id=problem_id)
+        return ProblemStatRead(
+            problem_id=problem_id,
+            attempts=stat.attempts,
+            accepted=stat.accepted,
+            solved_users=stat.solved_users,
+            attempted_users=stat.attempted_users,
+            acceptance_rate=round(stat.accepted / stat.attempts, 4) if stat.attempts else None,
+        )
+
+    @staticmethod
+    def _entry(rank: int, score: UserScore) -> ScoreboardEntry:
+        return ScoreboardEntry(rank=rank, user_id=score.user_id, solved=score.solved, penalty=score.penalty,
+                               attempts=score.attempts, last_accept_at=score.last_accept_at)
+
+
+scoreboard = Scoreboard()
+
+
+def get_scoreboard() -> Scoreboard:
+    return scoreboard
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import SCOREBOARD_PENALTY
+from mapper.AsyncScoreboardMapper import AsyncScoreboardMapper
+from mapper.ScoreboardMapper import ScoreboardMapper
+from pojo.Result import Result
+from pojo.Scoreboard import ProblemStat, ProblemStatRead, ScoreboardEntry, UserProblemState, UserScore
+from service.Scoreboard import get_scoreboard
+from utils.pagination import encode_cursor
+from utils.scoring import PairScore, ProblemTotals, UserTotals, apply_pair, score_pairs
+
+
+@dataclass
+class ScoreboardChanges:
+    """一次事务中变化的汇总行，提交后交给内存排行榜"""
+    users: List[UserScore] = field(default_factory=list)
+    problems: List[ProblemStat] = field(default_factory=list)
+
+
+class ScoreboardService:
+
+    # ---------------- 增量维护 ----------------
+    @staticmethod
+    async def lock_pairs(pairs: Set[Tuple[int, int]], session: AsyncSession) -> None:
+        """
+        在写入 / 修改这些 (用户, 题目) 的提交之前调用（同一事务），先锁住汇总行
+        所有写入方都按「汇总行 -> 提交行」的顺序加锁，record_pairs 的加锁读才不会与并发的提交写入互相等待而死锁
+        """
+        if pairs:
+            await AsyncScoreboardMapper.lock_rows(pairs, session)
+
+    @staticmethod
+    async def lock_submissions(submission_ids: Iterable[int], session: AsyncSession) -> Set[Tuple[int, int]]:
+        """按提交 id 锁住涉及的 (用户, 题目)，返回这些 (用户, 题目)，状态写入后交给 record_pairs"""
+        pairs = await AsyncScoreboardMapper.find_owners(submission_ids, session)
+        await ScoreboardService.lock_pairs(pairs, session)
+        return pairs
+
+    @staticmethod
+    async def record_pairs(pairs: Set[Tuple[int, int]], session: AsyncSession) -> ScoreboardChanges:
+        """
+        重新计算受影响的 (用户, 题目)，把与旧结果的差值加到用户和题目汇总上
+        只读取这些 (用户, 题目) 自己的提交，代价与总提交数无关；提交乱序出结果、管理员改判也能算对
+        先锁汇总行再读提交，读到的是持锁期间的最新数据
+        """
+        if not pairs:
+            return ScoreboardChanges()
+        old_states, users, problems = await AsyncScoreboardMapper.lock_rows(pairs, session)
+        new_pairs = score_pairs(await AsyncScoreboardMapper.find_counted_rows(pairs, session))
+        user_ids = set(users)
+
+        for user_id, problem_id in pairs:
+            user, problem = users[user_id], problems[problem_id]
+            user_totals = UserTotals(user.solved, user.penalty, user.attempts)
+            problem_totals = ProblemTotals(problem.attempts, problem.accepted,
+                                           problem.solved_users, problem.attempted_users)
+
+            old = old_states.get((user_id, problem_id))
+            if old is not None:
+                apply_pair(user_totals, problem_totals, ScoreboardService._to_pair(old), SCOREBOARD_PENALTY, -1)
+            new = new_pairs.get((user_id, problem_id), PairScore())
+            apply_pair(user_totals, problem_totals, new, SCOREBOARD_PENALTY)
+            await ScoreboardService._save_pair(user_id, problem_id, old, new, session)
+
+            user.solved, user.penalty, user.attempts = user_totals.solved, user_totals.penalty, user_totals.attempts
+            problem.attempts, problem.accepted = problem_totals.attempts, problem_totals.accepted
+            problem.solved_users, problem.attempted_users = problem_totals.solved_users, problem_totals.attempted_users
+
+        await session.flush()
+        last_accept = await AsyncScoreboardMapper.find_last_accept(user_ids, session)
+        for user_id, user in users.items():
+            user.last_accept_at = last_accept.get(user_id)
+        await session.flush()
+        return ScoreboardChanges(list(users.values()), list(problems.values()))
+
+    @staticmethod
+    def publish(changes: ScoreboardChanges) -> None:
+        """事务提交后调用，更新本进程的内存排行榜"""
+        if changes.users or changes.problems:
+            get_scoreboard().update(changes.users, changes.problems)
+
+    @staticmethod
+    def _to_pair(state: UserProblemState) -> PairScore:
+        return PairScore(state.attempts, state.accepted, state.solved, state.wrong_before_ac, state.first_accept_at)
+
+    @staticmethod
+    async def _save_pair(user_id: int, problem_id: int, old: Optional[UserProblemState], new: PairScore,
+                   session: AsyncSession) -> None:
+        if new.attempts == 0:
+            if old is not None:
+                # 提交被改回未判状态后不再计入；lock_rows 补齐但没有计入提交的空行也一并删掉
+                await AsyncScoreboardMapper.delete_pair_state(old, session)
+            return
+        state = old or UserProblemState(user_id=user_id, problem_id=problem_id)
+        state.attempts, state.accepted, state.solved = new.attempts, new.accepted, new.solved
+        state.wrong_before_ac, state.first_accept_at = new.wrong_before_ac, new.first_accept_at
+        session.add(state)
+
+    # ---------------- 查询 ----------------
+    @staticmethod
+    async def _sync(session: AsyncSession) -> None:
+        board = get_scoreboard()
+        if board.needs_sync():
+            users = await AsyncScoreboardMapper.find_all_user_scores(session)
+            problems = await AsyncScoreboardMapper.find_all_problem_stats(session)
+            board.load(users, problems)
+
+    @staticmethod
+    async def get_scoreboard(session: AsyncSession, offset: int = 0,
+                             page_size: int = 50) -> Result[List[ScoreboardEntry]]:
+        """排行榜一页，直接从内存切片，只为本页用户查一次用户名"""
+        await ScoreboardService._sync(session)
+        entries = get_scoreboard().page(offset, page_size)
+        names = await AsyncScoreboardMapper.find_user_names([e.user_id for e in entries], session)
+        for entry in entries:
+            entry.name = names.get(entry.user_id)
+        next_cursor = encode_cursor(offset + page_size) if offset + page_size < len(get_scoreboard()) else None
+        return Result.success(data=entries, message="查询成功", next_cursor=next_cursor)
+
+    @staticmethod
+    async def get_user_rank(user_id: int, session: AsyncSession) -> Result[Optional[ScoreboardEntry]]:
+        await ScoreboardService._sync(session)
+        entry = get_scoreboard().rank_of(user_id)
+        if entry is None:
+            return Result.error(message="暂无该用户的排名", code=404)
+        entry.name = (await AsyncScoreboardMapper.find_user_names([user_id], session)).get(user_id)
+        return Result.success(data=entry, message="查询成功")
+
+    @staticmethod
+    async def get_problem_stat(problem_id: int, session: AsyncSession) -> Result[ProblemStatRead]:
+        await ScoreboardService._sync(session)
+        return Result.success(data=get_scoreboard().problem(problem_id), message="查询成功")
+
+    # ---------------- 全量重建 ----------------
+    @staticmethod
+    def rebuild(session: Session) -> Result[dict]:
+        """按提交历史重建汇总表，并重新加载内存排行榜"""
+        users, problems = ScoreboardMapper.rebuild(session, SCOREBOARD_PENALTY)
+        session.commit()
+        get_scoreboard().invalidate()
+        return Result.success(data={"users": users, "problems": problems}, message="排行榜已重建")
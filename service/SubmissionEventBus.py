@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set
+
+from config import SUBMISSION_EVENT_QUEUE_SIZE
+
+# 提交的最终状态，出现后不会再变化
+FINAL_STATUSES = {"accepted", "rejected", "wrong", "error"}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SubmissionEvent:
+    submission_id: int
+    user_id: int
+    status: str
+    at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return {"submission_id": self.submission_id, "status": self.status, "at": self.at}
+
+
+class Subscription:
+    """
+    一个推送连接的订阅
+    只持有一个小的有界队列，空闲连接不占用额外协程；消费太慢时丢弃最旧的事件，
+    客户端可以用 GET /submissions/{id} 补齐
+    """
+
+    def __init__(self, bus: "SubmissionEventBus", user_id: int, submission_ids: Optional[Set[int]] = None):
+        self.bus = bus
+        self.user_id = user_id
+        # 为 None 时接收该用户的所有提交
+        self.submission_ids = submission_ids
+        self.closed = False
+        self.dropped = 0
+        # submission_id -> 最近推送的状态，用于丢弃转发来的重复事件
+        self._last: Dict[int, str] = {}
+        self._queue: asyncio.Queue[Optional[SubmissionEvent]] = asyncio.Queue(maxsize=SUBMISSION_EVENT_QUEUE_SIZE)
+
+    def wants(self, event: SubmissionEvent) -> bool:
+        return self.submission_ids is None or event.submission_id in self.submission_ids
+
+    def wants_relayed(self, event: SubmissionEvent) -> bool:
+        """
+        数据库转发来的事件：最终状态只推送一次；中间状态只在还没推送过该提交时推送，
+        不会把本进程已推送的 judging 等状态倒退回数据库中的 pending
+        """
+        if not self.wants(event):
+            return False
+        last = self._last.get(event.submission_id)
+        if event.status in FINAL_STATUSES:
+            return last != event.status
+        return last is None
+
+    def seen(self, submission_id: int, status: str):
+        """快照等不经过队列直接发给客户端的状态"""
+        self._last[submission_id] = status
+
+    def offer(self, event: Optional[SubmissionEvent]):
+        if event is not None:
+            self._last[event.submission_id] = event.status
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[SubmissionEvent]:
+        """等待下一个事件；超时返回 None（用于发送心跳），订阅关闭时抛出 StopAsyncIteration"""
+        if self.closed and self._queue.empty():
+            raise StopAsyncIteration
+        try:
+            event = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is None:
+            self.closed = True
+            raise StopAsyncIteration
+        return event
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class SubmissionEventBus:
+    """
+    进程内的判题状态发布/订阅
+    按 user_id 分桶，发布只遍历该用户的订阅；连接建立时先推送一次当前状态快照，之后推送状态变化
+    本进程回写的变化由 publish 立即分发；多 worker 部署时其他 worker 回写的变化由
+    relay_submission_events（app.py）定期从数据库查出后经 relay 分发
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0, "relayed": 0}
+
+    def subscribe(self, user_id: int, submission_ids: Optional[Iterable[int]] = None) -> Subscription:
+        subscription = Subscription(self, user_id, set(submission_ids) if submission_ids is not None else None)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+        self._stats["dropped"] += subscription.dropped
+        subscription.dropped = 0
+
+    def publish(self, user_id: Optional[int], submission_id: int, status: str):
+        """发布一次状态变化，不阻塞"""
+        if user_id is None:
+            return
+        self._stats["published"] += 1
+        subscribers = self._subscribers.get(user_id)
+        if not subscribers:
+            return
+        event = SubmissionEvent(submission_id, user_id, status)
+        for subscription in subscribers:
+            if subscription.wants(event):
+                subscription.offer(event)
+                self._stats["delivered"] += 1
+
+    def subscribed_user_ids(self) -> list[int]:
+        return list(self._subscribers)
+
+    def relay(self, rows: Iterable[tuple[int, int, str]]):
+        """分发从数据库查到的 (submission_id, user_id, status)，本进程已推送过的跳过"""
+        for submission_id, user_id, status in rows:
+            subscribers = self._subscribers.get(user_id)
+            if not subscribers:
+                continue
+            event = SubmissionEvent(submission_id, user_id, status)
+            for subscription in subscribers:
+                if subscription.wants_relayed(event):
+                    subscription.offer(event)
+                    self._stats["relayed"] += 1
+
+    def close(self):
+        """关闭所有订阅，让推送连接在应用退出时结束"""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.offer(None)
+        self._subscribers.clear()
+
+    # ---------------- 监控 ----------------
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "users": len(self._subscribers),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+        }
+
+
+submission_event_bus = SubmissionEventBus()
+
+
+def get_submission_event_bus() -> SubmissionEventBus:
+    return submission_event_bus
@@ -1,96 +1,336 @@
 import asyncio
-from time import sleep
+import logging
+import random
+import time
+from datetime import datetime
 
 from sqlmodel import Session
-from typing import List, Optional, Any
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import AsyncIterator, List, Optional, Any, Set, Tuple
 
-from config import engine
-from pojo.Submission import Submission, SubmissionUpdate
-from pojo.Problem import Problem
+from config import async_session_maker, replica_router, SUBMISSION_EVENT_HEARTBEAT, JUDGE_PARK_MAX
+from pojo.Submission import Submission, SubmissionBatchItem, SubmissionCreate, SubmissionUpdate
+from pojo.Problem import Problem, ProblemRead
 from mapper.SubmissionMapper import SubmissionMapper
 from mapper.ProblemMapper import ProblemMapper
+from mapper.AsyncSubmissionMapper import AsyncSubmissionMapper
+from mapper.AsyncProblemMapper import AsyncProblemMapper
 from pojo.Result import Result
-from service.HojService import HojClient
+from utils.grading import grade
+from utils.scoring import COUNTED_STATUSES
+from utils.pagination import split_page
+from service.HojService import HojUnavailable, get_hoj_client
+from service.ScoreboardService import ScoreboardService
+from service.SubmissionEventBus import FINAL_STATUSES, get_submission_event_bus
+from service.JudgeDispatcher import JudgeJob, JudgeQueueFull, get_judge_dispatcher
+from service.VerdictCache import get_verdict_cache
+from service.VerdictPoller import get_verdict_poller
+
+logger = logging.getLogger(__name__)
 
 
 class SubmissionService:
 
 
     @staticmethod
-    def submit_answer(user_id: int, problem_id: int, data: str) -> Result[None] | Result[Submission]:
+    async def submit_answer(user_id: int, problem_id: int, data: str,
+                            session: AsyncSession) -> Result[None] | Result[Submission]:
+        """提交答案，使用请求级异步 session，不阻塞事件循环"""
+        problem: Optional[ProblemRead] = await AsyncProblemMapper.find_read_by_id(problem_id, session)
+        if not problem:
+            return Result.error(message="题目不存在", code=404)
+
+        is_coding = SubmissionService._is_coding(problem)
+        dispatcher = get_judge_dispatcher()
+        verdict_cache = get_verdict_cache()
+        cached = None
+        if is_coding:
+            # 相同源码判过（直接出结果）或正在判（挂到那次判题上）时不占判题队列
+            cached = (await verdict_cache.lookup([(problem.code_id, data)], session))[0]
+            if cached.status is None and not verdict_cache.in_flight(cached) and not dispatcher.has_capacity():
+                return Result.error(message="判题队列繁忙，请稍后重试", code=503)
+
+        submission = Submission(
+            user_id=user_id,
+            problem_id=problem_id,
+            user_answer=data,
+            status=cached.status if cached and cached.status else SubmissionService._initial_status(problem, data),
+        )
+        counted = {(user_id, problem_id)} if submission.status in COUNTED_STATUSES else set()
+        await ScoreboardService.lock_pairs(counted, session)
+        await AsyncSubmissionMapper.insert(submission, session)
+        changes = await ScoreboardService.record_pairs(counted, session)
+        await session.commit()
+        # 之后一段时间内该用户查自己的提交记录走主库，不会因副本延迟看不到刚提交的记录
+        replica_router.pin_user(user_id)
+        ScoreboardService.publish(changes)
 
-                problem: Optional[Problem] = ProblemMapper.find_by_id(problem_id)
-                if not problem:
-                    return Result.error(message="题目不存在")
+        # 如果是编程题，提交落库后交给判题调度器排队执行
+        if is_coding and cached.status is None and not verdict_cache.join(cached, submission.id, user_id):
+            try:
+                dispatcher.enqueue(JudgeJob(submission.id, problem.code_id, data, user_id))
+                verdict_cache.begin(cached, submission.id)
+            except JudgeQueueFull:
+                await AsyncSubmissionMapper.update(submission, SubmissionUpdate(status="error", user_answer=data), session)
+                await session.commit()
+                return Result.error(message="判题队列繁忙，请稍后重试", code=503)
+
+        return Result.success(data=submission, message="提交成功")
+
+    @staticmethod
+    async def submit_batch(user_id: int, items: List[SubmissionCreate],
+                           session: AsyncSession) -> Result[List[SubmissionBatchItem]]:
+        """
+        批量提交（整张试卷）
+        一次 IN 查询取全部题目，客观题内存判分，所有提交在同一事务中批量插入，
+        提交后编程题逐个进入判题队列（命中判题结果缓存的直接出结果）；每道题的结果按请求顺序返回
+        """
+        problems = await AsyncProblemMapper.find_read_by_ids((item.problem_id for item in items), session)
+        dispatcher = get_judge_dispatcher()
+        verdict_cache = get_verdict_cache()
+        coding = [(index, item) for index, item in enumerate(items)
+                  if item.problem_id in problems and SubmissionService._is_coding(problems[item.problem_id])]
+        lookups = await verdict_cache.lookup(
+            [(problems[item.problem_id].code_id, item.user_answer) for _, item in coding], session)
+        cached = {index: lookup for (index, _), lookup in zip(coding, lookups)}
+        coding_count = sum(1 for lookup in cached.values()
+                           if lookup.status is None and not verdict_cache.in_flight(lookup))
+        accept_coding = coding_count == 0 or dispatcher.has_capacity(coding_count)
 
-                submission = Submission(
-                    user_id=user_id,
-                    problem_id=problem_id,
-                    data=data,
-                    status="PENDING",
-                )
+        results: List[SubmissionBatchItem] = []
+        submissions: List[Tuple[SubmissionBatchItem, Submission]] = []
+        for index, item in enumerate(items):
+            problem = problems.get(item.problem_id)
+            if problem is None:
+                results.append(SubmissionBatchItem(index=index, problem_id=item.problem_id,
+                                                   code=404, message="题目不存在"))
+                continue
+            lookup = cached.get(index)
+            if lookup is not None and lookup.status is None and not accept_coding:
+                results.append(SubmissionBatchItem(index=index, problem_id=item.problem_id,
+                                                   code=503, message="判题队列繁忙，请稍后重试"))
+                continue
+            if lookup is not None and lookup.status is not None:
+                status = lookup.status
+            else:
+                status = SubmissionService._initial_status(problem, item.user_answer)
+            submission = Submission(
+                user_id=user_id,
+                problem_id=item.problem_id,
+                user_answer=item.user_answer,
+                status=status,
+            )
+            result = SubmissionBatchItem(index=index, problem_id=item.problem_id, code=200, message="提交成功")
+            results.append(result)
+            submissions.append((result, submission))
 
-                SubmissionMapper.insert(submission)
+        if submissions:
+            counted = {(user_id, s.problem_id) for _, s in submissions if s.status in COUNTED_STATUSES}
+            await ScoreboardService.lock_pairs(counted, session)
+            await AsyncSubmissionMapper.insert_many([s for _, s in submissions], session)
+            changes = await ScoreboardService.record_pairs(counted, session)
+            await session.commit()
+            replica_router.pin_user(user_id)
+            ScoreboardService.publish(changes)
 
-                # 如果是编程题，丢给 HOJ 判题机异步执行
-                if problem.type in ("coding", "编程题"):
-                    asyncio.create_task(SubmissionService._judge_with_hoj(submission.id, problem.code_id, data))
+        rejected: dict[int, str] = {}
+        for result, submission in submissions:
+            result.submission_id = submission.id
+            result.status = submission.status
+            lookup = cached.get(result.index)
+            # 客观题、命中缓存的编程题已是最终状态；正在判的相同源码挂到那次判题上
+            if lookup is None or lookup.status is not None or verdict_cache.join(lookup, submission.id, user_id):
+                continue
+            try:
+                dispatcher.enqueue(JudgeJob(submission.id, problems[submission.problem_id].code_id,
+                                            submission.user_answer, user_id))
+                verdict_cache.begin(lookup, submission.id)
+            except JudgeQueueFull:
+                rejected[submission.id] = "error"
+                result.code, result.message, result.status = 503, "判题队列繁忙，请稍后重试", "error"
+        if rejected:
+            await AsyncSubmissionMapper.update_status_bulk(rejected, session)
+            await session.commit()
 
-                else:  # 选择题/填空题直接判分
-                    correct_answer = problem.answer
-                    if correct_answer and correct_answer == data:
-                        status = "accepted"
-                    else:
-                        status = "wrong"
-                    user_answer = data
-                    SubmissionMapper.update(submission, SubmissionUpdate(status=status, user_answer=user_answer))
+        accepted = sum(1 for r in results if r.code == 200)
+        return Result.success(data=results, message=f"成功提交 {accepted}/{len(items)} 题")
 
-                return Result.success(data=submission, message="提交成功")
+    @staticmethod
+    def _is_coding(problem: ProblemRead) -> bool:
+        return problem.type in ("coding", "编程题")
+
+    @staticmethod
+    def _initial_status(problem: ProblemRead, data: str) -> str:
+        """选择题/填空题在内存中直接判分，提交一次写入最终状态；编程题等待判题"""
+        if SubmissionService._is_coding(problem):
+            return "PENDING"
+        return "accepted" if grade(problem.type, problem.answer, problem.options, data) else "wrong"
+
+    @staticmethod
+    async def relay_status_changes(since: datetime) -> None:
+        """把本进程有订阅的用户 since 之后变化的提交交给事件总线转发（其他 worker 回写的结果）"""
+        bus = get_submission_event_bus()
+        user_ids = bus.subscribed_user_ids()
+        if not user_ids:
+            return
+        async with async_session_maker() as session:
+            for start in range(0, len(user_ids), 500):
+                bus.relay(await AsyncSubmissionMapper.find_changed_since(user_ids[start:start + 500], since, session))
+
+    @staticmethod
+    async def stream_statuses(user_id: int, submission_ids: Optional[List[int]] = None,
+                              heartbeat: float = SUBMISSION_EVENT_HEARTBEAT) -> AsyncIterator[Optional[dict]]:
+        """
+        判题状态推送流，供 SSE / WebSocket 使用
+        先订阅再查一次当前状态作为快照，避免订阅前已出结果的提交被漏掉；
+        指定了 submission_ids 时全部出结果后结束。空闲超过 heartbeat 秒产出 None 作为心跳
+        不占用请求级 session：长连接期间不持有数据库连接
+        """
+        subscription = get_submission_event_bus().subscribe(user_id, submission_ids)
+        try:
+            remaining = set(submission_ids) if submission_ids is not None else None
+            if submission_ids:
+                async with async_session_maker() as session:
+                    snapshot = await AsyncSubmissionMapper.find_statuses(user_id, submission_ids, session)
+                # 不属于该用户或不存在的提交不会有推送，直接不再等待
+                remaining &= set(snapshot)
+                for submission_id, status in snapshot.items():
+                    subscription.seen(submission_id, status)
+                    yield {"submission_id": submission_id, "status": status}
+                    if status in FINAL_STATUSES:
+                        remaining.discard(submission_id)
+            while remaining is None or remaining:
+                try:
+                    event = await subscription.get(heartbeat)
+                except StopAsyncIteration:
+                    return
+                if event is None:
+                    yield None
+                    continue
+                yield event.to_dict()
+                if remaining is not None and event.status in FINAL_STATUSES:
+                    remaining.discard(event.submission_id)
+        finally:
+            subscription.close()
+
+    @staticmethod
+    async def judge_job(job: JudgeJob):
+        """
+        判题调度器的任务入口
+        HOJ 暂时不可用（提交确定没有送达）时暂存任务、稍后重试（不超过 JUDGE_PARK_MAX）；
+        其余异常把提交标记为 error，包括提交可能已被 HOJ 受理的 HojSubmitOutcomeUnknown（重发会重复判题）
+        """
+        try:
+            await SubmissionService._judge_with_hoj(job.submission_id, job.code_id, job.code, job.user_id)
+        except HojUnavailable as e:
+            if time.monotonic() - job.enqueued_at > JUDGE_PARK_MAX:
+                await SubmissionService._mark_job_error(job)
+                raise
+            # 加抖动，避免熔断恢复时暂存的任务同时涌向 HOJ
+            get_judge_dispatcher().park(job, max(1.0, e.retry_after) * random.uniform(1.0, 1.5))
+        except Exception:
+            await SubmissionService._mark_job_error(job)
+            raise
+
+    @staticmethod
+    async def _mark_job_error(job: JudgeJob):
+        """判题失败：提交及合并到这次判题上的相同提交一并标记为 error"""
+        verdict_cache = get_verdict_cache()
+        followers, _ = verdict_cache.complete({job.submission_id: "error"})
+        owners = {job.submission_id: job.user_id, **{i: user_id for i, user_id, _ in followers}}
+        async with async_session_maker() as session:
+            await AsyncSubmissionMapper.update_status_bulk({i: "error" for i in owners}, session)
+            await session.commit()
+        verdict_cache.release([job.submission_id])
+        bus = get_submission_event_bus()
+        for submission_id, user_id in owners.items():
+            bus.publish(user_id, submission_id, "error")
+
+    @staticmethod
+    async def claim_pending_jobs(owner: str, created_before: Optional[datetime] = None,
+                                 stale_before: Optional[datetime] = None,
+                                 exclude: Set[int] = frozenset()) -> List[JudgeJob]:
+        """
+        恢复用：接管数据库中仍为 pending 的编程题提交，改由 owner 负责
+        多 worker 部署时只取 created_before 之前创建的（服务启动前遗留的）或心跳早于 stale_before 的，
+        避免抢走其他 worker 正在判的提交；exclude 为本进程手上的提交
+        """
+        async with async_session_maker() as session:
+            rows = await AsyncSubmissionMapper.find_pending_coding(session, created_before, stale_before)
+            rows = [row for row in rows if row[0] not in exclude]
+            claimed = set(await AsyncSubmissionMapper.claim([row[0] for row in rows], owner, stale_before, session))
+            await session.commit()
+        return [JudgeJob(submission_id, code_id, code, user_id, hoj_submit_id)
+                for submission_id, code_id, code, user_id, hoj_submit_id in rows if submission_id in claimed]
+
+    @staticmethod
+    async def touch_judging(submission_ids: List[int], owner: str) -> List[int]:
+        """刷新本 worker 手上 pending 提交的心跳，leader 不会接管这些提交；返回已被其他 worker 接管的"""
+        if not submission_ids:
+            return []
+        async with async_session_maker() as session:
+            lost = await AsyncSubmissionMapper.touch_heartbeat(sorted(submission_ids), owner, session)
+            await session.commit()
+        return lost
 
     @staticmethod
-    async def _judge_with_hoj(submission_id: int, code_id: int, code: str):
+    async def _judge_with_hoj(submission_id: int, code_id: int, code: str, user_id: Optional[int] = None):
             """
-            异步提交到 HOJ 并回写数据库
+            异步提交到 HOJ，结果由 VerdictPoller 统一轮询并回写数据库
             """
-            client = HojClient()
+            client = get_hoj_client()
             submit_id = await client.submit(pid=str(code_id), code=code)
+            # 记下 HOJ 提交号：本进程退出或崩溃后，恢复流程只重新轮询结果，不会再提交一次
+            try:
+                async with async_session_maker() as session:
+                    await AsyncSubmissionMapper.set_hoj_submit_id(submission_id, submit_id, session)
+                    await session.commit()
+            except Exception:
+                logger.warning("记录 HOJ 提交号失败: submission_id=%s", submission_id, exc_info=True)
+            get_verdict_poller().track(submission_id, submit_id, user_id)
+            get_submission_event_bus().publish(user_id, submission_id, "judging")
 
-            # 轮询判题结果
-            while True:
-                result = await client.get_result(submit_id)
-                status = result
-                if status <1:
-                    status = "accepted" if status == 0 else "rejected"
-                    submission=SubmissionMapper.find_by_id(submission_id)
-                    submission_update=SubmissionUpdate(status=status,user_answer=code)
-                    SubmissionMapper.update(submission, submission_update)
-                    break
-                await asyncio.sleep(2)
     @staticmethod
-    def get_user_submissions(user_id: int, problem_id: int) -> Result[List[Submission]]:
-        with Session(engine) as session:
-            submissions = SubmissionMapper.find_by_user_and_problem(user_id, problem_id, session)
-            return Result.success(data=submissions)
+    def get_user_submissions(user_id: int, problem_id: int, session: Session,
+                             before_id: Optional[int] = None, page_size: int = 20) -> Result[List[Submission]]:
+        with replica_router.sticky(user_id):
+            submissions = SubmissionMapper.find_by_user_and_problem(user_id, problem_id, session,
+                                                                    before_id, page_size + 1)
+        submissions, next_cursor = split_page(submissions, page_size, key=lambda r: r["id"])
+        return Result.success(data=submissions, next_cursor=next_cursor)
 
     @staticmethod
-    def get_all_user_submissions(user_id: int) -> Result[List[Submission]]:
-        with Session(engine) as session:
-            submissions = SubmissionMapper.find_all_by_user(user_id, session)
-            return Result.success(data=submissions)
+    def get_all_user_submissions(user_id: int, session: Session,
+                                 before_id: Optional[int] = None, page_size: int = 20) -> Result[List[Submission]]:
+        with replica_router.sticky(user_id):
+            submissions = SubmissionMapper.find_all_by_user(user_id, session, before_id, page_size + 1)
+        submissions, next_cursor = split_page(submissions, page_size, key=lambda r: r["id"])
+        return Result.success(data=submissions, next_cursor=next_cursor)
 
     @staticmethod
-    def update_submission_status(submission_id: int, status: str) -> Result[None] | Result[Submission]:
-        with Session(engine) as session:
-            submission: Optional[Submission] = SubmissionMapper.find_by_id(submission_id)
-            if not submission:
-                return Result.error(message="提交记录不存在")
-            submission_update=SubmissionUpdate.model_value(submission)
-            submission_update.status = status
-            SubmissionMapper.update(submission,submission_update)
-            return Result.success(data=submission, message="更新成功")
+    async def update_submission_status(submission_id: int, status: str,
+                                       session: AsyncSession) -> Result[None] | Result[Submission]:
+        """管理员改判，排行榜随之重新计算该用户该题"""
+        submission: Optional[Submission] = await AsyncSubmissionMapper.find_by_id(submission_id, session)
+        if not submission:
+            return Result.error(message="提交记录不存在", code=404)
+        pair = {(submission.user_id, submission.problem_id)}
+        await ScoreboardService.lock_pairs(pair, session)
+        submission_update = SubmissionUpdate(user_answer=submission.user_answer, status=status)
+        await AsyncSubmissionMapper.update(submission, submission_update, session)
+        changes = await ScoreboardService.record_pairs(pair, session)
+        await session.commit()
+        replica_router.pin_user(submission.user_id)
+        ScoreboardService.publish(changes)
+        get_submission_event_bus().publish(submission.user_id, submission.id, status)
+        return Result.success(data=submission, message="更新成功")
 
 
     @staticmethod
-    def get_submission_by_id(submission_id: int) -> Result[Submission]:
-        submission: Optional[Submission] = SubmissionMapper.find_by_id(submission_id)
-        return Result.success(data=submission,message="成功获取submission")
\ No newline at end of file
+    def get_submission_by_id(submission_id: int, session: Session, user_id: Optional[int] = None) -> Result[Submission]:
+        """user_id 为查询者：刚提交过时走主库，不会因副本延迟查不到刚创建的提交"""
+        with replica_router.sticky(user_id):
+            submission: Optional[Submission] = SubmissionMapper.find_by_id(submission_id, session)
+        if not submission:
+            return Result.error(message="提交记录不存在", code=404)
+        return Result.success(data=submission,message="成功获取submission")
@@ -1,91 +1,172 @@
+import asyncio
 import csv
-from io import StringIO
-from typing import Any, IO, List
+import io
+from itertools import islice
+from typing import IO, Iterator, List, Set, Tuple
 
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import replica_router, USER_IMPORT_CHUNK_SIZE, USER_IMPORT_MAX_ERRORS
 from mapper.UserMapper import UserMapper
-from pojo.User import User, UserRead
+from mapper.AsyncUserMapper import AsyncUserMapper
+from pojo.User import UserRead, UserImportError, UserImportSummary
 from pojo.Result import Result
-from utils.security import hash_password, verify_password, create_access_token
+from utils.replica import primary
+from utils.security import ahash_password, ahash_passwords, averify_and_update_password, create_access_token
 
 
 class UserService:
 
     @staticmethod
-    def create_user(name: str, password: str) -> Result[None] | Result[UserRead]:
-        user = UserMapper.find_by_name(name)
+    def create_user(name: str, password: str, session: Session) -> Result[None] | Result[UserRead]:
+        user = UserMapper.find_by_name(name, session)
         if user:
             return Result.error(message="用户名已存在", code=400)
-        new_user = UserMapper.create(name, password)
+        try:
+            new_user = UserMapper.create(name, password, session)
+            session.commit()
+        except IntegrityError:
+            # 并发创建同名用户时由 users.name 唯一索引兜底
+            session.rollback()
+            return Result.error(message="用户名已存在", code=400)
         return Result.success(data=new_user, message="用户创建成功")
 
     @staticmethod
-    def update_user(user_id: int, name: str, password: str | None = None) -> Result[None] | Result[UserRead]:
-        user = UserMapper.find_by_id(user_id)
+    def update_user(user_id: int, name: str, session: Session, password: str | None = None) -> Result[None] | Result[UserRead]:
+        # 要修改的行从主库读
+        with primary():
+            user = UserMapper.find_by_id(user_id, session)
         if not user:
             return Result.error(message="用户不存在", code=404)
-        updated_user = UserMapper.update(user, name, password)
+        updated_user = UserMapper.update(user, name, session, password)
+        session.commit()
+        replica_router.pin_user(user_id)
         return Result.success(data=updated_user, message="用户更新成功")
 
     @staticmethod
-    def get_user_by_id(user_id: int) -> Result[None] | Result[UserRead]:
-        user = UserMapper.find_by_id(user_id)
+    def get_user_by_id(user_id: int, session: Session) -> Result[None] | Result[UserRead]:
+        with replica_router.sticky(user_id):
+            user = UserMapper.find_by_id(user_id, session)
         if not user:
             return Result.error(message="用户不存在", code=404)
         return Result.success(data=UserMapper.to_read(user))
 
     @staticmethod
-    def get_user_by_name(name: str) -> Result[None] | Result[UserRead]:
-        user = UserMapper.find_by_name(name)
+    def get_user_by_name(name: str, session: Session) -> Result[None] | Result[UserRead]:
+        user = UserMapper.find_by_name(name, session)
         if not user:
             return Result.error(message="用户不存在", code=404)
         return Result.success(data=UserMapper.to_read(user))
     @staticmethod
-    def register(name: str, password: str) -> Result[None] | Result[UserRead]:
-        user = UserMapper.find_by_name(name)
+    async def register(name: str, password: str, session: AsyncSession) -> Result[None] | Result[UserRead]:
+        user = await AsyncUserMapper.find_by_name(name, session)
         if user:
             return Result.error(message="用户名已存在", code=400)
-        hashed_pwd = hash_password(password)
-        new_user = UserMapper.create(name, hashed_pwd)
+        hashed_pwd = await ahash_password(password)
+        try:
+            new_user = await AsyncUserMapper.create(name, hashed_pwd, session)
+            await session.commit()
+        except IntegrityError:
+            # 并发注册同名用户时由 users.name 唯一索引兜底
+            await session.rollback()
+            return Result.error(message="用户名已存在", code=400)
         return Result.success(data=new_user, message="注册成功")
 
     @staticmethod
-    def login(name: str, password: str) -> Result[None] | Result[UserRead]:
-        user = UserMapper.find_by_name(name)
+    async def login(name: str, password: str, session: AsyncSession) -> Result[None] | Result[UserRead]:
+        user = await AsyncUserMapper.find_by_name(name, session)
         if not user:
             return Result.error(message="用户不存在", code=404)
-        # 校验密码
-        if not verify_password(password, user.password):
+        # 校验密码；bcrypt cost 调整过时顺带换成新哈希
+        verified, new_hash = await averify_and_update_password(password, user.password)
+        if not verified:
             return Result.error(message="密码错误", code=401)
+        if new_hash:
+            await AsyncUserMapper.update_password(user, new_hash, session)
+            await session.commit()
         # 生成 JWT
         token = create_access_token({"sub": str(user.id), "name": user.name,"user_id": user.id})
         return Result.success(data=token, message="登录成功")
     @staticmethod
-    def import_users_from_csv(file: bytes) -> Result[None] | Result[list[UserRead]]:
+    async def import_users_from_csv(file: IO[bytes], session: AsyncSession) -> Result[None] | Result[UserImportSummary]:
         """
         批量导入用户
-        file: CSV 文件流, 必须包含 name,password 两列
+        file: 上传的 CSV 二进制流, 必须包含 name,password 两列
+        流式解码、按 USER_IMPORT_CHUNK_SIZE 分批入库，每批一次查重、一次多行 INSERT、一次提交，
+        内存占用与文件大小无关；重复或非法的行记入错误明细，不影响其他行
         """
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
         try:
-            # 解析 CSV 文件
-            file_content =file.decode("utf-8")
-            csv_reader = csv.DictReader(StringIO(file_content))
+            fieldnames = await asyncio.to_thread(lambda: reader.fieldnames)
+        except UnicodeDecodeError:
+            return Result.error(message="CSV 文件需为 UTF-8 编码", code=400)
+        if not fieldnames or "name" not in fieldnames or "password" not in fieldnames:
+            return Result.error(message="CSV 文件必须包含 name,password 两列", code=400)
 
-            users_to_add = []
-            for row in csv_reader:
-                if "name" in row and "password" in row:
-                    users_to_add.append({
-                        "name": row["name"].strip(),
-                        "password": hash_password(row["password"].strip())
-                    })
+        def numbered_rows() -> Iterator[Tuple[int, dict]]:
+            for row in reader:
+                yield reader.line_num, row
 
-            if not users_to_add:
-                return Result.error(message="CSV 文件中未找到有效用户数据")
+        rows = numbered_rows()
+        summary = UserImportSummary()
+        seen: Set[str] = set()
+        while True:
+            try:
+                chunk = await asyncio.to_thread(lambda: list(islice(rows, USER_IMPORT_CHUNK_SIZE)))
+            except (UnicodeDecodeError, csv.Error) as e:
+                UserService._import_error(summary, reader.line_num, None, f"解析失败，导入中止: {e}")
+                break
+            if not chunk:
+                break
+            summary.total += len(chunk)
 
-            # 批量插入
-            inserted_users = UserMapper.bulk_insert(users_to_add)
+            candidates: List[Tuple[int, str, str]] = []
+            for line, row in chunk:
+                name = (row.get("name") or "").strip()
+                password = (row.get("password") or "").strip()
+                if not name or not password:
+                    UserService._import_error(summary, line, name or None, "用户名或密码为空")
+                elif name in seen:
+                    UserService._import_error(summary, line, name, "文件中用户名重复")
+                else:
+                    seen.add(name)
+                    candidates.append((line, name, password))
+            await UserService._import_chunk(candidates, summary, session)
 
-            # 返回 Result
-            return Result.success(data=[UserRead.model_validate(u) for u in inserted_users],
-                                  message=f"成功导入 {len(inserted_users)} 个用户")
-        except Exception as e:
-            return Result.error(message=f"导入失败: {str(e)}")
\ No newline at end of file
+        if summary.total == 0:
+            return Result.error(message="CSV 文件中未找到有效用户数据", code=400)
+        return Result.success(data=summary, message=f"成功导入 {summary.imported} 个用户，失败 {summary.failed} 个")
+
+    @staticmethod
+    async def _import_chunk(candidates: List[Tuple[int, str, str]], summary: UserImportSummary,
+                            session: AsyncSession) -> None:
+        # 与其他请求并发创建同名用户时唯一索引会报错，重新查重后再试一次
+        for attempt in range(2):
+            existing = await AsyncUserMapper.find_existing_names((name for _, name, _ in candidates), session)
+            for line, name, _ in candidates:
+                if name in existing:
+                    UserService._import_error(summary, line, name, "用户名已存在")
+            candidates = [c for c in candidates if c[1] not in existing]
+            if not candidates:
+                return
+            hashed = await ahash_passwords([pwd for _, _, pwd in candidates])
+            try:
+                inserted = await AsyncUserMapper.insert_many(
+                    [{"name": name, "password": pwd} for (_, name, _), pwd in zip(candidates, hashed)], session)
+                await session.commit()
+                summary.imported += len(inserted)
+                return
+            except IntegrityError:
+                await session.rollback()
+        for line, name, _ in candidates:
+            UserService._import_error(summary, line, name, "写入失败")
+
+    @staticmethod
+    def _import_error(summary: UserImportSummary, line: int, name: str | None, reason: str) -> None:
+        summary.failed += 1
+        if len(summary.errors) < USER_IMPORT_MAX_ERRORS:
+            summary.errors.append(UserImportError(line=line, name=name, reason=reason))
+        else:
+            summary.errors_truncated = True
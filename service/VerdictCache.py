@@ -0,0 +1,165 @@
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import HOJ_LANGUAGE, VERDICT_CACHE_ENABLED
+from mapper.AsyncVerdictCacheMapper import AsyncVerdictCacheMapper
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_source(code: str) -> str:
+    """去掉 BOM、统一换行、去掉行尾空白与末尾空行；不改动行内内容（Python 的缩进、字符串都有语义）"""
+    code = code.lstrip("\ufeff").replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in code.split("\n")).strip("\n")
+
+
+def cache_key(code_id: int, version: int, code: str, language: str = HOJ_LANGUAGE) -> str:
+    digest = hashlib.sha256()
+    for part in (str(code_id), str(version), language, normalize_source(code)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass
+class VerdictLookup:
+    """一次缓存查询的结果；key 为 None 表示缓存未启用"""
+    key: Optional[str]
+    code_id: int
+    version: int = 0
+    status: Optional[str] = None
+
+
+@dataclass
+class InFlight:
+    """正在判题的源码：leader 为实际送去 HOJ 的提交，followers 等它的结果（submission_id -> user_id）"""
+    lookup: VerdictLookup
+    leader: int
+    followers: Dict[int, Optional[int]] = field(default_factory=dict)
+
+
+class VerdictCache:
+    """
+    编程题判题结果缓存
+    - 确定性的结果（见 HOJ_DETERMINISTIC_STATUSES）按 (code_id, 测试数据版本, 语言, 归一化源码) 存库，
+      之后的相同提交直接得到结果，不进判题队列
+    - 本进程内正在判的相同源码，新提交挂到同一个判题任务上，结果回写时一并更新
+    - 测试数据更新后版本号递增，旧结果自然失效（判题中的旧版本任务结果也只写到旧版本下）
+    """
+
+    def __init__(self, enabled: bool = VERDICT_CACHE_ENABLED):
+        self.enabled = enabled
+        # cache_key -> InFlight / leader submission_id -> InFlight
+        self._in_flight: Dict[str, InFlight] = {}
+        self._by_leader: Dict[int, InFlight] = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "stored": 0, "invalidations": 0}
+
+    # ---------------- 提交时 ----------------
+    async def lookup(self, items: List[Tuple[int, str]], session: AsyncSession) -> List[VerdictLookup]:
+        """items 为 (code_id, 源码)，按顺序返回；两次 IN 查询（版本号、缓存条目）覆盖整批"""
+        if not self.enabled:
+            return [VerdictLookup(None, code_id) for code_id, _ in items]
+        versions = await AsyncVerdictCacheMapper.find_versions((code_id for code_id, _ in items), session)
+        lookups = [VerdictLookup(cache_key(code_id, versions.get(code_id, 0), code), code_id,
+                                 versions.get(code_id, 0)) for code_id, code in items]
+        statuses = await AsyncVerdictCacheMapper.find_statuses((l.key for l in lookups), session)
+        for lookup in lookups:
+            lookup.status = statuses.get(lookup.key)
+            self._stats["hits" if lookup.status else "misses"] += 1
+        return lookups
+
+    def in_flight(self, lookup: VerdictLookup) -> bool:
+        return lookup.key is not None and lookup.key in self._in_flight
+
+    def join(self, lookup: VerdictLookup, submission_id: int, user_id: Optional[int]) -> bool:
+        """相同源码正在判题时挂到该任务上，返回 True；否则调用方需自行投递并调用 begin"""
+        entry = self._in_flight.get(lookup.key) if lookup.key is not None else None
+        if entry is None:
+            return False
+        entry.followers[submission_id] = user_id
+        self._stats["coalesced"] += 1
+        return True
+
+    def begin(self, lookup: VerdictLookup, submission_id: int):
+        """submission_id 已进入判题队列，之后的相同提交等它的结果"""
+        if lookup.key is None or lookup.key in self._in_flight:
+            return
+        entry = InFlight(lookup, submission_id)
+        self._in_flight[lookup.key] = entry
+        self._by_leader[submission_id] = entry
+
+    # ---------------- 出结果时 ----------------
+    def complete(self, finished: Dict[int, str],
+                 cacheable: Iterable[int] = ()) -> Tuple[List[Tuple[int, Optional[int], str]], List[dict]]:
+        """
+        finished 为判完的提交 submission_id -> 状态，cacheable 为其中结果确定、可以缓存的
+        返回 (挂在这些提交上的 [(submission_id, user_id, 状态)], 待写入的缓存条目)
+        之后的相同提交不再挂到这些任务上；挂上的提交保留到 release，回写失败时重试仍能拿到
+        """
+        cacheable: Set[int] = set(cacheable)
+        followers: List[Tuple[int, Optional[int], str]] = []
+        entries: List[dict] = []
+        for submission_id, status in finished.items():
+            entry = self._by_leader.get(submission_id)
+            if entry is None:
+                continue
+            if self._in_flight.get(entry.lookup.key) is entry:
+                del self._in_flight[entry.lookup.key]
+            followers.extend((i, user_id, status) for i, user_id in entry.followers.items())
+            if submission_id in cacheable:
+                entries.append({"cache_key": entry.lookup.key, "code_id": entry.lookup.code_id,
+                                "testdata_version": entry.lookup.version, "status": status})
+        return followers, entries
+
+    def release(self, submission_ids: Iterable[int], stored: int = 0):
+        """complete 返回的结果已提交到数据库后调用，丢弃这些判题任务"""
+        for submission_id in submission_ids:
+            self._by_leader.pop(submission_id, None)
+        self._stats["stored"] += stored
+
+    def waiting_submission_ids(self) -> Set[int]:
+        """挂在本进程判题任务上、等结果的提交（心跳与恢复用）"""
+        return {i for entry in self._by_leader.values() for i in entry.followers}
+
+    def detach(self, submission_ids: Iterable[int]):
+        """
+        这些提交已交给别处判题（重新投递、被其他 worker 接管）：不再作为 follower 等结果；
+        作为 leader 时整个任务丢弃，其 followers 不再由本进程回写、心跳随之停止，由恢复流程接手
+        """
+        submission_ids = set(submission_ids)
+        for leader_id, entry in list(self._by_leader.items()):
+            if leader_id in submission_ids:
+                if self._in_flight.get(entry.lookup.key) is entry:
+                    del self._in_flight[entry.lookup.key]
+                del self._by_leader[leader_id]
+                continue
+            for submission_id in submission_ids.intersection(entry.followers):
+                del entry.followers[submission_id]
+
+    # ---------------- 测试数据更新 ----------------
+    async def invalidate(self, code_id: int, session: AsyncSession) -> dict:
+        """测试数据版本号加一并清理旧条目；判题中的旧版本任务不再接收新的相同提交"""
+        version = await AsyncVerdictCacheMapper.bump_version(code_id, session)
+        deleted = await AsyncVerdictCacheMapper.delete_before(code_id, version, session)
+        for key, entry in list(self._in_flight.items()):
+            if entry.lookup.code_id == code_id:
+                # 已挂上的提交照常等结果，只是不再按旧 key 合并
+                del self._in_flight[key]
+        self._stats["invalidations"] += 1
+        logger.info("HOJ 题目 %s 测试数据已更新，版本 %d，清理缓存 %d 条", code_id, version, deleted)
+        return {"code_id": code_id, "version": version, "deleted": deleted}
+
+    def stats(self) -> dict:
+        return {**self._stats, "enabled": self.enabled, "in_flight": len(self._in_flight),
+                "waiting": sum(len(e.followers) for e in self._by_leader.values())}
+
+
+verdict_cache = VerdictCache()
+
+
+def get_verdict_cache() -> VerdictCache:
+    return verdict_cache
@@ -0,0 +1,213 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from config import (
+    async_session_maker,
+    JUDGE_POLL_INITIAL, JUDGE_POLL_MAX, JUDGE_POLL_BACKOFF, JUDGE_TIMEOUT, JUDGE_POLL_BATCH,
+)
+from mapper.AsyncSubmissionMapper import AsyncSubmissionMapper
+from mapper.AsyncVerdictCacheMapper import AsyncVerdictCacheMapper
+from service.HojService import HOJ_DETERMINISTIC_STATUSES, HojUnavailable, get_hoj_client, to_submission_status
+from service.ScoreboardService import ScoreboardService
+from service.SubmissionEventBus import get_submission_event_bus
+from service.VerdictCache import get_verdict_cache
+from utils.profiler import profiled
+from utils.scoring import COUNTED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TrackedSubmission:
+    submission_id: int
+    submit_id: int
+    started_at: float
+    interval: float
+    user_id: Optional[int] = None
+
+
+class VerdictPoller:
+    """
+    统一的 HOJ 判题结果轮询器
+    所有在判的提交由一个协程按各自的到期时间批量查询：刚提交时查得勤，
+    久未出结果的按指数退避，超时标记为 error；结果按批回写数据库
+    """
+
+    def __init__(self, initial: float = JUDGE_POLL_INITIAL, max_interval: float = JUDGE_POLL_MAX,
+                 backoff: float = JUDGE_POLL_BACKOFF, timeout: float = JUDGE_TIMEOUT,
+                 batch_size: int = JUDGE_POLL_BATCH):
+        self.initial = initial
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+        # submitId -> TrackedSubmission
+        self._tracked: dict[int, TrackedSubmission] = {}
+        # (下次查询时间, submitId)
+        self._schedule: list[tuple[float, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self._stats = {"polls": 0, "poll_errors": 0, "poll_deferred": 0, "writeback_errors": 0,
+                       "finished": 0, "timed_out": 0}
+
+    # ---------------- 生命周期 ----------------
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止轮询；未出结果的提交保持 pending，重启后由恢复流程重新判题"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ---------------- 跟踪 ----------------
+    def track(self, submission_id: int, submit_id: int, user_id: Optional[int] = None):
+        now = time.monotonic()
+        self._tracked[submit_id] = TrackedSubmission(submission_id, submit_id, now, self.initial, user_id)
+        heapq.heappush(self._schedule, (now + self.initial, submit_id))
+        self._wakeup.set()
+
+    def tracked_submission_ids(self) -> set[int]:
+        return {t.submission_id for t in self._tracked.values()}
+
+    def untrack(self, submission_ids: set[int]):
+        """这些提交已被其他 worker 接管，不再轮询（调度堆里的条目到期时跳过）"""
+        for submit_id, tracked in list(self._tracked.items()):
+            if tracked.submission_id in submission_ids:
+                del self._tracked[submit_id]
+
+    async def _run(self):
+        while True:
+            delay = self._schedule[0][0] - time.monotonic() if self._schedule else None
+            if delay is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._poll_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("判题结果轮询失败")
+
+    def _pop_due(self) -> list[TrackedSubmission]:
+        now = time.monotonic()
+        due = []
+        while self._schedule and self._schedule[0][0] <= now and len(due) < self.batch_size:
+            _, submit_id = heapq.heappop(self._schedule)
+            tracked = self._tracked.get(submit_id)
+            if tracked is not None:
+                due.append(tracked)
+        return due
+
+    async def _poll_due(self):
+        due = self._pop_due()
+        if not due:
+            return
+        self._stats["polls"] += 1
+        try:
+            statuses = await get_hoj_client().get_results([t.submit_id for t in due])
+        except HojUnavailable as e:
+            # HOJ 不可用期间不做超时判定，熔断结束后再查
+            self._stats["poll_deferred"] += 1
+            now = time.monotonic()
+            retry_at = now + e.retry_after
+            for tracked in due:
+                heapq.heappush(self._schedule, (max(retry_at, now + tracked.interval), tracked.submit_id))
+            return
+        except Exception:
+            self._stats["poll_errors"] += 1
+            logger.warning("查询 HOJ 判题状态失败，稍后重试", exc_info=True)
+            statuses = {}
+
+        now = time.monotonic()
+        done: list[TrackedSubmission] = []
+        finished: dict[int, str] = {}
+        owners: dict[int, Optional[int]] = {}
+        cacheable: set[int] = set()
+        timed_out = 0
+        for tracked in due:
+            status = None
+            hoj_status = statuses.get(tracked.submit_id)
+            if hoj_status is not None:
+                status = to_submission_status(hoj_status)
+                if hoj_status in HOJ_DETERMINISTIC_STATUSES:
+                    cacheable.add(tracked.submission_id)
+            if status is None and now - tracked.started_at > self.timeout:
+                status = "error"
+                timed_out += 1
+            if status is None:
+                self._reschedule(tracked, now)
+                continue
+            done.append(tracked)
+            finished[tracked.submission_id] = status
+            owners[tracked.submission_id] = tracked.user_id
+        if not done:
+            return
+
+        # 合并到这些判题任务上的相同提交一起回写
+        verdict_cache = get_verdict_cache()
+        followers, entries = verdict_cache.complete(finished, cacheable)
+        for submission_id, user_id, status in followers:
+            finished[submission_id] = status
+            owners[submission_id] = user_id
+        try:
+            with profiled("job:verdict_writeback"):
+                async with async_session_maker() as session:
+                    pairs = await ScoreboardService.lock_submissions(
+                        [i for i, status in finished.items() if status in COUNTED_STATUSES], session)
+                    await AsyncSubmissionMapper.update_status_bulk(finished, session)
+                    changes = await ScoreboardService.record_pairs(pairs, session)
+                    await AsyncVerdictCacheMapper.insert_many(entries, session)
+                    await session.commit()
+        except Exception:
+            # 提交前不丢弃跟踪记录与合并的相同提交，退避后重新查询、回写
+            self._stats["writeback_errors"] += 1
+            logger.warning("判题结果回写失败，稍后重试：%d 个提交", len(finished), exc_info=True)
+            for tracked in done:
+                self._reschedule(tracked, now)
+            return
+
+        verdict_cache.release([t.submission_id for t in done], len(entries))
+        for tracked in done:
+            self._tracked.pop(tracked.submit_id, None)
+            self._latencies.append(now - tracked.started_at)
+        ScoreboardService.publish(changes)
+        self._stats["finished"] += len(finished)
+        self._stats["timed_out"] += timed_out
+        # 判题结果不是用户请求写入的，没有响应可携带 read-your-writes 标记；客户端经事件流拿到最终结果
+        bus = get_submission_event_bus()
+        for submission_id, status in finished.items():
+            bus.publish(owners[submission_id], submission_id, status)
+
+    def _reschedule(self, tracked: TrackedSubmission, now: float):
+        tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+        heapq.heappush(self._schedule, (now + tracked.interval, tracked.submit_id))
+
+    # ---------------- 监控 ----------------
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            **self._stats,
+            "tracked": len(self._tracked),
+            "verdict_latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "verdict_latency_max": round(latencies[-1], 3) if latencies else None,
+        }
+
+
+verdict_poller = VerdictPoller()
+
+
+def get_verdict_poller() -> VerdictPoller:
+    return verdict_poller
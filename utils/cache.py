@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class _LoadAbandoned(Exception):
+    """加载方在加载完成前被取消，等待者需重新加载"""
+
+
+class ReadThroughCache(Generic[K, V]):
+    """
+    进程内读穿透缓存
+    - LRU 淘汰，条目数不超过 max_size
+    - 每个条目 ttl 秒后过期
+    - 同一个 key 并发未命中时只加载一次，其余请求等待同一结果（同步线程、协程各自合并）
+    - 加载结果为 None 时不缓存
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, ttl: float = 300):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[K, tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[K, Future] = {}
+        self._aloading: Dict[K, asyncio.Future] = {}
+        # 每次失效递增；加载期间发生过失效的结果不写入缓存，避免回填旧值
+        self._version = 0
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "coalesced": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def version(self) -> int:
+        """当前失效版本号，批量加载前读取，回填时传给 put"""
+        return self._version
+
+    # ---------------- 基本操作 ----------------
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key: K, value: V, version: Optional[int] = None):
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: K):
+        with self._lock:
+            self._data.pop(key, None)
+            self._version += 1
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._version += 1
+            self._stats["invalidations"] += 1
+
+    # ---------------- 读穿透 ----------------
+    def get_or_load(self, key: K, loader: Callable[[], Optional[V]]) -> Optional[V]:
+        """同步版本，供线程池中的 sync 路由使用"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            future = self._loading.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._loading[key] = future
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+        version = self._version
+        try:
+            value = loader()
+            self._stats["loads"] += 1
+            if value is not None:
+                self.put(key, value, version)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    async def aget_or_load(self, key: K, loader: Callable[[], Awaitable[Optional[V]]]) -> Optional[V]:
+        """
+        异步版本，供 async 路由使用
+        loader 通常用的是发起请求的 session，不能在该请求被取消后继续执行；
+        加载方被取消（客户端断开）时等待者不跟着失败，而是重新发起加载（其中一个用自己的 loader）
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            future = self._aloading.get(key)
+            if future is None:
+                break
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(future)
+            except _LoadAbandoned:
+                continue
+        future = asyncio.get_running_loop().create_future()
+        self._aloading[key] = future
+        version = self._version
+        try:
+            value = await loader()
+            self._stats["loads"] += 1
+            if value is not None:
+                self.put(key, value, version)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_exception(_LoadAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._aloading.pop(key, None)
+
+    # ---------------- 监控 ----------------
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "name": self.name,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+        }
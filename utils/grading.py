@@ -0,0 +1,121 @@
+import re
+from fractions import Fraction
+from functools import lru_cache
+from typing import Callable, FrozenSet, List, Optional, Tuple
+
+from config import PROBLEM_CACHE_SIZE
+from utils.search import normalize
+
+# 判分函数：学生答案 -> 是否正确
+Matcher = Callable[[str], bool]
+
+# 多选题答案分隔符：逗号、顿号、分号、空白
+_CHOICE_SEP = re.compile(r"[\s,，、;；/]+")
+# 单个选项标号，如 A / b
+_LABEL = re.compile(r"[a-z]")
+# 填空题多个可接受答案用 | 分隔
+_ALTERNATIVE_SEP = "|"
+# 数值答案：3.14、-2、1/3，可选 ±误差（也可写作 +-）
+_NUMBER = re.compile(r"^\s*([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:/\d+)?)\s*(?:(?:±|\+-)\s*(\d+(?:\.\d*)?|\.\d+))?\s*$")
+_REGEX_PREFIX = "re:"
+# 未写误差的数值题默认允许的浮点误差
+_DEFAULT_TOLERANCE = Fraction(1, 10 ** 9)
+
+
+def _normalize_text(text: str) -> str:
+    """全角转半角、小写、合并空白，去掉首尾的句号等标点"""
+    return " ".join(normalize(text).split()).strip("。.")
+
+
+def _parse_number(text: str) -> Optional[Fraction]:
+    match = _NUMBER.match(normalize(text))
+    if not match or match.group(2) is not None:
+        return None
+    try:
+        return Fraction(match.group(1))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+# ---------------- 选择题 ----------------
+def _choice_labels(options: Tuple[str, ...]) -> dict:
+    """选项文本 -> 标号，学生直接填写选项内容时也能判对"""
+    return {_normalize_text(text): chr(ord("a") + i) for i, text in enumerate(options)}
+
+
+def _parse_choice(text: str, by_text: dict) -> FrozenSet[str]:
+    """解析为选项标号集合，无法识别时返回空集"""
+    whole = _normalize_text(text)
+    if whole in by_text:
+        return frozenset(by_text[whole])
+    parts = [p for p in _CHOICE_SEP.split(whole) if p]
+    # "AC" 这类连写的标号
+    if len(parts) == 1 and parts[0].isascii() and parts[0].isalpha():
+        parts = list(parts[0])
+    labels = set()
+    for part in parts:
+        part = by_text.get(_normalize_text(part), part)
+        if not _LABEL.fullmatch(part):
+            return frozenset()
+        labels.add(part)
+    return frozenset(labels)
+
+
+def _compile_choice(answer: str, options: Tuple[str, ...]) -> Matcher:
+    by_text = _choice_labels(options)
+    expected = _parse_choice(answer, by_text)
+    if not expected:
+        return lambda _: False
+    return lambda data: _parse_choice(data, by_text) == expected
+
+
+# ---------------- 填空题 ----------------
+def _compile_alternative(alternative: str) -> Matcher:
+    alternative = alternative.strip()
+    if alternative.lower().startswith(_REGEX_PREFIX):
+        try:
+            pattern = re.compile(alternative[len(_REGEX_PREFIX):].strip(), re.IGNORECASE)
+            return lambda data: pattern.fullmatch(normalize(data).strip()) is not None
+        except re.error:
+            # 写错的正则按普通文本比较
+            pass
+    match = _NUMBER.match(normalize(alternative))
+    expected = _parse_number(match.group(1)) if match else None
+    if expected is not None:
+        tolerance = Fraction(match.group(2)) if match.group(2) else _DEFAULT_TOLERANCE
+
+        def numeric(data: str) -> bool:
+            value = _parse_number(data)
+            return value is not None and abs(value - expected) <= tolerance
+        return numeric
+    expected_text = _normalize_text(alternative)
+    return lambda data: _normalize_text(data) == expected_text
+
+
+def _compile_fill(answer: str) -> Matcher:
+    if answer.lower().startswith(_REGEX_PREFIX):
+        # 正则里可能本身含有 |，整体作为一个答案
+        alternatives = [_compile_alternative(answer)]
+    else:
+        alternatives = [_compile_alternative(a) for a in answer.split(_ALTERNATIVE_SEP) if a.strip()]
+    return lambda data: any(match(data) for match in alternatives)
+
+
+@lru_cache(maxsize=PROBLEM_CACHE_SIZE)
+def compile_matcher(problem_type: str, answer: Optional[str], options: Tuple[str, ...] = ()) -> Matcher:
+    """
+    把题目的标准答案编译成判分函数，按 (类型, 答案, 选项) 缓存，题目修改后自然重新编译
+    - 选择题：按选项集合比较，"A,C" / "C A" / "ac" / 选项原文 均等价
+    - 填空题：多个可接受答案用 | 分隔；数值答案支持 ±误差；re: 开头为正则（整串匹配，忽略大小写）；
+      其余按规范化文本比较（全角半角、大小写、多余空白不敏感）
+    """
+    if not answer or not answer.strip():
+        return lambda _: False
+    if problem_type == "choice":
+        return _compile_choice(answer, options)
+    return _compile_fill(answer)
+
+
+def grade(problem_type: str, answer: Optional[str], options: Optional[List[str]], data: str) -> bool:
+    """客观题判分，纯内存计算"""
+    return compile_matcher(problem_type, answer, tuple(options or ()))(data or "")
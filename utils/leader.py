@@ -0,0 +1,60 @@
+"""
+多 worker 部署时的单例任务选主
+同一台机器上的 worker 竞争同一个文件锁（fcntl.flock），拿到锁的进程为 leader；
+锁随进程退出由操作系统释放，其余 worker 定期重试，leader 崩溃后由其中一个接替
+不支持 flock 的平台（Windows）上每个进程都视为 leader，只适合单进程开发环境
+"""
+import logging
+import os
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+
+    def __init__(self, path: str, run_id: str = ""):
+        self.path = path
+        # 同一次启动的所有 worker 相同；用来判断锁是不是从本次启动的前任 leader 手上接过来的
+        self.run_id = run_id
+        self._fd: Optional[int] = None
+        self.took_over = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """非阻塞地尝试成为 leader，已经是 leader 时直接返回 True"""
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        previous = os.read(fd, 256).decode(errors="replace").split()
+        self.took_over = bool(self.run_id) and previous[1:2] == [self.run_id]
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, f"{os.getpid()} {self.run_id}".encode())
+        self._fd = fd
+        logger.info("进程 %d 成为 leader，负责单例后台任务", os.getpid())
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
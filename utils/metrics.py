@@ -0,0 +1,289 @@
+"""
+进程内指标，按 Prometheus 文本格式导出（/metrics），不依赖 prometheus_client
+热路径上只做一次加锁的计数 / 分桶累加；多 worker 部署时每个进程各自导出，由 Prometheus 按实例聚合
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# 延迟分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶计数（非累计，最后一个为 +Inf）, 总和]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v[0]), v[1]) for k, v in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge(Metric):
+    """抓取时才调用 collect 取值，热路径上没有任何开销"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        try:
+            samples = list(self.collect()) if self.collect else []
+        except Exception:  # 取值失败不影响其他指标
+            samples = []
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}"
+                                for k, v in samples if v is not None]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---------------- HTTP ----------------
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP 请求数", ("method", "route", "status")))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时", ("method", "route")))
+
+# ---------------- 数据库 ----------------
+db_queries = registry.register(Counter(
+    "db_queries_total", "SQL 语句数", ("engine",)))
+db_query_errors = registry.register(Counter(
+    "db_query_errors_total", "执行失败的 SQL 语句数", ("engine",)))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "单条 SQL 耗时", ("engine",), DB_BUCKETS))
+db_request_queries = registry.register(Histogram(
+    "db_queries_per_request", "每个 HTTP 请求执行的 SQL 语句数", ("route",), COUNT_BUCKETS))
+db_request_duration = registry.register(Histogram(
+    "db_time_per_request_seconds", "每个 HTTP 请求在 SQL 上花费的时间", ("route",)))
+db_checkout_duration = registry.register(Histogram(
+    "db_pool_checkout_seconds", "从连接池获取连接的等待时间（含新建连接）", ("engine",), DB_BUCKETS))
+
+# ---------------- HOJ ----------------
+hoj_requests = registry.register(Counter(
+    "hoj_requests_total", "HOJ 接口请求数", ("endpoint", "status")))
+hoj_duration = registry.register(Histogram(
+    "hoj_request_duration_seconds", "HOJ 接口耗时（含 token 失效后的重试）", ("endpoint",)))
+
+
+# ---------------- 请求级 SQL 统计 ----------------
+class RequestQueries:
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# 当前请求的 SQL 统计；同步路由在线程池中执行时 contextvars 会被复制过去，指向同一个对象
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+
+
+def route_label(scope: dict) -> str:
+    """
+    路由模板（/problems/{problem_id}），未匹配到路由的请求合并为一个标签，避免标签基数失控
+    include_router 的前缀不一定体现在 route.path 上，这里用实际路径把路径参数换回占位符
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    path = scope["path"]
+    params = scope.get("path_params")
+    if not params:
+        return path
+    values = {str(v): k for k, v in params.items()}
+    return "/".join("{" + values[s] + "}" if s in values else s for s in path.split("/"))
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：记录每个请求的耗时、状态码和 SQL 统计"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        queries = RequestQueries()
+        token = current_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_queries.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            http_requests.inc(method, route, str(status[0]))
+            http_duration.observe(elapsed, method, route)
+            db_request_queries.observe(queries.count, route)
+            db_request_duration.observe(queries.duration, route)
+
+
+# ---------------- SQLAlchemy 事件 ----------------
+def instrument_engine(engine, name: str):
+    """
+    挂到同步引擎上（异步引擎传 async_engine.sync_engine）
+    语句耗时记在连接的 info 上；连接池等待通过包装 raw_connection 计时
+    """
+    from sqlalchemy import event
+
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    engine._metrics_instrumented = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _finish_query(conn, name)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        db_query_errors.inc(name)
+        if context.connection is not None:
+            _finish_query(context.connection, name)
+
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            db_checkout_duration.observe(time.perf_counter() - start, name)
+
+    engine.raw_connection = timed_raw_connection
+
+
+def _finish_query(conn, name: str):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    db_queries.inc(name)
+    db_query_duration.observe(elapsed, name)
+    queries = current_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.duration += elapsed
+
+
+def pool_gauge(engines: Dict[str, object]) -> Gauge:
+    """连接池使用情况：已检出、空闲、溢出与池大小（SQLite 等不支持的池跳过）"""
+
+    def collect():
+        for name, engine in engines.items():
+            pool = engine.pool
+            for state in ("checkedout", "checkedin", "overflow", "size"):
+                method = getattr(pool, state, None)
+                if method is not None:
+                    # QueuePool.overflow() 在连接数未达到 pool_size 时为负数
+                    yield (name, state), max(0, method())
+
+    return Gauge("db_pool_connections", "数据库连接池状态", ("engine", "state"), collect)
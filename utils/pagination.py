@@ -0,0 +1,45 @@
+import base64
+import json
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+T = TypeVar("T")
+
+
+def encode_cursor(last_id: int) -> str:
+    """把上一页最后一条记录的主键编码为不透明的游标"""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """解析游标，格式不合法时抛出 ValueError"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return int(json.loads(raw)["id"])
+    except Exception as e:
+        raise ValueError("无效的分页游标") from e
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    """路由层使用：游标不合法时返回 400"""
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def split_page(rows: Sequence[T], page_size: int,
+               key: Callable[[T], int] = lambda r: r.id) -> Tuple[List[T], Optional[str]]:
+    """
+    mapper 多查一条（limit = page_size + 1）用来判断是否还有下一页，
+    这里截断到 page_size 并生成 next_cursor；没有下一页时返回 None
+    """
+    rows = list(rows)
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(key(rows[-1]))
@@ -0,0 +1,246 @@
+"""
+请求级 SQL 分析：把每条语句归到当前 HTTP 请求（或后台任务）上，
+请求结束时检查语句数 / SQL 耗时是否超出预算、是否有同一语句形状反复执行（N+1），
+超过 SLOW_QUERY_SECONDS 的语句按采样率记录；调用来源（service / mapper 方法）只在需要报告时才回溯栈
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from config import (
+    QUERY_BUDGET_COUNT, QUERY_BUDGET_SECONDS, N_PLUS_ONE_THRESHOLD,
+    SLOW_QUERY_SECONDS, SLOW_QUERY_SAMPLE_RATE, QUERY_PROFILER_MAX_SHAPES, QUERY_PROFILER_LOG_INTERVAL,
+)
+from utils.metrics import Counter, registry, route_label
+
+try:
+    import greenlet
+except ImportError:  # 只有异步引擎需要 greenlet
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+query_flags = registry.register(Counter(
+    "db_query_flags_total", "超出 SQL 预算、疑似 N+1 的请求数与慢查询数", ("route", "reason")))
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_ORIGIN_DIRS = ("service" + os.sep, "mapper" + os.sep, "Controller" + os.sep)
+# IN (?, ?, ?) / VALUES (...), (...) 的长度不同也算同一形状
+_PLACEHOLDER_LIST = re.compile(r"(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))+")
+_VALUES_LIST = re.compile(r"(\([^()]*\))(\s*,\s*\([^()]*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    shape = _WHITESPACE.sub(" ", statement.strip())
+    shape = _PLACEHOLDER_LIST.sub(r"\1, ...", shape)
+    return _VALUES_LIST.sub(r"\1, ...", shape)
+
+
+def caller_origin() -> str:
+    """
+    最近的 service / mapper / Controller 调用方，如 SubmissionService.submit_answer -> AsyncSubmissionMapper.insert
+    异步引擎在 greenlet 中执行语句，本 greenlet 的栈走完后接着看父 greenlet（发起 await 的协程）
+    """
+    found: List[str] = []
+    frame = sys._getframe(1)
+    current = greenlet.getcurrent() if greenlet is not None else None
+    while len(found) < 2:
+        if frame is None:
+            current = current.parent if current is not None else None
+            if current is None:
+                break
+            frame = current.gr_frame
+            continue
+        filename = frame.f_code.co_filename
+        if filename.startswith(_ROOT) and filename[len(_ROOT):].startswith(_ORIGIN_DIRS):
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            if name not in found:
+                found.append(name)
+        frame = frame.f_back
+    return " -> ".join(reversed(found)) or "unknown"
+
+
+class ShapeStats:
+    __slots__ = ("count", "duration", "origin")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.origin: Optional[str] = None
+
+
+class QueryProfile:
+    """一个请求 / 后台任务内执行的语句，按形状汇总；形状数有上限，超出后只计总数"""
+
+    def __init__(self, name: str = "", scope: Optional[dict] = None):
+        self._name = name
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Dict[str, ShapeStats] = {}
+        self.slow = 0
+
+    @property
+    def name(self) -> str:
+        """HTTP 请求用路由模板命名；语句执行时路由已匹配完成"""
+        if self._name or self.scope is None:
+            return self._name
+        return f"{self.scope['method']} {route_label(self.scope)}"
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        shape = statement_shape(statement)
+        stats = self.shapes.get(shape)
+        if stats is None:
+            if len(self.shapes) >= QUERY_PROFILER_MAX_SHAPES:
+                return
+            stats = self.shapes[shape] = ShapeStats()
+        stats.count += 1
+        stats.duration += elapsed
+        # 达到 N+1 阈值时记下一次调用来源，之后不再回溯
+        if stats.count == N_PLUS_ONE_THRESHOLD:
+            stats.origin = caller_origin()
+
+    def flags(self) -> List[str]:
+        reasons = []
+        if self.count > QUERY_BUDGET_COUNT:
+            reasons.append("query_count")
+        if self.duration > QUERY_BUDGET_SECONDS:
+            reasons.append("query_time")
+        if any(v.count >= N_PLUS_ONE_THRESHOLD for v in self.shapes.values()):
+            reasons.append("n_plus_one")
+        return reasons
+
+    def report(self, reasons: List[str], elapsed: Optional[float] = None) -> dict:
+        top = sorted(self.shapes.items(), key=lambda kv: (kv[1].count, kv[1].duration), reverse=True)[:5]
+        return {
+            "name": self.name,
+            "reasons": reasons,
+            "queries": self.count,
+            "db_ms": round(self.duration * 1000, 2),
+            "total_ms": round(elapsed * 1000, 2) if elapsed is not None else None,
+            "top": [{"statement": shape[:300], "count": v.count, "db_ms": round(v.duration * 1000, 2),
+                     "origin": v.origin} for shape, v in top],
+            "at": time.time(),
+        }
+
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+# 最近的报告，供 /monitor/queries 查看
+recent_flagged: deque = deque(maxlen=100)
+recent_slow: deque = deque(maxlen=100)
+_last_logged: Dict[tuple, float] = {}
+
+
+def _finish(profile: QueryProfile, elapsed: float):
+    reasons = profile.flags()
+    if not reasons:
+        return
+    for reason in reasons:
+        query_flags.inc(profile.name, reason)
+    report = profile.report(reasons, elapsed)
+    recent_flagged.append(report)
+    # 同一路由同一类告警每 QUERY_PROFILER_LOG_INTERVAL 秒最多写一次日志，详情可在 /monitor/queries 查看
+    key = (report["name"], tuple(reasons))
+    now = time.monotonic()
+    if now - _last_logged.get(key, float("-inf")) < QUERY_PROFILER_LOG_INTERVAL:
+        return
+    _last_logged[key] = now
+    logger.warning("SQL 预算告警 %s：%s，%d 条语句，SQL 耗时 %.1f ms，最多的语句：%s", profile.name, ",".join(reasons),
+                   profile.count, profile.duration * 1000,
+                   "; ".join(f"{t['count']}x {t['statement'][:120]} [{t['origin'] or '-'}]" for t in report["top"][:3]))
+
+
+@contextmanager
+def profiled(name: str):
+    """后台任务（判题轮询、恢复等）使用：块内执行的语句单独归到 name 上"""
+    profile = QueryProfile(name)
+    token = current_profile.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+        _finish(profile, time.perf_counter() - start)
+
+
+class QueryProfilerMiddleware:
+    """纯 ASGI 中间件：为每个 HTTP 请求建立一个 QueryProfile"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile(scope=scope)
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_profile.reset(token)
+            _finish(profile, time.perf_counter() - start)
+
+
+def instrument_engine(engine, name: str):
+    """挂到同步引擎上（异步引擎传 async_engine.sync_engine）"""
+    from sqlalchemy import event
+
+    if getattr(engine, "_profiler_instrumented", False):
+        return
+    engine._profiler_instrumented = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("profile_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed)
+        if elapsed >= SLOW_QUERY_SECONDS:
+            _slow_query(profile, name, statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None:
+            starts = context.connection.info.get("profile_start")
+            if starts:
+                starts.pop()
+
+
+def _slow_query(profile: Optional[QueryProfile], engine_name: str, statement: str, elapsed: float):
+    if profile is not None:
+        profile.slow += 1
+    if random.random() >= SLOW_QUERY_SAMPLE_RATE:
+        return
+    source = profile.name if profile is not None else "-"
+    origin = caller_origin()
+    query_flags.inc(source, "slow_query")
+    recent_slow.append({"engine": engine_name, "source": source, "origin": origin,
+                        "ms": round(elapsed * 1000, 2), "statement": statement_shape(statement)[:500],
+                        "at": time.time()})
+    logger.warning("慢查询 %.1f ms [%s] %s：%s", elapsed * 1000, source, origin, statement_shape(statement)[:300])
+
+
+def snapshot() -> dict:
+    return {"flagged": list(recent_flagged), "slow": list(recent_slow)}
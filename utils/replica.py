@@ -0,0 +1,303 @@
+"""
+只读副本路由
+- mapper 中的只读查询（@read_only）由 RoutingSession 按轮询分到健康且延迟未超限的副本，其余语句都走主库
+- 本 session 已经写过（flush）之后的查询、flush 本身一律走主库
+- 用户自己提交 / 修改后 sticky_seconds 内，其读请求走主库（read-your-writes）；截止时间签名后放在
+  响应的 cookie / X-Replica-Pin 头里由客户端带回，多 worker、多实例部署时任一进程都能识别
+- 副本查询失败时标记为不可用并回滚本次只读操作，改到主库重试；定期健康检查测延迟并恢复副本
+"""
+import functools
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+# 当前是否在只读 mapper 方法内 / 是否强制走主库 / 本次只读调用用到的副本
+_read_only: ContextVar[bool] = ContextVar("replica_read_only", default=False)
+_force_primary: ContextVar[bool] = ContextVar("replica_force_primary", default=False)
+_routed: ContextVar[Optional[List["Replica"]]] = ContextVar("replica_routed", default=None)
+# 当前请求带来的 / 本次请求新发出的 read-your-writes 标记，由 ReplicaPinMiddleware 设置
+_pin: ContextVar[Optional["_PinState"]] = ContextVar("replica_pin", default=None)
+
+PIN_COOKIE = "replica_pin"
+PIN_HEADER = "x-replica-pin"
+
+
+class Replica:
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag: Optional[float] = None  # 秒；无法获取（非 MySQL / 无权限）时为 None
+        self.error: Optional[str] = None
+        self.routed = 0
+        self.failures = 0
+
+    def snapshot(self) -> dict:
+        return {"name": self.name, "healthy": self.healthy, "lag": self.lag, "error": self.error,
+                "routed": self.routed, "failures": self.failures}
+
+
+class ReplicaRouter:
+
+    def __init__(self, engines: Dict[str, object], max_lag: float, sticky_seconds: float, secret: str = ""):
+        self.replicas = [Replica(name, engine) for name, engine in engines.items()]
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self._secret = secret.encode()
+        self._next = 0
+        self._lock = threading.Lock()
+        self.primary_fallbacks = 0
+        self.pins_issued = 0
+        self.pinned_reads = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    # ---------------- 选择副本 ----------------
+    def available(self, replica: Replica) -> bool:
+        return replica.healthy and (replica.lag is None or replica.lag <= self.max_lag)
+
+    def choose(self) -> Optional[Replica]:
+        """轮询下一个可用副本，全部不可用时返回 None（走主库）"""
+        with self._lock:
+            count = len(self.replicas)
+            for i in range(count):
+                replica = self.replicas[(self._next + i) % count]
+                if self.available(replica):
+                    self._next = (self._next + i + 1) % count
+                    replica.routed += 1
+                    return replica
+            self.primary_fallbacks += 1
+            return None
+
+    def mark_down(self, replica: Replica, error: Exception):
+        replica.healthy = False
+        replica.failures += 1
+        detail = str(getattr(error, "orig", None) or error).splitlines()
+        replica.error = f"{type(error).__name__}: {detail[0] if detail else ''}"[:200]
+        logger.warning("只读副本 %s 查询失败，暂停使用：%s", replica.name, replica.error)
+
+    # ---------------- 健康检查 ----------------
+    def check(self):
+        """连通性与复制延迟检查（同步，后台线程中调用）"""
+        for replica in self.replicas:
+            try:
+                lag = self._measure_lag(replica.engine)
+            except Exception as e:
+                if replica.healthy:
+                    self.mark_down(replica, e)
+                continue
+            if not replica.healthy:
+                logger.info("只读副本 %s 已恢复", replica.name)
+            replica.healthy = True
+            replica.error = None
+            replica.lag = lag
+
+    @staticmethod
+    def _measure_lag(engine) -> Optional[float]:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+            if engine.dialect.name not in ("mysql", "mariadb"):
+                return None
+            for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                                      ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+                try:
+                    row = conn.exec_driver_sql(statement).mappings().first()
+                except DBAPIError:
+                    conn.rollback()
+                    continue
+                if row is None:
+                    return None
+                lag = row.get(column)
+                if lag is None:
+                    # 复制线程已停止，数据不再更新
+                    raise RuntimeError("replication is not running")
+                return float(lag)
+            return None
+
+    # ---------------- read-your-writes ----------------
+    def pin_user(self, user_id: Optional[int]):
+        """
+        用户写入后调用：sticky_seconds 内该用户的读请求走主库
+        标记随本次响应发给客户端；不在请求内（后台判题回写）时没有可以携带标记的响应，不做处理
+        """
+        state = _pin.get()
+        if not self.replicas or user_id is None or state is None:
+            return
+        state.issued = (user_id, time.time() + self.sticky_seconds)
+        self.pins_issued += 1
+
+    def is_pinned(self, user_id: Optional[int]) -> bool:
+        state = _pin.get()
+        if state is None or user_id is None:
+            return False
+        now = time.time()
+        return any(pin is not None and pin[0] == user_id and pin[1] > now for pin in (state.issued, state.received))
+
+    @contextmanager
+    def sticky(self, user_id: Optional[int]):
+        """块内的只读查询在用户刚写过时走主库"""
+        if not self.is_pinned(user_id):
+            yield
+            return
+        self.pinned_reads += 1
+        with primary():
+            yield
+
+    def sign_pin(self, pin: Tuple[int, float]) -> str:
+        payload = f"{pin[0]}.{int(pin[1] * 1000)}"
+        return f"{payload}.{self._signature(payload)}"
+
+    def verify_pin(self, value: str) -> Optional[Tuple[int, float]]:
+        """签名不符或格式错误时返回 None；过期与否由 is_pinned 判断"""
+        payload, _, signature = value.rpartition(".")
+        if not hmac.compare_digest(signature, self._signature(payload)):
+            return None
+        user_id, _, until = payload.partition(".")
+        try:
+            return int(user_id), int(until) / 1000
+        except ValueError:
+            return None
+
+    def _signature(self, payload: str) -> str:
+        return hmac.new(self._secret, payload.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def snapshot(self) -> dict:
+        return {
+            "replicas": [r.snapshot() for r in self.replicas],
+            "max_lag": self.max_lag,
+            "primary_fallbacks": self.primary_fallbacks,
+            "sticky_seconds": self.sticky_seconds,
+            "pins_issued": self.pins_issued,
+            "pinned_reads": self.pinned_reads,
+        }
+
+
+class _PinState:
+
+    def __init__(self, received: Optional[Tuple[int, float]]):
+        self.received = received
+        self.issued: Optional[Tuple[int, float]] = None
+
+
+class ReplicaPinMiddleware:
+    """
+    纯 ASGI 中间件：从请求的 cookie / X-Replica-Pin 头读出 read-your-writes 标记，
+    请求内有写入时把新标记写进响应的 Set-Cookie 和 X-Replica-Pin 头（不支持 cookie 的客户端原样带回该头即可）
+    """
+
+    def __init__(self, app, router: ReplicaRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        state = _PinState(self._received(scope))
+        token = _pin.set(state)
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and state.issued is not None:
+                value = self.router.sign_pin(state.issued)
+                cookie = (f"{PIN_COOKIE}={value}; Max-Age={int(self.router.sticky_seconds) + 1}; "
+                          f"Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = [*message.get("headers", []),
+                                      (b"set-cookie", cookie.encode()), (PIN_HEADER.encode(), value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            _pin.reset(token)
+
+    def _received(self, scope) -> Optional[Tuple[int, float]]:
+        value = None
+        for name, raw in scope.get("headers", []):
+            if name == PIN_HEADER.encode():
+                value = raw.decode("latin-1")
+                break
+            if name == b"cookie":
+                for part in raw.decode("latin-1").split(";"):
+                    key, _, cookie_value = part.strip().partition("=")
+                    if key == PIN_COOKIE:
+                        value = cookie_value
+        return self.router.verify_pin(value) if value else None
+
+
+class RoutingSession(Session):
+    """sessionmaker(info={"replica_router": router}) 时生效；没有副本时直接用普通 Session"""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router: Optional[ReplicaRouter] = self.info.get("replica_router")
+        if (router and _read_only.get() and not _force_primary.get() and not self._flushing
+                and not self.info.get("wrote") and getattr(clause, "is_select", False)):
+            replica = router.choose()
+            if replica is not None:
+                routed = _routed.get()
+                if routed is not None:
+                    routed.append(replica)
+                return replica.engine
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def mark_written(session, flush_context):
+    """session 写过之后的读都走主库"""
+    session.info["wrote"] = True
+
+
+@contextmanager
+def primary():
+    """块内的查询强制走主库"""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def read_only(fn):
+    """
+    标记 mapper 的只读方法，参数中须有 Session
+    副本出错时回滚（只读，且 session 未写过，回滚不会丢数据）后在主库重试一次
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _read_only.get():
+            return fn(*args, **kwargs)
+        routed: List[Replica] = []
+        tokens = (_read_only.set(True), _routed.set(routed))
+        try:
+            return fn(*args, **kwargs)
+        except DBAPIError as e:
+            if not routed:
+                raise
+            session = _session_of(args, kwargs)
+            for replica in set(routed):
+                session.info["replica_router"].mark_down(replica, e)
+            session.rollback()
+        finally:
+            _routed.reset(tokens[1])
+            _read_only.reset(tokens[0])
+        with primary():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def _session_of(args, kwargs) -> Session:
+    return next(a for a in (*args, *kwargs.values()) if isinstance(a, Session))
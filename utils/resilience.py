@@ -0,0 +1,160 @@
+"""
+调用外部服务（HOJ）时的过载保护
+- AdaptiveLimiter：AIMD 自适应并发上限，延迟正常时每轮加一，超时 / 限流 / 5xx 或延迟明显高于基线时按比例收缩
+- CircuitBreaker：连续失败达到阈值后熔断，冷却期内直接拒绝，冷却结束放一个探测请求，成功后恢复
+- backoff_delay：带全抖动的指数退避
+均只在单个事件循环内使用，不加锁
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """第 attempt 次重试（从 0 开始）前的等待时间：[0, min(cap, base * 2^attempt)) 内均匀抽样"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveLimiter:
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 backoff: float = 0.7, latency_tolerance: float = 3.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # 最近成功请求的耗时，取低分位作为无负载时的基线
+        self._samples: Deque[float] = deque(maxlen=200)
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._stats = {"acquired": 0, "waited": 0, "wait_timeouts": 0, "increases": 0, "decreases": 0}
+
+    async def acquire(self, timeout: float) -> bool:
+        """取得一个并发名额，timeout 秒内取不到返回 False"""
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self._stats["acquired"] += 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats["waited"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # 名额已转交过来，退还
+                self.in_flight -= 1
+                self._wake()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._stats["wait_timeouts"] += 1
+            return False
+        self._stats["acquired"] += 1
+        return True
+
+    def release(self, elapsed: float, overloaded: bool):
+        """归还名额并按本次结果调整上限；overloaded 为超时 / 限流 / 5xx 等过载信号"""
+        saturated = self.in_flight >= int(self.limit)
+        self.in_flight -= 1
+        if not overloaded:
+            self._samples.append(elapsed)
+            if len(self._samples) % 20 == 0 or self._baseline is None:
+                ordered = sorted(self._samples)
+                self._baseline = ordered[len(ordered) // 10]
+        slow = not overloaded and self._baseline is not None and elapsed > self._baseline * self.latency_tolerance
+        now = time.monotonic()
+        if overloaded or slow:
+            # 同一批在途请求的失败只收缩一次
+            if now - self._last_decrease >= max(elapsed, 1.0):
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                self._stats["decreases"] += 1
+        elif saturated and self.limit < self.max_limit:
+            # 名额用满时才放宽，空闲时上限不会无限增长；约每轮（limit 个请求）加一
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._stats["increases"] += 1
+        self._wake()
+
+    def cancel(self):
+        """归还未使用的名额，不调整上限"""
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {**self._stats, "limit": round(self.limit, 2), "in_flight": self.in_flight,
+                "waiting": len(self._waiters),
+                "baseline_ms": round(self._baseline * 1000, 1) if self._baseline is not None else None}
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def retry_after(self) -> float:
+        """熔断剩余时间（秒）"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and self.retry_after() <= 0:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self._stats["rejected"] += 1
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        self.state = self.CLOSED
+
+    def abandon(self):
+        """请求未得出结果（如被取消），放弃本次探测"""
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self._stats["opened"] += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {**self._stats, "state": self.state, "consecutive_failures": self._failures,
+                "retry_after": round(self.retry_after(), 1)}
@@ -0,0 +1,71 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, List
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖（建议 >= 3.9），未安装时退回标准库
+    orjson = None
+
+# orjson.Fragment（嵌入已编码的 JSON 片段）3.9 起才有；旧版本仍用 orjson 编码，模型先转成基础类型
+HAS_FRAGMENT = hasattr(orjson, "Fragment")
+
+
+def row_dicts(result) -> List[Dict[str, Any]]:
+    """列级查询结果 -> dict 列表，不创建 ORM 实体和中间模型"""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def _default(obj: Any) -> Any:
+    """
+    orjson 不认识的类型
+    pydantic / SQLModel 对象（包括 ORM 实体）交给 pydantic-core 直接编码成 JSON 片段，不做校验、不做 model_dump 拷贝
+    """
+    if isinstance(obj, BaseModel):
+        if HAS_FRAGMENT:
+            return orjson.Fragment(pydantic_core.to_json(obj))
+        return pydantic_core.to_jsonable_python(obj)
+    mapping = getattr(obj, "_mapping", None)
+    if mapping is not None:  # SQLAlchemy Row（列级查询结果）
+        return dict(mapping)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def prepare(data: Any) -> Any:
+    """
+    模型列表整体交给 pydantic-core 一次编码成片段，比逐个对象回调 _default 快；
+    dict 行（列级查询结果）原样交给 orjson，这是最快的路径
+    """
+    if isinstance(data, list) and data and isinstance(data[0], BaseModel):
+        if HAS_FRAGMENT:
+            return orjson.Fragment(pydantic_core.to_json(data))
+        return pydantic_core.to_jsonable_python(data)
+    return data
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    快速 JSON 响应：路由直接返回它时 FastAPI 不再按 response_model 校验和转换，
+    内容由 orjson 一次编码（未安装 orjson 时用标准库 json）
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,104 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+# 计入排行榜的提交状态；error（判题系统错误）与判题中的状态不计
+COUNTED_STATUSES = ("accepted", "wrong", "rejected")
+
+
+@dataclass
+class PairScore:
+    """某用户在某题上的累计结果，由该用户该题的提交按 id 顺序推出"""
+    attempts: int = 0
+    accepted: int = 0
+    solved: bool = False
+    # 首次通过前的错误次数
+    wrong_before_ac: int = 0
+    first_accept_at: Optional[datetime] = None
+
+    def add(self, status: str, created_at: datetime):
+        """按提交顺序累加一次已出结果的提交"""
+        if status not in COUNTED_STATUSES:
+            return
+        self.attempts += 1
+        if status == "accepted":
+            self.accepted += 1
+            if not self.solved:
+                self.solved = True
+                self.first_accept_at = created_at
+        elif not self.solved:
+            self.wrong_before_ac += 1
+
+    def penalty(self, penalty_per_wrong: int) -> int:
+        return self.wrong_before_ac * penalty_per_wrong if self.solved else 0
+
+
+@dataclass
+class UserTotals:
+    solved: int = 0
+    penalty: int = 0
+    attempts: int = 0
+    last_accept_at: Optional[datetime] = None
+
+
+@dataclass
+class ProblemTotals:
+    attempts: int = 0
+    accepted: int = 0
+    solved_users: int = 0
+    attempted_users: int = 0
+
+
+def apply_pair(user: UserTotals, problem: ProblemTotals, pair: PairScore, penalty_per_wrong: int, sign: int = 1):
+    """把一个 (用户, 题目) 的结果加到（sign=-1 时从）用户和题目的汇总上；last_accept_at 由调用方维护"""
+    user.solved += sign * pair.solved
+    user.penalty += sign * pair.penalty(penalty_per_wrong)
+    user.attempts += sign * pair.attempts
+    problem.attempts += sign * pair.attempts
+    problem.accepted += sign * pair.accepted
+    problem.solved_users += sign * pair.solved
+    problem.attempted_users += sign * (pair.attempts > 0)
+
+
+@dataclass
+class ScoreAccumulator:
+    """
+    全量重建用：按 (user_id, problem_id, id) 顺序逐行喂入提交，
+    只在内存中保留用户和题目的汇总，(用户, 题目) 结果逐个交给调用方写出
+    """
+    penalty_per_wrong: int
+    users: Dict[int, UserTotals] = field(default_factory=dict)
+    problems: Dict[int, ProblemTotals] = field(default_factory=dict)
+    _key: Optional[Tuple[int, int]] = None
+    _pair: Optional[PairScore] = None
+
+    def add(self, user_id: int, problem_id: int, status: str, created_at: datetime) -> Optional[Tuple[Tuple[int, int], PairScore]]:
+        """喂入一行；切换到下一个 (用户, 题目) 时返回上一个已完成的结果"""
+        finished = None
+        if (user_id, problem_id) != self._key:
+            finished = self._close()
+            self._key, self._pair = (user_id, problem_id), PairScore()
+        self._pair.add(status, created_at)
+        return finished
+
+    def finish(self) -> Optional[Tuple[Tuple[int, int], PairScore]]:
+        return self._close()
+
+    def _close(self) -> Optional[Tuple[Tuple[int, int], PairScore]]:
+        (user_id, problem_id), pair = self._key or (None, None), self._pair
+        self._key = self._pair = None
+        if pair is None or pair.attempts == 0:
+            return None
+        user = self.users.setdefault(user_id, UserTotals())
+        apply_pair(user, self.problems.setdefault(problem_id, ProblemTotals()), pair, self.penalty_per_wrong)
+        if pair.first_accept_at and (user.last_accept_at is None or pair.first_accept_at > user.last_accept_at):
+            user.last_accept_at = pair.first_accept_at
+        return (user_id, problem_id), pair
+
+
+def score_pairs(rows: Iterable[Tuple[int, int, str, datetime]]) -> Dict[Tuple[int, int], PairScore]:
+    """增量更新用：rows 为 (user_id, problem_id, status, created_at)，需按提交 id 升序"""
+    pairs: Dict[Tuple[int, int], PairScore] = {}
+    for user_id, problem_id, status, created_at in rows:
+        pairs.setdefault((user_id, problem_id), PairScore()).add(status, created_at)
+    return pairs
@@ -0,0 +1,124 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+# 中日韩统一表意文字
+_CJK = r"\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """全角转半角、统一小写"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """切分为连续的汉字串 / 字母数字串，其余字符（空格、标点）作为分隔"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def _bigrams(token: str) -> List[str]:
+    if len(token) == 1:
+        return [token]
+    return [token[i:i + 2] for i in range(len(token) - 1)]
+
+
+def index_grams(text: str) -> Set[str]:
+    """建索引用：每个 token 的单字、二元组以及完整 token"""
+    grams: Set[str] = set()
+    for token in tokenize(text):
+        grams.update(token)
+        grams.update(_bigrams(token))
+        grams.add(token)
+    return grams
+
+
+def query_grams(text: str) -> Set[str]:
+    """查询用：每个 token 的二元组（单字 token 用单字）"""
+    grams: Set[str] = set()
+    for token in tokenize(text):
+        grams.update(_bigrams(token))
+    return grams
+
+
+class NGramIndex:
+    """
+    进程内 n-gram 倒排索引，中英文标题通用
+    查询只访问查询词对应的倒排链，耗时与命中数量相关、与总文档数无关；
+    按命中 gram 的 IDF 权重占比排序，完全包含查询词的排在前面；
+    每个文档可带一个 tag（如题目类型），查询时可按 tag 过滤
+    """
+
+    def __init__(self, min_score: float = 0.5):
+        self.min_score = min_score
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        # doc_id -> (规范化文本, grams, tag)
+        self._docs: Dict[int, Tuple[str, Set[str], Optional[Hashable]]] = {}
+        self._lock = threading.RLock()
+        self.max_id = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def ids(self) -> Set[int]:
+        with self._lock:
+            return set(self._docs)
+
+    def add(self, doc_id: int, text: str, tag: Optional[Hashable] = None):
+        grams = index_grams(text)
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._docs[doc_id] = (normalize(text), grams, tag)
+            for gram in grams:
+                self._postings[gram].add(doc_id)
+            self.max_id = max(self.max_id, doc_id)
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: int):
+        old = self._docs.pop(doc_id, None)
+        if old is None:
+            return
+        for gram in old[1]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+        if doc_id == self.max_id:
+            self.max_id = max(self._docs, default=0)
+
+    def search(self, text: str, tag: Optional[Hashable] = None) -> List[Tuple[int, float]]:
+        """返回按相关度降序排列的 (doc_id, score)，tag 不为 None 时只返回该 tag 的文档"""
+        grams = query_grams(text)
+        if not grams:
+            return []
+        phrase = normalize(text).strip()
+        with self._lock:
+            total = len(self._docs) or 1
+            weights = {g: math.log(1 + total / (1 + len(self._postings.get(g, ())))) for g in grams}
+            weight_sum = sum(weights.values())
+            scores: Dict[int, float] = defaultdict(float)
+            for gram, weight in weights.items():
+                for doc_id in self._postings.get(gram, ()):
+                    scores[doc_id] += weight
+            results = []
+            for doc_id, score in scores.items():
+                score /= weight_sum
+                if score < self.min_score:
+                    continue
+                title, _, doc_tag = self._docs[doc_id]
+                if tag is not None and doc_tag != tag:
+                    continue
+                # 标题直接包含完整查询串时加分
+                if phrase and phrase in title:
+                    score += 1
+                results.append((doc_id, round(score, 4), len(title)))
+        # 相关度高的在前；同分时标题越短越靠前，再按 id
+        results.sort(key=lambda r: (-r[1], r[2], r[0]))
+        return [(doc_id, score) for doc_id, score, _ in results]
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 from fastapi import Depends, HTTPException
@@ -5,16 +7,28 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from config import (
+    BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_CONCURRENCY, PASSWORD_BATCH_CONCURRENCY,
+)
+
 
 # JWT 配置
 SECRET_KEY = "mysecretkey"  # 应放到配置文件/环境变量
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# 密码加密器
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密码加密器；rounds 与已有哈希不一致时 verify_and_update 会给出新哈希
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")  # 登录接口路径
+# 浏览器的 EventSource / WebSocket 无法设置请求头，允许改用 ?token= 传递
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="users/login", auto_error=False)
+
+# bcrypt 放到独立进程池计算，不占用事件循环和请求线程；首次使用时创建
+_hash_pool: ProcessPoolExecutor | None = None
+_interactive_slots: asyncio.Semaphore | None = None
+_batch_slots: asyncio.Semaphore | None = None
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -24,6 +38,64 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """校验密码；哈希参数过期（如 cost 变化）时一并返回新哈希"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# ---------------- 进程池 ----------------
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool, _interactive_slots, _batch_slots
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        _interactive_slots = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+        _batch_slots = asyncio.Semaphore(PASSWORD_BATCH_CONCURRENCY)
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    """随 lifespan 关闭，丢弃尚未开始的任务"""
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+
+async def _run_in_pool(batch: bool, fn, *args):
+    pool = _get_hash_pool()
+    async with (_batch_slots if batch else _interactive_slots):
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+async def ahash_password(password: str) -> str:
+    return await _run_in_pool(False, hash_password, password)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_pool(False, verify_password, plain_password, hashed_password)
+
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await _run_in_pool(False, verify_and_update_password, plain_password, hashed_password)
+
+
+def _hash_many(passwords: list[str]) -> list[str]:
+    return [pwd_context.hash(p) for p in passwords]
+
+
+async def ahash_passwords(passwords: list[str]) -> list[str]:
+    """
+    批量哈希（CSV 导入），多核并行，最多占用 PASSWORD_BATCH_CONCURRENCY 个进程
+    按进程数切片提交，避免逐条提交时的进程间通信开销
+    """
+    if not passwords:
+        return []
+    size = -(-len(passwords) // PASSWORD_BATCH_CONCURRENCY)
+    parts = await asyncio.gather(*(_run_in_pool(True, _hash_many, passwords[i:i + size])
+                                   for i in range(0, len(passwords), size)))
+    return [h for part in parts for h in part]
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -37,8 +109,15 @@ def decode_access_token(token: str):
         return payload  # dict
     except JWTError:
         return None
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Token 无效或已过期")
-    return payload
\ No newline at end of file
+    return payload
+
+
+def get_stream_user(header_token: str | None = Depends(oauth2_scheme_optional), token: str | None = None):
+    """推送接口的鉴权：优先 Authorization 头，其次 ?token= 参数"""
+    return get_current_user(header_token or token or "")